@@ -18,43 +18,20 @@ import scipy.stats
 
 from psycopg import sql
 
-from lib.global_config import GlobalConfig
-from lib.db import DB
-from lib import error_helpers
+from lib.db import AsyncDB
 from lib.user import User, UserAuthenticationError
 from lib.secure_variable import SecureVariable
 
-import redis
-from enum import Enum
-
-def get_artifact(artifact_type: Enum, key: str, decode_responses=True):
-    host = GlobalConfig().config['redis']['host']
-    port = GlobalConfig().config['redis']['port']
-    if not host:
-        return None
-
-    data = None
-    try:
-        r = redis.Redis(host=host, port=port, db=artifact_type.value, protocol=3, decode_responses=decode_responses)
-
-        data = r.get(key)
-    except redis.RedisError as e:
-        error_helpers.log_error('Redis get_artifact failed', exception=e)
-
-    return None if data is None or data == [] else data
-
-def store_artifact(artifact_type: Enum, key:str, data, ex=2592000):
-    host = GlobalConfig().config['redis']['host']
-    port = GlobalConfig().config['redis']['port']
-    if not host:
-        return
-
-    try:
-        r = redis.Redis(host=host, port=port, db=artifact_type.value, protocol=3)
-        r.set(key, data, ex=ex) # Expiration => 2592000 = 30 days
-    except redis.RedisError as e:
-        error_helpers.log_error('Redis store_artifact failed', exception=e)
+# re-exported, as the routes use the artifact cache through the api_helpers
+from lib.artifact_cache import ( # pylint: disable=unused-import
+    artifact_cache_stats, get_artifact, get_artifacts, store_artifact, store_artifacts,
+    get_rendered_artifact, store_rendered_artifact
+)
 
+# Renders an artifact that was stored with orjson.dumps() into the body that
+# CustomORJSONResponse({'success': True, 'data': ...}) sends, without parsing and serializing it again
+def render_success_response_body(artifact: bytes) -> bytes:
+    return b'{"success":true,"data":' + artifact + b'}'
 
 # Note
 # ---------------
@@ -105,7 +82,7 @@ def is_valid_uuid(val):
     except ValueError:
         return False
 
-def get_machine_list():
+async def get_machine_list():
     query = """
         WITH timings as (
             SELECT
@@ -129,11 +106,11 @@ def get_machine_list():
             ORDER BY m.available DESC, m.id ASC
             """
 
-    return DB().fetch_all(query)
+    return await AsyncDB().fetch_all(query)
 
-def get_run_info(user, run_id):
+async def get_run_info(user, run_id):
 
-    run_exists = DB().fetch_one(
+    run_exists = await AsyncDB().fetch_one(
         "SELECT 1 FROM runs WHERE id = %s",
         params=(run_id,)
     )
@@ -158,7 +135,7 @@ def get_run_info(user, run_id):
                 AND id = %s
         """
     params = (user.is_super_user(), user.visible_users(), run_id)
-    run = DB().fetch_one(query, params=params, fetch_mode='dict')
+    run = await AsyncDB().fetch_one(query, params=params, fetch_mode='dict')
 
     if not run:
         raise HTTPException(status_code=403, detail="You do not have access to this run")
@@ -265,7 +242,7 @@ def get_timeline_query(user, uri, filename, usage_scenario_variables, machine_id
 
     return (query, params)
 
-def get_comparison_details(user, ids, comparison_db_key):
+async def get_comparison_details(user, ids, comparison_db_key):
 
     query = sql.SQL('''
         SELECT
@@ -278,7 +255,7 @@ def get_comparison_details(user, ids, comparison_db_key):
     ''').format(sql.Identifier(comparison_db_key))
 
     params = (user.is_super_user(), user.visible_users(), ids)
-    data = DB().fetch_all(query, params=params)
+    data = await AsyncDB().fetch_all(query, params=params)
     if data is None or data == []:
         raise RuntimeError('Could not get comparison details')
 
@@ -307,7 +284,7 @@ def get_comparison_details(user, ids, comparison_db_key):
 
     return comparison_details
 
-def determine_comparison_case(user, ids, force_mode=None):
+async def determine_comparison_case(user, ids, force_mode=None):
 
     query = '''
             WITH uniques as (
@@ -324,7 +301,7 @@ def determine_comparison_case(user, ids, force_mode=None):
             FROM uniques
     '''
     params = (user.is_super_user(), user.visible_users(), ids)
-    data = DB().fetch_one(query, params=params)
+    data = await AsyncDB().fetch_one(query, params=params)
     if data is None or data == [] or data[1] is None: # special check for data[1] as this is aggregate query which always returns result
         raise RuntimeError('Could not determine compare case')
 
@@ -474,7 +451,7 @@ def determine_comparison_case(user, ids, force_mode=None):
         # a generic per-run table view. This always works, as every run has a unique id.
         return ('Table', 'simple_table')
 
-def check_run_failed(user, ids):
+async def check_run_failed(user, ids):
     query = """
             SELECT
                COUNT(failed)
@@ -485,9 +462,9 @@ def check_run_failed(user, ids):
                 AND failed IS TRUE
             """
     params = (user.is_super_user(), user.visible_users(), ids)
-    return DB().fetch_one(query, params=params)[0]
+    return (await AsyncDB().fetch_one(query, params=params))[0]
 
-def get_phase_stats(user, ids):
+async def get_phase_stats(user, ids):
     query = """
             SELECT
                 a.phase, a.metric, a.detail_name, a.value, a.type, a.max_value, a.min_value,
@@ -507,7 +484,7 @@ def get_phase_stats(user, ids):
                 a.id ASC
             """
     params = (user.is_super_user(), user.visible_users(), ids)
-    return DB().fetch_all(query, params=params)
+    return await AsyncDB().fetch_all(query, params=params)
 
 # Would be interesting to know if in an application server like gunicor @cache
 # Will also work for subsequent requests ...?
@@ -892,7 +869,7 @@ def check_int_field_api(field, name, max_value):
 
     return True
 
-def carbondb_add(connecting_ip, data, source, user_id):
+async def carbondb_add(connecting_ip, data, source, user_id):
 
     merge_window_max = 30 # merge window hardcoded for now. Might be a user setting later. This entails also that carbondb_copy_over_and_remove_duplicates.py makes queries PER USER
     current_time_us = int(time.time_ns()  / 1e3)
@@ -922,7 +899,7 @@ def carbondb_add(connecting_ip, data, source, user_id):
     else:
         carbon_kg = (energy_kWh * carbon_intensity_g_per_kWh)/1_000
 
-    DB().query(
+    await AsyncDB().query(
         query=query,
         params=(
             data['type'],
@@ -7,7 +7,7 @@ from api.api_helpers import authenticate, get_connecting_ip, CustomORJSONRespons
 from api.object_specifications import EnergyData
 
 from lib.user import User
-from lib.db import DB
+from lib.db import AsyncDB
 
 router = APIRouter()
 
@@ -23,7 +23,7 @@ async def add_carbondb(
     ):
 
     try:
-        carbondb_add(get_connecting_ip(request), energydata.dict(), 'CUSTOM', user._id)
+        await carbondb_add(get_connecting_ip(request), energydata.dict(), 'CUSTOM', user._id)
     except ValueError as exc:
         raise HTTPException(status_code=422, detail=str(exc)) from exc
 
@@ -167,7 +167,7 @@ async def carbondb_get(
             cedd.date ASC
         ;
     """
-    data = DB().fetch_all(query, params)
+    data = await AsyncDB().fetch_all(query, params)
 
     return CustomORJSONResponse({'success': True, 'data': data})
 
@@ -182,10 +182,10 @@ async def carbondb_get_filters(
 
     for el in elements:
         query = f"SELECT jsonb_object_agg(id, {el}) FROM carbondb_{el}s WHERE (TRUE = %s OR user_ids && %s::int[])"
-        results[f"{el}s"] = DB().fetch_one(query, (user.is_super_user(), user.visible_users()))[0]
+        results[f"{el}s"] = (await AsyncDB().fetch_one(query, (user.is_super_user(), user.visible_users())))[0]
 
     query = 'SELECT jsonb_object_agg(id, name) FROM users WHERE (TRUE = %s OR id = ANY(%s::int[]))'
-    visible_users = DB().fetch_one(query, (user.is_super_user(), user.visible_users()))[0]
+    visible_users = (await AsyncDB().fetch_one(query, (user.is_super_user(), user.visible_users())))[0]
 
 
     return CustomORJSONResponse({'success': True, 'data': {'types': results['types'], 'tags': results['tags'], 'machines': results['machines'], 'projects': results['projects'], 'sources': results['sources'], 'users': visible_users}})
@@ -200,7 +200,7 @@ async def get_insights(user: User = Depends(authenticate)):
     '''
 
     params = (user.is_super_user(), user.visible_users())
-    data = DB().fetch_one(query, params=params)
+    data = await AsyncDB().fetch_one(query, params=params)
 
     if data is None:
         return Response(status_code=204) # No-Content
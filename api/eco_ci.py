@@ -12,12 +12,12 @@ from xml.sax.saxutils import escape as xml_escape
 
 from lib import error_helpers
 from lib.user import User
-from lib.db import DB
+from lib.db import AsyncDB
 
 router = APIRouter()
 
 
-def _insert_ci_measurement(request: Request, measurement, user: User) -> Response:
+async def _insert_ci_measurement(request: Request, measurement, user: User) -> Response:
     """
     Shared insert logic for CI measurements.
     Works for both v2 (CI_Measurement) and v3 (CI_MeasurementV3),
@@ -96,7 +96,7 @@ def _insert_ci_measurement(request: Request, measurement, user: User) -> Respons
                 %s, %s, %s, %s, %s, %s, %s)
         """
 
-    DB().query(query=query, params=params)
+    await AsyncDB().query(query=query, params=params)
 
     if measurement.energy_uj <= 1 or (measurement.carbon_ug and measurement.carbon_ug <= 1):
         error_helpers.log_error(
@@ -121,7 +121,7 @@ async def post_ci_measurement_add(
     """
     v2: backward-compatible behaviour (no new fields).
     """
-    return _insert_ci_measurement(request, measurement, user)
+    return await _insert_ci_measurement(request, measurement, user)
 
 @router.post('/v3/ci/measurement/add')
 async def post_ci_measurement_add_v3(
@@ -133,7 +133,7 @@ async def post_ci_measurement_add_v3(
     v3: accepts additional fields (os_name, cpu_arch, job_id, version) via CI_MeasurementV3.
     For now, the insert logic is the same as v2 and ignores these extra fields.
     """
-    return _insert_ci_measurement(request, measurement, user)
+    return await _insert_ci_measurement(request, measurement, user)
 
 
 @router.get('/v1/ci/measurements')
@@ -165,7 +165,7 @@ async def get_ci_measurements(repo: str, branch: str, workflow: str, start_date:
         ORDER BY run_id ASC, created_at ASC
     """
 
-    data = DB().fetch_all(query, params=params)
+    data = await AsyncDB().fetch_all(query, params=params)
 
     if data is None or data == []:
         return Response(status_code=204)  # No-Content
@@ -202,7 +202,7 @@ async def get_ci_stats(repo: str, branch: str, workflow: str, start_date: date,
     '''
 
     params = (user.is_super_user(), user.visible_users(), repo, branch, workflow, str(start_date), str(end_date))
-    totals_data = DB().fetch_one(query, params=params)
+    totals_data = await AsyncDB().fetch_one(query, params=params)
 
     if totals_data is None or totals_data[0] is None: # aggregate query always returns row
         return Response(status_code=204)  # No-Content
@@ -225,7 +225,7 @@ async def get_ci_stats(repo: str, branch: str, workflow: str, start_date: date,
         GROUP BY label
     '''
     params = (user.is_super_user(), user.visible_users(), repo, branch, workflow, str(start_date), str(end_date))
-    per_label_data = DB().fetch_all(query, params=params)
+    per_label_data = await AsyncDB().fetch_all(query, params=params)
 
     if per_label_data is None or per_label_data[0] is None:
         return Response(status_code=204)  # No-Content
@@ -255,7 +255,7 @@ async def get_ci_repositories(repo: str | None = None, sort_by: str = 'name', us
     else:
         query = f"{query} ORDER BY repo ASC"
 
-    data = DB().fetch_all(query, params=params)
+    data = await AsyncDB().fetch_all(query, params=params)
     if data is None or data == []:
         return Response(status_code=204) # No-Content
 
@@ -283,7 +283,7 @@ async def get_ci_runs(repo: str, user: User = Depends(authenticate)):
 
     params = (user.is_super_user(), user.visible_users(), repo)
 
-    data = DB().fetch_all(query, params=params)
+    data = await AsyncDB().fetch_all(query, params=params)
     if data is None or data == []:
         return Response(status_code=204) # No-Content
 
@@ -352,7 +352,7 @@ async def get_ci_badge_get(repo: str, branch: str, workflow:str, mode: str = 'la
         raise RuntimeError('Unknown mode')
 
 
-    data = DB().fetch_one(query, params=params)
+    data = await AsyncDB().fetch_one(query, params=params)
 
     if data is None or data == [] or data[0] is None: # special check for SUM element as this is aggregate query which always returns result
         return Response(status_code=204) # No-Content
@@ -381,7 +381,7 @@ async def get_insights(user: User = Depends(authenticate)):
     '''
 
     params = (user.is_super_user(), user.visible_users())
-    data = DB().fetch_one(query, params=params)
+    data = await AsyncDB().fetch_one(query, params=params)
 
     if data is None:
         return Response(status_code=204) # No-Content
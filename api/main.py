@@ -1,30 +1,41 @@
 # It seems like FastAPI already enables faulthandler as it shows stacktrace on SEGFAULT
 # Is the redundant call problematic?
+import os
 import sys
 import faulthandler
 faulthandler.enable(file=sys.__stderr__)  # will catch segfaults and write to stderr
 from datetime import date
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Request, Response, Depends, HTTPException
 from fastapi.encoders import jsonable_encoder
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 
 from starlette.responses import RedirectResponse
 from starlette.exceptions import HTTPException as StarletteHTTPException
 from starlette.datastructures import Headers as StarletteHeaders
 
-from api.api_helpers import authenticate, CustomORJSONResponse
+from api.api_helpers import authenticate, CustomORJSONResponse, artifact_cache_stats
 
 from lib.global_config import GlobalConfig
 from lib import error_helpers
 from lib.user import User
-from lib.db import DB
+from lib.db import DB, AsyncDB, set_pool_profile
 from lib.secure_variable import SecureVariable
 
 from api.object_specifications import UserSetting, SystemLogDelete
 
-app = FastAPI()
+# The pool of AsyncDB is bound to the event loop of the worker, so it is closed with it
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    yield
+    await AsyncDB().shutdown()
+
+app = FastAPI(lifespan=lifespan)
+
+set_pool_profile('api')
 
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
@@ -160,7 +171,7 @@ async def get_user_settings(user: User = Depends(authenticate)):
 async def update_user_setting(setting: UserSetting, user: User = Depends(authenticate)):
 
     try:
-        user.change_setting(setting.name, setting.value)
+        await run_in_threadpool(user.change_setting, setting.name, setting.value)
     except ValueError as exc:
         raise HTTPException(status_code=422, detail=str(exc)) from exc
 
@@ -178,7 +189,7 @@ async def get_cluster_status(
         ORDER BY created_at DESC
     '''
 
-    data = DB().fetch_all(query)
+    data = await AsyncDB().fetch_all(query)
 
     if data is None or data == []:
         return Response(status_code=204)  # No-Content
@@ -197,7 +208,7 @@ async def get_cluster_status_history(
         ORDER BY created_at DESC
     '''
 
-    data = DB().fetch_all(query)
+    data = await AsyncDB().fetch_all(query)
 
     if data is None or data == []:
         return Response(status_code=204)  # No-Content
@@ -248,7 +259,7 @@ async def get_cluster_changelog(
         ORDER BY created_at DESC
     """
 
-    data = DB().fetch_all(query, params=params)
+    data = await AsyncDB().fetch_all(query, params=params)
 
     if data is None or data == []:
         return Response(status_code=204)  # No-Content
@@ -261,7 +272,7 @@ async def get_system_logs(
     user: User = Depends(authenticate) # pylint: disable=unused-argument
     ):
 
-    data = DB().fetch_all(
+    data = await AsyncDB().fetch_all(
         'SELECT id, title, message, level, created_at FROM system_logs ORDER BY created_at DESC LIMIT 20',
         []
     )
@@ -280,13 +291,28 @@ async def update_system_log(
         raise HTTPException(status_code=422, detail=f"Unsupported action: {log.action}")
 
     query = 'DELETE FROM system_logs WHERE id = %s RETURNING id'
-    deleted = DB().fetch_one(query, params=[log.log_id])
+    deleted = await AsyncDB().fetch_one(query, params=[log.log_id])
 
     if not deleted:
         raise HTTPException(status_code=404, detail='System log entry not found')
 
     return Response(status_code=202)
 
+# Connection pool usage and artifact cache hits of the worker that answers the request. Every gunicorn worker
+# has its own pools and counters, so repeated requests may hit different workers. The pid tells them apart
+@app.get('/v1/db-pool-stats')
+async def get_db_pool_stats(
+    # Endpoint without user restriction on DB. But authenticate() must be present to check if route is allowed in general
+    user: User = Depends(authenticate) # pylint: disable=unused-argument
+    ):
+
+    return CustomORJSONResponse({'success': True, 'data': {
+        'pid': os.getpid(),
+        'async': AsyncDB().get_pool_stats(),
+        'sync': DB().get_pool_stats(), # used by the lib code that runs in the threadpool and by authenticate(). Profile api_sync
+        'artifact_cache': artifact_cache_stats,
+    }})
+
 
 if GlobalConfig().config.get('activate_scenario_runner', False):
     from api import scenario_runner
@@ -1,9 +1,8 @@
 from typing import List, Optional, Dict, Literal, Union
 
-from enum import Enum
 from pydantic import BaseModel, ConfigDict, Field, field_validator, constr
 
-ArtifactType = Enum('ArtifactType', ['DIFF', 'COMPARE', 'STATS', 'BADGE', 'SOFTWARE'])
+from lib.artifact_cache import ArtifactType # pylint: disable=unused-import
 
 ### Run
 class RunChange(BaseModel):
@@ -12,7 +12,7 @@ from api.api_helpers import authenticate, get_connecting_ip, replace_nan_with_ze
 from api.object_specifications import HogMeasurement, SimplifiedMeasurement
 
 from lib.user import User
-from lib.db import DB
+from lib.db import AsyncDB
 
 MERGE_WINDOW_MAX = 30 # merge window hardcoded for now, kept in sync with CarbonDB's (api_helpers.carbondb_add)
 
@@ -34,7 +34,7 @@ async def add_hog(
     # All measurements of a request are committed atomically: if one fails validation
     # or the timestamp guard, previously processed measurements in this same request
     # must not remain inserted.
-    with DB().transaction_cursor() as cur:
+    async with AsyncDB().transaction_cursor() as cur:
         for measurement in measurements:
             decoded_data = base64.b64decode(measurement.data)
             decompressed_data = zlib.decompress(decoded_data)
@@ -103,8 +103,8 @@ async def add_hog(
                 validated_measurement.thermal_pressure,
                 get_connecting_ip(request)
             )
-            cur.execute(query_measurement, params_measurement)
-            measurement_db_id = cur.fetchone()[0]
+            await cur.execute(query_measurement, params_measurement)
+            measurement_db_id = (await cur.fetchone())[0]
 
             query_top_process = """
                 INSERT INTO hog_top_processes (
@@ -125,7 +125,7 @@ async def add_hog(
                     raise ValueError(f"None value found: measurement_db_id={measurement_db_id}, "
                                     f"name={name}, energy_impact={energy_impact}, cputime_ms={cputime_ms}")
 
-                cur.execute(query_top_process, (measurement_db_id, name, energy_impact, cputime_ms))
+                await cur.execute(query_top_process, (measurement_db_id, name, energy_impact, cputime_ms))
 
     return Response(status_code=202)
 
@@ -143,7 +143,7 @@ async def hog_get_top_processes():
             total_energy_impact DESC
         LIMIT 10;
     """
-    data = DB().fetch_all(query)
+    data = await AsyncDB().fetch_all(query)
 
     if data is None:
         data = []
@@ -152,7 +152,7 @@ async def hog_get_top_processes():
         SELECT COUNT(DISTINCT machine_uuid) FROM hog_simplified_measurements;
     """
 
-    machine_count = DB().fetch_one(query)[0]
+    machine_count = (await AsyncDB().fetch_one(query))[0]
 
     return CustomORJSONResponse({'success': True, 'process_data': data, 'machine_count': machine_count})
 
@@ -185,7 +185,7 @@ async def user_detail(
         FROM hog_simplified_measurements
         WHERE timestamp >= %s AND timestamp <= %s AND user_id = %s
     """
-    sums_data = DB().fetch_one(sums_query, (start_epoch, end_epoch, user._id))
+    sums_data = await AsyncDB().fetch_one(sums_query, (start_epoch, end_epoch, user._id))
 
     if sums_data is None:
         sums_data = [0] * 7
@@ -215,7 +215,7 @@ async def user_detail(
         ORDER BY total_energy_impact DESC
         LIMIT 100
     """
-    process_data = DB().fetch_all(processes_query, (start_epoch, end_epoch, user._id))
+    process_data = await AsyncDB().fetch_all(processes_query, (start_epoch, end_epoch, user._id))
     if process_data is None:
         process_data = []
 
@@ -282,7 +282,7 @@ async def get_insights(user: User = Depends(authenticate)):
     '''
 
     params = (user.is_super_user(), user.visible_users())
-    data = DB().fetch_one(query, params=params)
+    data = await AsyncDB().fetch_one(query, params=params)
 
     if data is None:
         return Response(status_code=204) # No-Content
@@ -7,8 +7,12 @@ from typing import Annotated
 from xml.sax.saxutils import escape as xml_escape
 from datetime import date, datetime, timedelta
 import pprint
+import itertools
+import numpy as np
 
 from fastapi import APIRouter, Response, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 import anybadge
 
 from api.object_specifications import Software, JobChange, WatchlistChange, RunChange, ArtifactType
@@ -16,11 +20,15 @@ from api.api_helpers import (CustomORJSONResponse, ORJSONResponseObjKeep, add_ph
                          determine_comparison_case,get_comparison_details,
                          get_phase_stats, get_phase_stats_object, check_run_failed,
                          is_valid_uuid, convert_value, get_timeline_query,
-                         get_run_info, get_machine_list, get_artifact, store_artifact,
+                         get_run_info, get_machine_list, get_artifact, store_artifact, get_rendered_artifact, store_rendered_artifact, render_success_response_body,
                          authenticate, check_int_field_api)
 
 from lib.global_config import GlobalConfig
-from lib.db import DB
+from lib.db import DB, AsyncDB
+from lib.measurement_archive import is_archived, read_archived_measurements
+from lib.measurement_partitions import get_run_measurement_metric_id_range_async
+from lib.downsampling import downsample_series, DOWNSAMPLING_METHODS
+from lib.phase_stats import MEAN_METRICS
 from lib.diff import get_diffable_rows, diff_rows
 from lib.job.run import RunJob
 from lib.job.email_simple import EmailSimpleJob
@@ -99,7 +107,7 @@ async def get_machines(
     user: User = Depends(authenticate), # pylint: disable=unused-argument
     ):
 
-    data = get_machine_list()
+    data = await get_machine_list()
     if data is None or data == []:
         return Response(status_code=204) # No-Content
 
@@ -149,7 +157,7 @@ async def get_jobs(
             {job_id_condition}
         ORDER BY j.updated_at DESC, j.created_at ASC
     """
-    data = DB().fetch_all(query, params)
+    data = await AsyncDB().fetch_all(query, params)
     if data is None or data == []:
         return Response(status_code=204) # No-Content
 
@@ -176,7 +184,7 @@ async def update_job(
             AND j.id = %s
     '''
 
-    job_state = DB().fetch_one(query, params)
+    job_state = await AsyncDB().fetch_one(query, params)
     if job_state is None or job_state == []:
         raise HTTPException(status_code=422, detail='The job you wanted to change does not exist in the database or is not assigned to your user_id.')
 
@@ -201,7 +209,7 @@ async def update_job(
             AND id = %s
     '''
 
-    status_message = DB().query(query, params)
+    status_message = await AsyncDB().query(query, params)
     if status_message == 'UPDATE 1':
         return Response(status_code=202) # Accepted - Further processing happening internally. Not technically correct, but processing in frontend easier.
     else:
@@ -225,7 +233,7 @@ async def update_watchlist(
         RETURNING id
     """
     params = (change.watchlist_id, user.is_super_user(), user._id)
-    deleted = DB().fetch_one(query, params=params)
+    deleted = await AsyncDB().fetch_one(query, params=params)
 
     if not deleted:
         raise HTTPException(status_code=404, detail='Watchlist entry not found or not owned by user')
@@ -251,7 +259,7 @@ async def get_notes(run_id, user: User = Depends(authenticate)):
             '''
 
     params = (user.is_super_user(), user.visible_users(), run_id)
-    data = DB().fetch_all(query, params=params)
+    data = await AsyncDB().fetch_all(query, params=params)
     if data is None or data == []:
         return Response(status_code=204) # No-Content
 
@@ -274,7 +282,7 @@ async def get_warnings(run_id, user: User = Depends(authenticate)):
             '''
 
     params = (user.is_super_user(), user.visible_users(), run_id)
-    data = DB().fetch_all(query, params=params)
+    data = await AsyncDB().fetch_all(query, params=params)
     if data is None or data == []:
         return Response(status_code=204)
 
@@ -286,7 +294,7 @@ async def get_network(run_id: str, user: User = Depends(authenticate)):
     if run_id is None or not is_valid_uuid(run_id):
         return ORJSONResponseObjKeep({'success': False, 'data': 'Run ID is not a valid UUID or empty'}, status_code=422)
 
-    run_exists = DB().fetch_one(
+    run_exists = await AsyncDB().fetch_one(
         "SELECT 1 FROM runs WHERE id = %s",
         params=(run_id,)
     )
@@ -303,7 +311,7 @@ async def get_network(run_id: str, user: User = Depends(authenticate)):
             ORDER BY ni.time
         '''
     params = (user.is_super_user(), user.visible_users(), run_id)
-    data = DB().fetch_all(query, params=params)
+    data = await AsyncDB().fetch_all(query, params=params)
 
     if data is None or data == []:
         return Response(status_code=204) # No-Content
@@ -361,7 +369,7 @@ async def get_repositories(
     else:
         query = f"{query} ORDER BY last_run DESC"
 
-    data = DB().fetch_all(query, params=params)
+    data = await AsyncDB().fetch_all(query, params=params)
     if data is None or data == []:
         return Response(status_code=204) # No-Content
 
@@ -473,7 +481,7 @@ async def get_runs(
         params.append(limit)
 
 
-    data = DB().fetch_all(query, params=params)
+    data = await AsyncDB().fetch_all(query, params=params)
     if data is None or data == []:
         return Response(status_code=204) # No-Content
 
@@ -494,11 +502,11 @@ async def compare_in_repo(ids: str, force_mode:str | None = None, user: User = D
 
 
     if not force_mode: # force_mode must always get fresh data
-        if artifact := get_artifact(ArtifactType.COMPARE, f"{user._id}_{str(ids)}"):
-            return CustomORJSONResponse({'success': True, 'data': orjson.loads(artifact)}) # pylint: disable=no-member
+        if body := get_rendered_artifact(ArtifactType.COMPARE, f"{user._id}_{str(ids)}", render_success_response_body):
+            return Response(content=body, media_type='application/json')
 
     try:
-        case, comparison_db_key = determine_comparison_case(user, ids, force_mode=force_mode)
+        case, comparison_db_key = await determine_comparison_case(user, ids, force_mode=force_mode)
     except (RuntimeError, ValueError) as exc:
         raise HTTPException(status_code=422, detail=str(exc)) from exc
 
@@ -509,15 +517,15 @@ async def compare_in_repo(ids: str, force_mode:str | None = None, user: User = D
             media_type="text/plain",
         )
 
-    comparison_details = get_comparison_details(user, ids, comparison_db_key)
+    comparison_details = await get_comparison_details(user, ids, comparison_db_key)
 
     # check if a run failed
 
-    if check_run_failed(user, ids) >= 1:
+    if await check_run_failed(user, ids) >= 1:
         raise HTTPException(status_code=422, detail='At least one run in your runs to compare failed. Comparsion for failed runs is not supported.')
 
 
-    if not (phase_stats := get_phase_stats(user, ids)):
+    if not (phase_stats := await get_phase_stats(user, ids)):
         return Response(status_code=204) # No-Content
 
     try:
@@ -529,9 +537,9 @@ async def compare_in_repo(ids: str, force_mode:str | None = None, user: User = D
     phase_stats_object['common_info'] = {}
 
     try:
-        run_info = get_run_info(user, ids[0])
+        run_info = await get_run_info(user, ids[0])
 
-        machine_list = get_machine_list()
+        machine_list = await get_machine_list()
         machines = {machine[0]: machine[1] for machine in machine_list}
 
         machine = machines[run_info['machine_id']]
@@ -587,7 +595,8 @@ async def compare_in_repo(ids: str, force_mode:str | None = None, user: User = D
         return ORJSONResponseObjKeep({'success': False, 'data': err.detail}, status_code=err.status_code)
 
     if not force_mode: # force_mode must never store data
-        store_artifact(ArtifactType.COMPARE, f"{user._id}_{str(ids)}", orjson.dumps(phase_stats_object)) # pylint: disable=no-member
+        artifact = orjson.dumps(phase_stats_object) # pylint: disable=no-member
+        store_rendered_artifact(ArtifactType.COMPARE, f"{user._id}_{str(ids)}", artifact, render_success_response_body(artifact))
 
 
     return CustomORJSONResponse({'success': True, 'data': phase_stats_object})
@@ -598,10 +607,10 @@ async def get_phase_stats_single(run_id: str, user: User = Depends(authenticate)
     if run_id is None or not is_valid_uuid(run_id):
         raise HTTPException(status_code=422, detail='Run ID is not a valid UUID or empty')
 
-    if artifact := get_artifact(ArtifactType.STATS, f"{user._id}_{str(run_id)}"):
-        return CustomORJSONResponse({'success': True, 'data': orjson.loads(artifact)}) # pylint: disable=no-member
+    if body := get_rendered_artifact(ArtifactType.STATS, f"{user._id}_{str(run_id)}", render_success_response_body):
+        return Response(content=body, media_type='application/json')
 
-    if not (phase_stats := get_phase_stats(user, [run_id])):
+    if not (phase_stats := await get_phase_stats(user, [run_id])):
         return Response(status_code=204) # No-Content
 
     try:
@@ -610,40 +619,154 @@ async def get_phase_stats_single(run_id: str, user: User = Depends(authenticate)
     except ValueError as exc:
         raise HTTPException(status_code=422, detail=str(exc)) from exc
 
-    store_artifact(ArtifactType.STATS, f"{user._id}_{str(run_id)}", orjson.dumps(phase_stats_object)) # pylint: disable=no-member
+    artifact = orjson.dumps(phase_stats_object) # pylint: disable=no-member
+    store_rendered_artifact(ArtifactType.STATS, f"{user._id}_{str(run_id)}", artifact, render_success_response_body(artifact))
 
     return ORJSONResponseObjKeep({'success': True, 'data': phase_stats_object})
 
 
 # This route gets the measurements to be displayed in a timeline chart
+# With max_points and / or bucket_us every series (metric and detail_name) is downsampled on the server. See lib/downsampling.py
 @router.get('/v1/measurements/single/{run_id}')
-async def get_measurements_single(run_id: str, user: User = Depends(authenticate)):
+async def get_measurements_single(run_id: str, max_points: int | None = None, bucket_us: int | None = None, downsampling: str = 'lttb', user: User = Depends(authenticate)):
     if run_id is None or not is_valid_uuid(run_id):
         raise HTTPException(status_code=422, detail='Run ID is not a valid UUID or empty')
 
-    query = '''
-            SELECT
-                mm.detail_name, mv.time, mm.metric,
-                   mv.value, mm.unit
+    if max_points is not None and max_points < 3:
+        raise HTTPException(status_code=422, detail='max_points must be >= 3')
+    if bucket_us is not None and bucket_us <= 0:
+        raise HTTPException(status_code=422, detail='bucket_us must be > 0')
+    if downsampling not in DOWNSAMPLING_METHODS:
+        raise HTTPException(status_code=422, detail=f"downsampling must be one of: {', '.join(DOWNSAMPLING_METHODS)}")
+
+    if max_points is not None or bucket_us is not None or is_archived(run_id):
+        # reads and downsamples the run series by series with sync queries, so it runs in a worker thread and not on the event loop
+        data = await run_in_threadpool(_get_measurements_single_per_series, run_id, user, max_points, bucket_us, downsampling)
+    else:
+        query = '''
+                SELECT
+                    mm.detail_name, mv.time, mm.metric,
+                       mv.value, mm.unit
+                FROM measurement_metrics as mm
+                JOIN measurement_values as mv ON mv.measurement_metric_id = mm.id
+                JOIN runs as r ON mm.run_id = r.id
+                WHERE
+                    (TRUE = %s OR r.user_id = ANY(%s::int[]) or r.public = TRUE)
+                    AND mm.run_id = %s
+                    AND mv.measurement_metric_id BETWEEN %s AND %s -- lets postgres prune the partitions of measurement_values
+        '''
+
+        id_range = await get_run_measurement_metric_id_range_async(run_id)
+        params = (user.is_super_user(), user.visible_users(), run_id, *id_range)
+
+        # extremely important to order here, cause the charting library in JS cannot do that automatically!
+        # Furthermore we do time-lag caclulations and need the order of metric first and then time in stats.js:179... . Please do not change
+        query = f"{query} ORDER BY mm.metric ASC, mm.detail_name ASC, mv.time ASC"
+
+        data = await AsyncDB().fetch_all(query, params=params)
+
+    if data is None or data == []:
+        return Response(status_code=204) # No-Content
+
+    return ORJSONResponseObjKeep({'success': True, 'data': data})
+
+# Returns [(id, detail_name, metric, unit)] of all series of the run the user may see.
+# Ordered in the DB, so that the collation is the same as in the query of get_measurements_single
+def _get_visible_measurement_metrics(run_id, user, metric=None, detail_name=None):
+    return DB().fetch_all('''
+            SELECT mm.id, mm.detail_name, mm.metric, mm.unit
             FROM measurement_metrics as mm
-            JOIN measurement_values as mv ON mv.measurement_metric_id = mm.id
             JOIN runs as r ON mm.run_id = r.id
             WHERE
                 (TRUE = %s OR r.user_id = ANY(%s::int[]) or r.public = TRUE)
                 AND mm.run_id = %s
-    '''
-
-    params = (user.is_super_user(), user.visible_users(), run_id)
-
-    # extremely important to order here, cause the charting library in JS cannot do that automatically!
-    # Furthermore we do time-lag caclulations and need the order of metric first and then time in stats.js:179... . Please do not change
-    query = f"{query} ORDER BY mm.metric ASC, mm.detail_name ASC, mv.time ASC"
+                AND (%s::text IS NULL OR mm.metric = %s)
+                AND (%s::text IS NULL OR mm.detail_name = %s)
+            ORDER BY mm.metric ASC, mm.detail_name ASC
+    ''', params=(user.is_super_user(), user.visible_users(), run_id, metric, metric, detail_name, detail_name))
+
+# Streaming variant of get_measurements_single for big runs. The values are read series by series in batches
+# and sent as NDJSON while reading, so the worker never holds more than one batch in memory.
+# Every line is one batch of one series: {"metric": .., "detail_name": .., "unit": .., "data": [[time, value], ...]}
+# A series longer than one batch continues in the next line. Series are in the same order as in get_measurements_single
+@router.get('/v1/measurements/single/{run_id}/stream')
+async def get_measurements_single_stream(run_id: str, metric: str | None = None, detail_name: str | None = None, user: User = Depends(authenticate)):
+    if run_id is None or not is_valid_uuid(run_id):
+        raise HTTPException(status_code=422, detail='Run ID is not a valid UUID or empty')
 
-    data = DB().fetch_all(query, params=params)
-    if data is None or data == []:
+    # resolved before the response starts, as a status code cannot be sent anymore once streaming
+    metrics = await run_in_threadpool(_get_visible_measurement_metrics, run_id, user, metric, detail_name)
+    if not metrics:
         return Response(status_code=204) # No-Content
 
-    return ORJSONResponseObjKeep({'success': True, 'data': data})
+    return StreamingResponse(_stream_measurements_single(run_id, metrics, is_archived(run_id)), media_type='application/x-ndjson')
+
+MEASUREMENTS_STREAM_BATCH_SIZE = 10_000 # rows per line
+MIN_POSTGRES_BIGINT = -2**63
+
+# itertools.batched only exists from Python 3.12 on
+def _batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+async def _stream_measurements_single(run_id, metrics, archived):
+    for measurement_metric_id, detail_name, metric, unit in metrics:
+        if archived:
+            _, times, values = await run_in_threadpool(read_archived_measurements, run_id, [measurement_metric_id])
+            for batch in _batched(zip(times.tolist(), values.tolist()), MEASUREMENTS_STREAM_BATCH_SIZE):
+                yield orjson.dumps({'metric': metric, 'detail_name': detail_name, 'unit': unit, 'data': batch}) + b'\n' # pylint: disable=no-member
+            continue
+
+        # Paged along the primary key instead of one server-side cursor per series. Every batch is a short query
+        # of its own, so no pool connection and no transaction is held while the client is still reading
+        last_time = MIN_POSTGRES_BIGINT
+        while batch := await AsyncDB().fetch_all('''
+                SELECT time, value
+                FROM measurement_values
+                WHERE measurement_metric_id = %s AND time > %s
+                ORDER BY time ASC
+                LIMIT %s
+            ''', params=(measurement_metric_id, last_time, MEASUREMENTS_STREAM_BATCH_SIZE)):
+            yield orjson.dumps({'metric': metric, 'detail_name': detail_name, 'unit': unit, 'data': batch}) + b'\n' # pylint: disable=no-member
+            last_time = batch[-1][0]
+
+# Returns (times, values) of one series as int64 numpy arrays sorted by time
+def _read_measurement_series(run_id, measurement_metric_id, archived):
+    if archived:
+        _, times, values = read_archived_measurements(run_id, [measurement_metric_id])
+        return times, values
+
+    chunks = list(DB().copy_to_integer_arrays('''
+            SELECT time, value
+            FROM measurement_values
+            WHERE measurement_metric_id = %s
+            ORDER BY time ASC
+    ''', (measurement_metric_id, ), pg_types=['bigint', 'bigint']))
+    if not chunks:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    times, values = (np.concatenate(column) for column in zip(*chunks))
+    return times, values
+
+# Same rows and order as the query in get_measurements_single, but built series by series. This is used when
+# the series are downsampled and for runs whose values were moved to cold storage (see lib/measurement_archive.py)
+# Every series is read and downsampled on its own, so only the raw values of the largest single series are held in memory
+def _get_measurements_single_per_series(run_id, user, max_points, bucket_us, downsampling):
+    metrics = _get_visible_measurement_metrics(run_id, user)
+    if not metrics:
+        return None # no metrics or not visible for the user
+
+    archived = is_archived(run_id)
+    data = []
+    for measurement_metric_id, detail_name, metric, unit in metrics:
+        times, values = _read_measurement_series(run_id, measurement_metric_id, archived)
+        series_times, series_values = downsample_series(
+            times, values, downsampling, max_points, bucket_us, is_total=metric not in MEAN_METRICS
+        )
+        # plain python objects, as the numpy scalars are not serializable for orjson without extra options
+        data.extend(zip(itertools.repeat(detail_name), series_times.tolist(), itertools.repeat(metric), series_values.tolist(), itertools.repeat(unit)))
+
+    return data
 
 @router.get('/v1/timeline', deprecated=True)
 async def get_timeline_stats(
@@ -664,7 +787,7 @@ async def get_timeline_stats(
     check_int_field_api(machine_id, 'machine_id', 1024) # can cause exception
     query, params = get_timeline_query(user, uri, filename, usage_scenario_variables, machine_id, branch, metric, phase, start_date=start_date, end_date=end_date, sorting=sorting, show_archived=show_archived)
 
-    data = DB().fetch_all(query, params=params)
+    data = await AsyncDB().fetch_all(query, params=params)
 
     if data is None or data == []:
         return Response(status_code=204) # No-Content
@@ -690,7 +813,7 @@ async def get_timeline_stats_v2(
     check_int_field_api(machine_id, 'machine_id', 1024) # can cause exception
     query, params = get_timeline_query(user, uri, filename, usage_scenario_variables, machine_id, branch, metric, phase, start_date=start_date, end_date=end_date, sorting=sorting, show_archived=show_archived, include_usage_scenario_variables=True)
 
-    data = DB().fetch_all(query, params=params)
+    data = await AsyncDB().fetch_all(query, params=params)
 
     if data is None or data == []:
         return Response(status_code=204) # No-Content
@@ -727,8 +850,8 @@ async def get_timeline_badge(
     if unit not in ('watt-hours', 'joules'):
         raise HTTPException(status_code=422, detail='Requested unit is not in allow list: watt-hours, joules')
     # we believe that there is no injection possible to the artifact store and any string can be constructured here ...
-    if artifact := get_artifact(ArtifactType.BADGE, f"{user._id}_{uri}_{filename}_{machine_id}_{branch}_{metric}_{detail_name}_{unit}"):
-        return Response(content=str(artifact), media_type="image/svg+xml")
+    if badge := get_rendered_artifact(ArtifactType.BADGE, f"{user._id}_{uri}_{filename}_{machine_id}_{branch}_{metric}_{detail_name}_{unit}", bytes):
+        return Response(content=badge, media_type="image/svg+xml")
 
     date_30_days_ago = datetime.now() - timedelta(days=30)
 
@@ -746,7 +869,7 @@ async def get_timeline_badge(
         FROM trend_data;
     """
 
-    data = DB().fetch_one(query, params=params)
+    data = await AsyncDB().fetch_one(query, params=params)
 
     if data is None or data == [] or data[1] is None: # special check for data[1] as this is aggregate query which always returns result
         return Response(status_code=204) # No-Content
@@ -768,7 +891,7 @@ async def get_timeline_badge(
 
     badge_str = str(badge)
 
-    store_artifact(ArtifactType.BADGE, f"{user._id}_{uri}_{filename}_{machine_id}_{branch}_{metric}_{detail_name}_{unit}", badge_str, ex=60*60*12) # 12 hour storage
+    store_rendered_artifact(ArtifactType.BADGE, f"{user._id}_{uri}_{filename}_{machine_id}_{branch}_{metric}_{detail_name}_{unit}", badge_str, badge_str.encode(), ex=60*60*12) # 12 hour storage
 
     return Response(content=badge_str, media_type="image/svg+xml")
 
@@ -793,8 +916,8 @@ async def get_badge_single(run_id: str, metric: str = 'cpu_energy_rapl_msr_compo
         phase = '%_[RUNTIME]'
 
     # we believe that there is no injection possible to the artifact store and any string can be constructured here ...
-    if artifact := get_artifact(ArtifactType.BADGE, f"{user._id}_{run_id}_{metric}_{unit}_{phase}"):
-        return Response(content=str(artifact), media_type="image/svg+xml")
+    if badge := get_rendered_artifact(ArtifactType.BADGE, f"{user._id}_{run_id}_{metric}_{unit}_{phase}", bytes):
+        return Response(content=badge, media_type="image/svg+xml")
 
     query = '''
         SELECT
@@ -812,7 +935,7 @@ async def get_badge_single(run_id: str, metric: str = 'cpu_energy_rapl_msr_compo
 
     params = [user.is_super_user(), user.visible_users(), run_id, metric, phase]
 
-    data = DB().fetch_one(query, params=params)
+    data = await AsyncDB().fetch_one(query, params=params)
 
     if data is None or data == [] or data[1] is None: # special check for data[1] as this is aggregate query which always returns result
         return Response(status_code=204) # No-Content
@@ -862,7 +985,7 @@ async def get_badge_single(run_id: str, metric: str = 'cpu_energy_rapl_msr_compo
 
     badge_str = str(badge)
 
-    store_artifact(ArtifactType.BADGE, f"{user._id}_{run_id}_{metric}_{unit}_{phase}", badge_str)
+    store_rendered_artifact(ArtifactType.BADGE, f"{user._id}_{run_id}_{metric}_{unit}_{phase}", badge_str, badge_str.encode())
 
     return Response(content=badge_str, media_type="image/svg+xml")
 
@@ -898,7 +1021,7 @@ async def get_watchlist(user: User = Depends(authenticate)):
         ORDER BY tp.repo_url ASC;
     '''
     params = (user.is_super_user(), user.visible_users(),)
-    data = DB().fetch_all(query, params=params)
+    data = await AsyncDB().fetch_all(query, params=params)
     if data is None or data == []:
         return Response(status_code=204) # No-Content
 
@@ -937,7 +1060,7 @@ async def runs_add(software: Software, no_url_check: bool = False, user: User =
 
     unique_category_ids = None
     if software.category_ids:
-        result = DB().fetch_one("SELECT array_agg(id) FROM categories WHERE id = ANY(%s)", (software.category_ids,))[0]
+        result = (await AsyncDB().fetch_one("SELECT array_agg(id) FROM categories WHERE id = ANY(%s)", (software.category_ids,)))[0]
         if not result:
             raise HTTPException(status_code=422, detail=f"Categories not known: {software.category_ids}")
 
@@ -948,7 +1071,7 @@ async def runs_add(software: Software, no_url_check: bool = False, user: User =
             raise HTTPException(status_code=422, detail=f"Categories not known: {unknown_ids}")
         unique_category_ids = list(unique_category_ids) # transform back to list so we can insert it. psycopg does not understand sets
 
-    if not DB().fetch_one('SELECT id FROM machines WHERE id=%s AND available=TRUE', params=(software.machine_id,)):
+    if not await AsyncDB().fetch_one('SELECT id FROM machines WHERE id=%s AND available=TRUE', params=(software.machine_id,)):
         raise HTTPException(status_code=422, detail='Machine does not exist')
 
     if not user.can_use_machine(software.machine_id):
@@ -962,7 +1085,7 @@ async def runs_add(software: Software, no_url_check: bool = False, user: User =
 
     if not no_url_check:
         try:
-            utils.check_repo(software.repo_url, software.branch) # if it exists through the git api
+            await run_in_threadpool(utils.check_repo, software.repo_url, software.branch) # if it exists through the git api
         except Exception as exc:
             raise HTTPException(status_code=422, detail=utils.filter_sensitive_data(str(exc))) from exc
 
@@ -978,14 +1101,14 @@ async def runs_add(software: Software, no_url_check: bool = False, user: User =
         if not no_url_check:
             try:
                 if 'tag' in software.schedule_mode:
-                    last_marker = utils.get_repo_last_marker(unencrypted_repo_url, 'tags')
+                    last_marker = await run_in_threadpool(utils.get_repo_last_marker, unencrypted_repo_url, 'tags')
 
                 if 'commit' in software.schedule_mode:
-                    last_marker = utils.get_repo_last_marker(unencrypted_repo_url, 'commits')
+                    last_marker = await run_in_threadpool(utils.get_repo_last_marker, unencrypted_repo_url, 'commits')
             except RuntimeError as exc:
                 raise HTTPException(status_code=422, detail=utils.filter_sensitive_data(str(exc))) from exc
 
-        Watchlist.insert(name=software.name, image_url=software.image_url, repo_url=software.repo_url, branch=software.branch, filename=software.filename, machine_id=software.machine_id, usage_scenario_variables=software.usage_scenario_variables, category_ids=unique_category_ids, carbon_simulation=carbon_simulation, user_id=user._id, schedule_mode=software.schedule_mode, last_marker=last_marker)
+        await run_in_threadpool(Watchlist.insert, name=software.name, image_url=software.image_url, repo_url=software.repo_url, branch=software.branch, filename=software.filename, machine_id=software.machine_id, usage_scenario_variables=software.usage_scenario_variables, category_ids=unique_category_ids, carbon_simulation=carbon_simulation, user_id=user._id, schedule_mode=software.schedule_mode, last_marker=last_marker)
 
     job_ids_inserted = []
 
@@ -997,11 +1120,11 @@ async def runs_add(software: Software, no_url_check: bool = False, user: User =
         amount = 1
 
     for _ in range(0,amount):
-        job_ids_inserted.append(RunJob.insert(user_id=user._id, name=software.name, url=software.repo_url, email=software.email, branch=software.branch, commit_hash=software.commit_hash, filename=software.filename, machine_id=software.machine_id, usage_scenario_variables=software.usage_scenario_variables, category_ids=unique_category_ids, carbon_simulation=carbon_simulation))
+        job_ids_inserted.append(await run_in_threadpool(RunJob.insert, user_id=user._id, name=software.name, url=software.repo_url, email=software.email, branch=software.branch, commit_hash=software.commit_hash, filename=software.filename, machine_id=software.machine_id, usage_scenario_variables=software.usage_scenario_variables, category_ids=unique_category_ids, carbon_simulation=carbon_simulation))
 
     # notify admin of new add
     if notification_email := GlobalConfig().config['admin']['notification_email']:
-        EmailSimpleJob.insert(user_id=user._id, name='New run added from Web Interface', message=pprint.pformat(software.model_dump(), width=60, indent=2), email=notification_email)
+        await run_in_threadpool(EmailSimpleJob.insert, user_id=user._id, name='New run added from Web Interface', message=pprint.pformat(software.model_dump(), width=60, indent=2), email=notification_email)
 
     return CustomORJSONResponse({'success': True, 'data': job_ids_inserted}, status_code=202)
 
@@ -1015,7 +1138,7 @@ async def get_run(run_id: str, user: User = Depends(authenticate)):
     if run_id is None or not is_valid_uuid(run_id):
         raise HTTPException(status_code=422, detail='Run ID is not a valid UUID or empty')
     try:
-        data = get_run_info(user, run_id)
+        data = await get_run_info(user, run_id)
     except HTTPException as err:
         return ORJSONResponseObjKeep({'success': False, 'data': err.detail}, status_code=err.status_code)
 
@@ -1089,7 +1212,7 @@ async def get_optimizations(run_id: str, user: User = Depends(authenticate)):
     '''
 
     params = (user.is_super_user(), user.visible_users(), run_id)
-    data = DB().fetch_all(query, params=params)
+    data = await AsyncDB().fetch_all(query, params=params)
 
     if data is None or data == []:
         return Response(status_code=204) # No-Content
@@ -1112,7 +1235,7 @@ async def diff(ids: str, user: User = Depends(authenticate)):
         return CustomORJSONResponse({'success': True, 'data': artifact})
 
     try:
-        diff_runs = diff_rows(get_diffable_rows(user, ids))
+        diff_runs = diff_rows(await run_in_threadpool(get_diffable_rows, user, ids))
     except ValueError as exc:
         raise HTTPException(status_code=422, detail=str(exc)) from exc
 
@@ -1131,7 +1254,7 @@ async def get_insights(user: User = Depends(authenticate)):
     '''
 
     params = (user.is_super_user(), user.visible_users())
-    data = DB().fetch_one(query, params=params)
+    data = await AsyncDB().fetch_one(query, params=params)
 
     if data is None:
         return Response(status_code=204) # No-Content
@@ -0,0 +1,23 @@
+import faulthandler
+faulthandler.enable()  # will catch segfaults and write to stderr
+
+import os
+
+from lib.global_config import GlobalConfig
+from lib.db import set_pool_profile
+from lib.measurement_archive import archive_expired_runs
+from lib import error_helpers
+
+# Moves the measurement_values of all finished runs older than measurement_archive.after_days
+# to one Parquet file per run in measurement_archive.directory and deletes them from the DB.
+# The API and the phase_stats read archived runs transparently from these files.
+#
+# The directory must be shared with the API container, as it serves the archived values from there.
+
+if __name__ == '__main__':
+    try:
+        GlobalConfig().override_config(config_location=f"{os.path.dirname(os.path.realpath(__file__))}/../manager-config.yml")
+        set_pool_profile('cron')
+        archive_expired_runs()
+    except Exception as exc: # pylint: disable=broad-except
+        error_helpers.log_error(f'Processing in {__file__} failed.', exception=exc, machine=GlobalConfig().config['machine']['description'])
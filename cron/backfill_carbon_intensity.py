@@ -9,11 +9,11 @@ import os
 import json
 import fcntl
 
-import requests
-from cachetools import cached
+import asyncio
 
-from lib.db import DB
+from lib.db import DB, set_pool_profile
 from lib.global_config import GlobalConfig
+from lib import backfill
 from lib import error_helpers
 from lib.utils import runtime_dir
 from lib.cache_definitions import NoNoneOrNegativeValuesCache
@@ -95,20 +95,72 @@ def fetch_carbon_intensity_missing(table):
     return data if data else []
 
 def backfill_carbon_intensity_missing(table, data):
-    query = f"UPDATE {table} SET carbon_intensity_g = %s WHERE id = %s"
-
-    updated_ids = []
-    for row in data:
-        row_id = row[0]
-        row_latitude = row[1]
-        row_longitude = row[2]
-        carbon_intensity_g = get_carbon_intensity(row_latitude, row_longitude)
-        print('Filling', carbon_intensity_g, 'for id', row_id)
-        DB().query(query, params=(carbon_intensity_g, row_id))
+    coordinates = {(row[1], row[2]) for row in data}
+    carbon_intensities = {coordinate: _carbon_intensity_cache[coordinate] for coordinate in coordinates if coordinate in _carbon_intensity_cache}
+
+    resolved, errors = asyncio.run(resolve_carbon_intensities(coordinates - carbon_intensities.keys()))
+    for coordinate, (carbon_intensity_g, _) in resolved.items():
         if carbon_intensity_g is not None:
-            updated_ids.append(row_id)
+            carbon_intensities[coordinate] = _carbon_intensity_cache[coordinate] = carbon_intensity_g
+
+    carbon_intensity_rows = [(*coordinate, json.dumps(resp_data)) for coordinate, (_, resp_data) in resolved.items() if resp_data is not None]
+    if carbon_intensity_rows:
+        DB().query('''
+            INSERT INTO carbon_intensity (latitude, longitude, data)
+            SELECT * FROM unnest(%s::double precision[], %s::double precision[], %s::jsonb[])
+        ''', params=[list(column) for column in zip(*carbon_intensity_rows)])
+
+    if errors:
+        error_helpers.log_error(f"Could not get carbon intensity for {len(errors)} coordinates", errors={str(coordinate): str(exc) for coordinate, exc in errors.items()})
+
+    rows = [(row[0], carbon_intensities[(row[1], row[2])]) for row in data if (row[1], row[2]) in carbon_intensities]
+    for row in rows:
+        print('Filling', row[1], 'for id', row[0])
+
+    return backfill.update_rows_by_id(table, [('carbon_intensity_g', 'double precision')], rows)
+
+# Returns ({(latitude, longitude): (carbon_intensity_g, response)}, {(latitude, longitude): exception})
+async def resolve_carbon_intensities(coordinates):
+    if not coordinates:
+        return {}, {}
+
+    if not (electricitymaps_token := GlobalConfig().config.get('electricity_maps_token')):
+        raise ValueError('You need to specify an electricitymap token in the config!')
+
+    rate_limiter = backfill.get_rate_limiters(CARBON_INTENSITY_RATE_LIMITS)['electricitymaps']
 
-    return updated_ids
+    async def resolve(session, coordinate):
+        return await get_carbon_intensity(session, rate_limiter, electricitymaps_token, *coordinate)
+
+    return await backfill.resolve_keys(coordinates, resolve)
+
+async def get_carbon_intensity(session, rate_limiter, electricitymaps_token, latitude, longitude):
+
+    if electricitymaps_token == 'testing':
+        # If we are running tests we always return 1000
+        return (1000, None)
+
+    headers = {'auth-token': electricitymaps_token }
+    params = {'lat': latitude, 'lon': longitude }
+
+    await rate_limiter.wait()
+    print(f"Accessing electricitymap with {latitude} {longitude}")
+    async with session.get(ELECTRICITY_MAPS_LATEST_URL, params=params, headers=headers) as response:
+        if response.status == 200:
+            resp_data = await response.json(content_type=None)
+            return (resp_data.get('carbonIntensity'), resp_data)
+
+        raise RuntimeError(f"Could not get carbon intensity from Electricitymaps.org for {params}. Response: {response.status} {await response.text()}")
+
+ELECTRICITY_MAPS_LATEST_URL = 'https://api.electricitymap.org/v3/carbon-intensity/latest'
+
+# Requests per second
+CARBON_INTENSITY_RATE_LIMITS = {
+    'electricitymaps': 10,
+}
+
+# Survives between the tables of one cron run, which often share the same coordinates
+_carbon_intensity_cache = NoNoneOrNegativeValuesCache(maxsize=1024, ttl=3600) # 60 Minutes
 
 def update_eco_ci_carbon():
     query = '''
@@ -144,38 +196,10 @@ def update_carbondb_data_raw_carbon():
     return DB().fetch_all(query)
 
 
-# The decorator will not work between workers, but since uvicorn_worker.UvicornWorker is using asyncIO it has some functionality between requests
-@cached(cache=NoNoneOrNegativeValuesCache(maxsize=1024, ttl=3600)) # 60 Minutes
-def get_carbon_intensity(latitude, longitude):
-
-    if latitude is None or longitude is None:
-        error_helpers.log_error('Calling get_carbon_intensity without lat/long')
-        return None
-
-    if not (electricitymaps_token := GlobalConfig().config.get('electricity_maps_token')):
-        raise ValueError('You need to specify an electricitymap token in the config!')
-
-    if electricitymaps_token == 'testing':
-        # If we are running tests we always return 1000
-        return 1000
-
-    headers = {'auth-token': electricitymaps_token }
-    params = {'lat': latitude, 'lon': longitude }
-
-    response = requests.get('https://api.electricitymap.org/v3/carbon-intensity/latest', params=params, headers=headers, timeout=10)
-    print(f"Accessing electricitymap with {latitude} {longitude}")
-    if response.status_code == 200:
-        resp_data = response.json()
-        query = "INSERT INTO carbon_intensity (latitude, longitude, data) VALUES (%s, %s, %s)"
-        DB().query(query=query, params=(latitude, longitude, json.dumps(resp_data)))
-
-        return resp_data.get('carbonIntensity')
-
-    raise RuntimeError(f"Could not get carbon intensity from Electricitymaps.org for {params}. Response: {response}")
-
 if __name__ == '__main__':
     try:
         GlobalConfig().override_config(config_location=f"{os.path.dirname(os.path.realpath(__file__))}/../manager-config.yml")
+        set_pool_profile('cron')
 
         lock_path = os.path.join(runtime_dir(), "gmt_backfill_carbon_intensity.lock")
         with open(lock_path, "w", encoding='UTF-8') as lock_file:
@@ -10,12 +10,13 @@ import fcntl
 
 CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
 
+import asyncio
 import ipaddress
-import requests
-from cachetools import cached
+import aiohttp
 
-from lib.db import DB
+from lib.db import DB, set_pool_profile
 from lib.global_config import GlobalConfig
+from lib import backfill
 from lib import error_helpers
 from lib.utils import runtime_dir
 from lib.cache_definitions import NoNoneOrNegativeValuesCache
@@ -101,125 +102,105 @@ def fetch_geo_missing(table):
     return data if data else []
 
 def backfill_geo_missing(table, data):
-    query = f"UPDATE {table} SET latitude = %s, longitude = %s WHERE id = %s"
+    # ip_address comes back from the DB as ipaddress objects
+    ips = {str(row[1]) for row in data}
+    geo = {ip: _geo_cache[ip] for ip in ips if ip in _geo_cache}
 
-    updated_ids = []
-    for row in data:
-        row_id = row[0]
-        row_ip = row[1]
-        (latitude, longitude) = get_geo(row_ip) # since this function is cached we will not over-query API
-        print('Filling', latitude, longitude, 'for id', row_id)
-        DB().query(query, params=(latitude, longitude, row_id))
-        updated_ids.append(row_id)
+    resolved, errors = asyncio.run(resolve_geo(ips - geo.keys()))
+    for ip, (latitude, longitude, _) in resolved.items():
+        geo[ip] = _geo_cache[ip] = (latitude, longitude)
 
-    return updated_ids
+    ip_data_rows = [(ip, latitude, longitude, *ip_data) for ip, (latitude, longitude, ip_data) in resolved.items() if ip_data is not None]
+    if ip_data_rows:
+        DB().query('''
+            INSERT INTO ip_data (ip_address, latitude, longitude, city, zip, org, country_code)
+            SELECT * FROM unnest(%s::inet[], %s::double precision[], %s::double precision[], %s::text[], %s::text[], %s::text[], %s::text[])
+        ''', params=[list(column) for column in zip(*ip_data_rows)])
 
+    if errors:
+        error_helpers.log_error(f"Could not get Geo-IP for {len(errors)} IPs", errors={ip: str(exc) for ip, exc in errors.items()})
 
-# The decorator will not work between workers, but since uvicorn_worker.UvicornWorker is using asyncIO it has some functionality between requests
-@cached(cache=NoNoneOrNegativeValuesCache(maxsize=1024, ttl=86400)) # 24 hours
-def get_geo(ip):
-    ip_obj = ipaddress.ip_address(ip) # may raise a ValueError
-    if ip_obj.is_private:
-        error_helpers.log_error(f"Private IP was submitted to get_geo {ip}. This is normal in development, but should not happen in production.")
-        return('52.53721666833642', '13.424863870661927')
-
-    latitude, longitude = get_geo_ip_api_com(ip)
-
-    if not latitude:
-        latitude, longitude = get_geo_ipapi_co(ip)
-    if not latitude:
-        latitude, longitude = get_geo_ip_ipinfo(ip)
-    if not latitude:
-        raise RuntimeError(f"Could not get Geo-IP for {ip} after 3 tries")
-
-    return (latitude, longitude)
-
-
-def get_geo_ipapi_co(ip):
-
-    print(f"Accessing https://ipapi.co/{ip}/json/")
-    try:
-        response = requests.get(f"https://ipapi.co/{ip}/json/", timeout=10)
-    except Exception as exc: #pylint: disable=broad-exception-caught
-        error_helpers.log_error('API request to ipapi.co failed ...', exception=exc)
-        return (None, None)
-
-    if response.status_code == 200:
-        resp_data = response.json()
-
-        if 'error' in resp_data or 'latitude' not in resp_data or 'longitude' not in resp_data:
-            return (None, None)
-
-        query = "INSERT INTO ip_data (ip_address, latitude, longitude, city, zip, org, country_code) VALUES (%s, %s, %s, %s, %s, %s, %s)"
-        DB().query(
-            query=query,
-            params=(ip, resp_data['latitude'], resp_data['longitude'], resp_data['city'], resp_data['postal'], resp_data['org'], resp_data['country_code'])
-        )
-
-        return (resp_data['latitude'], resp_data['longitude'])
-
-    error_helpers.log_error(f"Could not get Geo-IP from ipapi.co for {ip}. Trying next ...", response=response)
-
-    return (None, None)
+    rows = [(row[0], *geo[str(row[1])]) for row in data if str(row[1]) in geo]
+    for row in rows:
+        print('Filling', row[1], row[2], 'for id', row[0])
 
-def get_geo_ip_api_com(ip):
+    return backfill.update_rows_by_id(table, [('latitude', 'double precision'), ('longitude', 'double precision')], rows)
 
-    print(f"Accessing http://ip-api.com/json/{ip}")
-    try:
-        response = requests.get(f"http://ip-api.com/json/{ip}", timeout=10)
-    except Exception as exc: #pylint: disable=broad-exception-caught
-        error_helpers.log_error('API request to ip-api.com failed ...', exception=exc)
-        return (None, None)
-
-    if response.status_code == 200:
-        resp_data = response.json()
-
-        if ('status' in resp_data and resp_data.get('status') == 'fail') or 'lat' not in resp_data or 'lon' not in resp_data:
-            return (None, None)
-
-        query = "INSERT INTO ip_data (ip_address, latitude, longitude, city, zip, org, country_code) VALUES (%s, %s, %s, %s, %s, %s, %s)"
-        DB().query(
-            query=query,
-            params=(ip, resp_data['lat'], resp_data['lon'], resp_data['city'], resp_data['zip'], resp_data['org'], resp_data['countryCode'])
-        )
-        return (resp_data['lat'], resp_data['lon'])
+# Returns ({ip: (latitude, longitude, ip_data)}, {ip: exception}). ip_data is (city, zip, org, country_code) of the
+# API response or None if no API was asked
+async def resolve_geo(ips):
+    if not ips:
+        return {}, {}
 
-    error_helpers.log_error(f"Could not get Geo-IP from ip-api.com for {ip}. Trying next ...", response=response)
-
-    return (None, None)
-
-def get_geo_ip_ipinfo(ip):
-
-    print(f"Accessing https://ipinfo.io/{ip}/json")
-    try:
-        response = requests.get(f"https://ipinfo.io/{ip}/json", timeout=10)
-    except Exception as exc: #pylint: disable=broad-exception-caught
-        error_helpers.log_error('API request to ipinfo.io failed ...', exception=exc)
-        return (None, None)
+    rate_limiters = backfill.get_rate_limiters(GEO_RATE_LIMITS)
 
-    if response.status_code == 200:
-        resp_data = response.json()
+    async def resolve(session, ip):
+        return await get_geo(session, rate_limiters, ip)
 
-        if 'bogon' in resp_data or 'loc' not in resp_data:
-            return (None, None)
+    return await backfill.resolve_keys(ips, resolve)
 
-        latitude, longitude = resp_data['loc'].split(',')
-
-        query = "INSERT INTO ip_data (ip_address, latitude, longitude, city, zip, org, country_code) VALUES (%s, %s, %s, %s, %s, %s, %s)"
-        DB().query(
-            query=query,
-            params=(ip, latitude, longitude, resp_data['city'], resp_data['postal'], resp_data['org'], resp_data['country'])
-        )
-
-        return (latitude, longitude)
-
-    error_helpers.log_error(f"Could not get Geo-IP from ipinfo.io for {ip}. Trying next ...", response=response)
-
-    return (None, None)
+async def get_geo(session, rate_limiters, ip):
+    ip_obj = ipaddress.ip_address(ip) # may raise a ValueError
+    if ip_obj.is_private:
+        error_helpers.log_error(f"Private IP was submitted to get_geo {ip}. This is normal in development, but should not happen in production.")
+        return (52.53721666833642, 13.424863870661927, None)
+
+    # the APIs are asked one after another, as the next one is only needed if the previous one fails
+    for provider, url, parse in GEO_PROVIDERS:
+        await rate_limiters[provider].wait()
+        print(f"Accessing {url.format(ip=ip)}")
+        try:
+            async with session.get(url.format(ip=ip)) as response:
+                if response.status != 200:
+                    error_helpers.log_error(f"Could not get Geo-IP from {provider} for {ip}. Trying next ...", status=response.status, response=await response.text())
+                    continue
+                resp_data = await response.json(content_type=None)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as exc:
+            error_helpers.log_error(f"API request to {provider} failed ...", exception=exc)
+            continue
+
+        if (geo := parse(resp_data)) is not None:
+            return geo
+
+    raise RuntimeError(f"Could not get Geo-IP for {ip} after {len(GEO_PROVIDERS)} tries")
+
+def parse_ip_api_com(resp_data):
+    if ('status' in resp_data and resp_data.get('status') == 'fail') or 'lat' not in resp_data or 'lon' not in resp_data:
+        return None
+    return (resp_data['lat'], resp_data['lon'], (resp_data['city'], resp_data['zip'], resp_data['org'], resp_data['countryCode']))
+
+def parse_ipapi_co(resp_data):
+    if 'error' in resp_data or 'latitude' not in resp_data or 'longitude' not in resp_data:
+        return None
+    return (resp_data['latitude'], resp_data['longitude'], (resp_data['city'], resp_data['postal'], resp_data['org'], resp_data['country_code']))
+
+def parse_ipinfo_io(resp_data):
+    if 'bogon' in resp_data or 'loc' not in resp_data:
+        return None
+    latitude, longitude = resp_data['loc'].split(',')
+    return (float(latitude), float(longitude), (resp_data['city'], resp_data['postal'], resp_data['org'], resp_data['country']))
+
+# In the order they are asked
+GEO_PROVIDERS = [
+    ('ip-api.com', 'http://ip-api.com/json/{ip}', parse_ip_api_com),
+    ('ipapi.co', 'https://ipapi.co/{ip}/json/', parse_ipapi_co),
+    ('ipinfo.io', 'https://ipinfo.io/{ip}/json', parse_ipinfo_io),
+]
+
+# Requests per second. The free tier of ip-api.com allows 45 requests per minute
+GEO_RATE_LIMITS = {
+    'ip-api.com': 0.7,
+    'ipapi.co': 1,
+    'ipinfo.io': 5,
+}
+
+# Survives between the tables of one cron run, which often share the same IPs
+_geo_cache = NoNoneOrNegativeValuesCache(maxsize=1024, ttl=86400) # 24 hours
 
 if __name__ == '__main__':
     try:
         GlobalConfig().override_config(config_location=f"{os.path.dirname(os.path.realpath(__file__))}/../manager-config.yml")
+        set_pool_profile('cron')
 
         lock_path = os.path.join(runtime_dir(), "gmt_backfill_geo.lock")
         with open(lock_path, "w", encoding='UTF-8') as lock_file:
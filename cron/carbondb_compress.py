@@ -2,9 +2,10 @@ import faulthandler
 faulthandler.enable()  # will catch segfaults and write to stderr
 
 import os
+import argparse
 
 from lib.global_config import GlobalConfig
-from lib.db import DB
+from lib.db import DB, set_pool_profile
 from lib import error_helpers
 
 # The main job of the compress script is to take all the data from the carbondb_data_raw table
@@ -18,12 +19,16 @@ from lib import error_helpers
 # WHERE array_position(tags, NULL) IS NOT NULL;
 
 
-def compress_carbondb_raw():
-    query = '''
+# Raw rows that were inserted or updated (e.g. carbon_kg backfilled) since the watermark are re-aggregated again
+# if they are at most this old. This catches rows of transactions that were still open when the last compress ran
+WATERMARK_OVERLAP_MINUTES = 60
 
+# Upserts the dimensions of all rows in `source_table`. They only ever grow, so it is enough to pass the rows that changed
+def get_dimensions_query(source_table):
+    return f'''
         INSERT INTO carbondb_types (type, user_ids)
         SELECT type, ARRAY_AGG(DISTINCT user_id)
-        FROM carbondb_data_raw
+        FROM {source_table}
         GROUP BY type
         ON CONFLICT (type) DO UPDATE
         SET user_ids = (
@@ -34,7 +39,7 @@ def compress_carbondb_raw():
 
         INSERT INTO carbondb_machines (machine, user_ids)
         SELECT machine, ARRAY_AGG(DISTINCT user_id)
-        FROM carbondb_data_raw
+        FROM {source_table}
         GROUP BY machine
         ON CONFLICT (machine) DO UPDATE
         SET user_ids = (
@@ -47,7 +52,7 @@ def compress_carbondb_raw():
         SELECT tag, ARRAY_AGG(DISTINCT user_id)
         FROM (
             SELECT unnest(tags) AS tag, user_id
-            FROM carbondb_data_raw
+            FROM {source_table}
         ) sub -- we cannot group by by unnest(tags) so we need a CTE here
         GROUP BY tag
         ON CONFLICT (tag) DO UPDATE
@@ -60,7 +65,7 @@ def compress_carbondb_raw():
 
         INSERT INTO carbondb_sources (source, user_ids)
         SELECT source, ARRAY_AGG(DISTINCT user_id)
-        FROM carbondb_data_raw
+        FROM {source_table}
         GROUP BY source
         ON CONFLICT (source) DO UPDATE
         SET user_ids = (
@@ -71,7 +76,7 @@ def compress_carbondb_raw():
 
         INSERT INTO carbondb_projects (project, user_ids)
         SELECT project, ARRAY_AGG(DISTINCT user_id)
-        FROM carbondb_data_raw
+        FROM {source_table}
         GROUP BY project
         ON CONFLICT (project) DO UPDATE
         SET user_ids = (
@@ -79,16 +84,11 @@ def compress_carbondb_raw():
                 SELECT DISTINCT unnest(carbondb_projects.user_ids || excluded.user_ids)
             )
         );
+    '''
 
-        DROP TABLE IF EXISTS carbondb_data_raw_tmp;
-
-        CREATE TEMPORARY TABLE carbondb_data_raw_tmp AS
-        SELECT *
-        FROM carbondb_data_raw
-        WHERE
-            time > EXTRACT(EPOCH FROM ((NOW() - INTERVAL '60 days')::date::timestamp))*1e6 -- Time filter must be starting from midnight and not include elapsed minutes in the day to work with select later which cuts off time info
-            AND carbon_kg IS NOT NULL; -- guarded in carbondb_copy_over that we do not miss rows continuously;
-
+# Maps the text fields of the rows in carbondb_data_raw_tmp to the ids of their dimensions and sums them up per day.
+# Every group that has rows in carbondb_data_raw_tmp must be complete there, as its daily sum is overwritten
+AGGREGATE_QUERY = '''
         UPDATE carbondb_data_raw_tmp AS cdrt
         SET "type" = s.id
         FROM carbondb_types AS s
@@ -160,13 +160,91 @@ def compress_carbondb_raw():
             carbon_kg_sum = EXCLUDED.carbon_kg_sum,
             carbon_intensity_g_avg = EXCLUDED.carbon_intensity_g_avg,
             record_count = EXCLUDED.record_count;
-    '''
-    DB().query(query)
+'''
+
+def store_watermark(cur):
+    cur.execute('''
+        INSERT INTO carbondb_compress_watermark (id, processed_until)
+        VALUES (1, NOW())
+        ON CONFLICT (id) DO UPDATE SET processed_until = EXCLUDED.processed_until
+    ''')
+
+def compress_all(cur):
+    cur.execute(get_dimensions_query('carbondb_data_raw') + '''
+        DROP TABLE IF EXISTS carbondb_data_raw_tmp;
+
+        CREATE TEMPORARY TABLE carbondb_data_raw_tmp ON COMMIT DROP AS
+        SELECT *
+        FROM carbondb_data_raw
+        WHERE
+            time > EXTRACT(EPOCH FROM ((NOW() - INTERVAL '60 days')::date::timestamp))*1e6 -- Time filter must be starting from midnight and not include elapsed minutes in the day to work with select later which cuts off time info
+            AND carbon_kg IS NOT NULL; -- guarded in carbondb_copy_over that we do not miss rows continuously;
+    ''' + AGGREGATE_QUERY)
+    store_watermark(cur) # NOW() is the start of the transaction, so every row changed later is newer than it
+
+# Recomputes the daily sums of the last 60 days from all raw rows
+def compress_carbondb_raw():
+    with DB().transaction_cursor() as cur:
+        compress_all(cur)
+
+# Only recomputes the daily sums of the (type, source, machine, project, tags, day, user) groups that received
+# new or updated raw rows since the last compress. The cost thus follows the amount of new rows and not the 60 days.
+# Raw rows are only deleted as duplicates by remove_duplicates() (carbondb_copy_over_and_remove_duplicates.py), which
+# sets updated_at of the identical row it keeps. So the group of a deleted row is always recomputed as well.
+# Falls back to a full compress if there is no watermark yet
+def compress_carbondb_raw_incremental():
+    with DB().transaction_cursor() as cur:
+        cur.execute('SELECT processed_until FROM carbondb_compress_watermark WHERE id = 1')
+        watermark = cur.fetchone()
+        if watermark is None:
+            compress_all(cur)
+            return
+
+        cur.execute('''
+            CREATE TEMPORARY TABLE carbondb_data_raw_changed ON COMMIT DROP AS
+            SELECT *
+            FROM carbondb_data_raw
+            WHERE COALESCE(updated_at, created_at) > %s - make_interval(mins => %s)
+        ''', (watermark[0], WATERMARK_OVERLAP_MINUTES))
+
+        cur.execute(get_dimensions_query('carbondb_data_raw_changed'))
+
+        # All rows of the changed groups. The day is passed as time range so the time index can be used
+        cur.execute('''
+            CREATE TEMPORARY TABLE carbondb_data_raw_tmp ON COMMIT DROP AS
+            SELECT cdr.*
+            FROM (
+                SELECT DISTINCT type, source, machine, project, tags, user_id, DATE_TRUNC('day', TO_TIMESTAMP(time / 1000000)) AS day
+                FROM carbondb_data_raw_changed
+                WHERE time > EXTRACT(EPOCH FROM ((NOW() - INTERVAL '60 days')::date::timestamp))*1e6 -- same window as the full compress
+            ) AS changed
+            JOIN carbondb_data_raw AS cdr ON
+                cdr.time >= (EXTRACT(EPOCH FROM changed.day)*1e6)::bigint
+                AND cdr.time < (EXTRACT(EPOCH FROM changed.day + INTERVAL '1 day')*1e6)::bigint
+                AND cdr.type = changed.type
+                AND cdr.user_id = changed.user_id
+                AND cdr.source = changed.source
+                AND cdr.machine = changed.machine
+                AND cdr.project = changed.project
+                AND cdr.tags = changed.tags
+            WHERE cdr.carbon_kg IS NOT NULL
+        ''')
+
+        cur.execute(AGGREGATE_QUERY)
+        store_watermark(cur)
 
 
 if __name__ == '__main__':
     try:
+        parser = argparse.ArgumentParser()
+        parser.add_argument('--full', action='store_true', help='Recompute all daily sums of the last 60 days instead of only the ones with new data')
+        args = parser.parse_args()
+
         GlobalConfig().override_config(config_location=f"{os.path.dirname(os.path.realpath(__file__))}/../manager-config.yml")
-        compress_carbondb_raw()
+        set_pool_profile('cron')
+        if args.full:
+            compress_carbondb_raw()
+        else:
+            compress_carbondb_raw_incremental()
     except Exception as exc: # pylint: disable=broad-except
         error_helpers.log_error(f'Processing in {__file__} failed.', exception=exc, machine=GlobalConfig().config['machine']['description'])
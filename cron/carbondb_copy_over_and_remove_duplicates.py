@@ -4,7 +4,7 @@ faulthandler.enable()  # will catch segfaults and write to stderr
 import os
 
 from lib.global_config import GlobalConfig
-from lib.db import DB
+from lib.db import DB, set_pool_profile
 from lib import error_helpers
 
 
@@ -125,28 +125,41 @@ def validate_table_constraints():
     if data:
         raise RuntimeError(f"NULL values found `carbondb_data_raw` - {data}")
 
+# The surviving row of every deleted duplicate gets a new updated_at, so that the incremental compress
+# (cron/carbondb_compress.py) recomputes the daily sum the duplicate was counted in
 def remove_duplicates():
     DB().query('''
-        DELETE FROM carbondb_data_raw a
-        USING carbondb_data_raw b
-        WHERE
-            a.ctid < b.ctid
-            AND a.time = b.time
-            AND a.machine = b.machine
-            AND a.type = b.type
-            AND a.project = b.project
-            AND a.source = b.source
-            AND a.tags = b.tags
-            AND a.energy_kwh = b.energy_kwh
-            AND a.carbon_kg = b.carbon_kg -- if this column is null the rows will simply not match. so not problematic. we check later with validate_table_constraints
-            AND a.user_id = b.user_id
-            AND a.time > EXTRACT(EPOCH FROM ((NOW() - INTERVAL '60 days')::date::timestamp))*1e6 -- 30 days is the merge window. Until then we allow old data to arrive. But we copy a larger timespan in case server errors happend or the job did not run for a couple of days. In case this is reduced choose at least 31 days to avoid race conditions - Time filter must be starting from midnight and not include elapsed minutes in the day to work with copy over which cuts off time info
+        WITH deleted AS (
+            DELETE FROM carbondb_data_raw a
+            USING carbondb_data_raw b
+            WHERE
+                a.ctid < b.ctid
+                AND a.time = b.time
+                AND a.machine = b.machine
+                AND a.type = b.type
+                AND a.project = b.project
+                AND a.source = b.source
+                AND a.tags = b.tags
+                AND a.energy_kwh = b.energy_kwh
+                AND a.carbon_kg = b.carbon_kg -- if this column is null the rows will simply not match. so not problematic. we check later with validate_table_constraints
+                AND a.user_id = b.user_id
+                AND a.time > EXTRACT(EPOCH FROM ((NOW() - INTERVAL '60 days')::date::timestamp))*1e6 -- 30 days is the merge window. Until then we allow old data to arrive. But we copy a larger timespan in case server errors happend or the job did not run for a couple of days. In case this is reduced choose at least 31 days to avoid race conditions - Time filter must be starting from midnight and not include elapsed minutes in the day to work with copy over which cuts off time info
+            RETURNING a.id AS deleted_id, b.id AS kept_id
+        )
+        UPDATE carbondb_data_raw
+        SET updated_at = NOW()
+        WHERE id IN (
+            SELECT kept_id FROM deleted
+            EXCEPT
+            SELECT deleted_id FROM deleted -- with more than two duplicates the row a duplicate was matched with might be deleted itself
+        )
     ''')
 
 
 if __name__ == '__main__':
     try:
         GlobalConfig().override_config(config_location=f"{os.path.dirname(os.path.realpath(__file__))}/../manager-config.yml")
+        set_pool_profile('cron')
         print('copy_over_eco_ci')
         copy_over_eco_ci()
         print('copy_over_scenario_runner')
@@ -0,0 +1,25 @@
+import faulthandler
+faulthandler.enable()  # will catch segfaults and write to stderr
+
+import os
+
+from lib.global_config import GlobalConfig
+from lib.db import set_pool_profile
+from lib.measurement_partitions import create_measurement_partitions, expire_measurement_partitions
+from lib import error_helpers
+
+# Maintains the partitions of measurement_values. See lib/measurement_partitions.py
+# Creates the partitions for the upcoming measurement_metric_ids and detaches (or drops) the partitions
+# that only hold values of runs older than measurement_partitions.retention_days.
+# Should run at least daily, so that new values do not pile up in the default partition.
+
+if __name__ == '__main__':
+    try:
+        GlobalConfig().override_config(config_location=f"{os.path.dirname(os.path.realpath(__file__))}/../manager-config.yml")
+        set_pool_profile('cron')
+        for partition in create_measurement_partitions():
+            print(f"Created partition {partition}")
+        for partition in expire_measurement_partitions():
+            print(f"Expired partition {partition}")
+    except Exception as exc: # pylint: disable=broad-except
+        error_helpers.log_error(f'Processing in {__file__} failed.', exception=exc, machine=GlobalConfig().config['machine']['description'])
@@ -11,7 +11,7 @@ import argparse
 CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
 
 from lib.global_config import GlobalConfig
-from lib.db import DB
+from lib.db import DB, set_pool_profile
 from lib.job.run import RunJob
 from lib import utils
 from lib import error_helpers
@@ -84,6 +84,7 @@ if __name__ == '__main__':
         parser.add_argument('mode', choices=['show', 'schedule'], help='Show will show all Watchlist items. Schedule will insert a job.')
 
         args = parser.parse_args()  # script will exit if arguments not present
+        set_pool_profile('cron')
 
         if args.mode == 'show':
             show_query = """
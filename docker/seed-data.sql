@@ -61,6 +61,7 @@ VALUES (
                 "/v1/compare",
                 "/v1/phase_stats/single/{run_id}",
                 "/v1/measurements/single/{run_id}",
+                "/v1/measurements/single/{run_id}/stream",
                 "/v1/diff",
                 "/v2/run/{run_id}",
                 "/v1/optimizations/{run_id}",
@@ -93,7 +94,8 @@ VALUES (
                 "/v2/hog/details",
                 "/v1/run/{run_id}",
                 "/v1/system-logs",
-                "/v1/system-log"
+                "/v1/system-log",
+                "/v1/db-pool-stats"
             ]
         },
         "data": {
@@ -137,15 +137,20 @@ CREATE UNIQUE INDEX measurement_metrics_get ON measurement_metrics(run_id,metric
 CREATE INDEX measurement_metrics_build_and_store_phase_stats ON measurement_metrics(run_id,metric,detail_name,unit);
 CREATE INDEX measurement_metrics_build_phases ON measurement_metrics(metric,detail_name,unit);
 
+-- Range partitioned by measurement_metric_id. Further partitions are created ahead and expired ones detached
+-- by cron/measurement_partitions.py. See lib/measurement_partitions.py
 CREATE TABLE measurement_values (
     measurement_metric_id int NOT NULL REFERENCES measurement_metrics(id) ON DELETE CASCADE ON UPDATE CASCADE,
     value bigint NOT NULL,
     time bigint NOT NULL
-);
+) PARTITION BY RANGE (measurement_metric_id);
 
-CREATE UNIQUE INDEX measurement_values_pkey ON measurement_values(measurement_metric_id, time);
 -- Primary key as compound. Although not strictly necessary postgres seems to be able to do vacuum more efficient with a primary key
-ALTER TABLE measurement_values ADD CONSTRAINT measurement_values_pkey PRIMARY KEY USING INDEX measurement_values_pkey;
+ALTER TABLE measurement_values ADD CONSTRAINT measurement_values_pkey PRIMARY KEY (measurement_metric_id, time);
+
+CREATE TABLE measurement_values_p0 PARTITION OF measurement_values FOR VALUES FROM (MINVALUE) TO (100000);
+-- catches all values for which the cron has not created a partition yet
+CREATE TABLE measurement_values_default PARTITION OF measurement_values DEFAULT;
 
 CREATE TABLE network_intercepts (
     id integer GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
@@ -357,6 +362,25 @@ CREATE TABLE carbon_intensity (
     PRIMARY KEY (latitude, longitude, created_at)
 );
 
+-- Grid carbon intensity series fetched by the carbon intensity metric providers. See lib/carbon_intensity_cache.py
+CREATE TABLE grid_carbon_intensity_cache (
+    series text NOT NULL,
+    time bigint NOT NULL,
+    value DOUBLE PRECISION NOT NULL,
+    created_at timestamp with time zone NOT NULL DEFAULT now(),
+    PRIMARY KEY (series, time)
+);
+
+CREATE TABLE grid_carbon_intensity_cache_coverage (
+    id integer GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    series text NOT NULL,
+    start_time bigint NOT NULL,
+    end_time bigint NOT NULL,
+    expires_at timestamp with time zone, -- NULL for time ranges the provider will not change anymore
+    created_at timestamp with time zone NOT NULL DEFAULT now()
+);
+CREATE INDEX grid_carbon_intensity_cache_coverage_series ON grid_carbon_intensity_cache_coverage(series, start_time);
+
 CREATE TABLE cluster_changelog (
     id integer GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
     message text NOT NULL,
@@ -454,6 +478,7 @@ CREATE TABLE carbondb_data_raw (
 
 CREATE INDEX carbondb_data_raw_time_type_user_idx ON carbondb_data_raw (time, type, user_id);
 CREATE INDEX "carbondb_data_raw_backfill_geo" ON "carbondb_data_raw"("latitude","longitude","carbon_intensity_g","created_at");
+CREATE INDEX carbondb_data_raw_changed_at ON carbondb_data_raw ((COALESCE(updated_at, created_at))); -- rows the incremental compress has not processed yet
 
 CREATE TRIGGER carbondb_data_raw_moddatetime
     BEFORE UPDATE ON carbondb_data_raw
@@ -480,6 +505,12 @@ CREATE TABLE carbondb_data (
 
 CREATE UNIQUE INDEX carbondb_data_unique_entry ON carbondb_data(type ,project ,machine ,source ,tags ,date ,user_id) NULLS NOT DISTINCT;
 
+-- raw rows changed before processed_until are already compressed into carbondb_data. See cron/carbondb_compress.py
+CREATE TABLE carbondb_compress_watermark (
+    id integer PRIMARY KEY CHECK (id = 1),
+    processed_until timestamp with time zone NOT NULL
+);
+
 CREATE VIEW carbondb_data_view AS
 SELECT cd.*, t.type as type_str, s.source as source_str, m.machine as machine_str, p.project as project_str FROM carbondb_data as cd
 LEFT JOIN carbondb_types as t ON cd.type = t.id
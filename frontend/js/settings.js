@@ -241,6 +241,15 @@ const showDisplayTextTimeSeriesAVG = (time_series_avg) => {
     else $("#time-series-avg-display").html("Currently <b>not showing</b> AVG in time series");
 }
 
+const toggleDownsampleTimeSeries = () => {
+    const downsample_time_series = localStorage.getItem('downsample_time_series') === 'true';
+    localStorage.setItem('downsample_time_series', !downsample_time_series);
+    showDisplayTextDownsampleTimeSeries(!downsample_time_series)
+}
+const showDisplayTextDownsampleTimeSeries = (downsample_time_series) => {
+    if(downsample_time_series) $("#downsample-time-series-display").html("Currently <b>downsampling</b> time series");
+    else $("#downsample-time-series-display").html("Currently showing time series in <b>full resolution</b>");
+}
 
 const resetHelpTexts = () => {
     localStorage.setItem('closed_descriptions', '');
@@ -259,6 +268,7 @@ const resetHelpTexts = () => {
         showDisplayTextMetricUnits(localStorage.getItem('display_in_metric_units') === 'true')
         showDisplayTextTimeSeries(localStorage.getItem('fetch_time_series') === 'true')
         showDisplayTextTimeSeriesAVG(localStorage.getItem('time_series_avg') === 'true')
+        showDisplayTextDownsampleTimeSeries(localStorage.getItem('downsample_time_series') === 'true')
         getSettings();
     });
 
@@ -1033,7 +1033,9 @@ const fetchTimelineData = async (run_id) => {
 
     let measurements = null;
     try {
-        measurements = await makeAPICall('/v1/measurements/single/' + run_id)
+        // downsampled on the server to at most 2000 points per series. Energy is summed per bucket, so power timelines stay correct
+        const downsample_time_series = localStorage.getItem('downsample_time_series') === 'true';
+        measurements = await makeAPICall('/v1/measurements/single/' + run_id + (downsample_time_series ? '?max_points=2000' : ''))
     } catch (err) {
         showNotification('Could not get stats data from API', err);
     }
@@ -0,0 +1,150 @@
+from enum import Enum
+import re
+import redis
+
+from lib.global_config import GlobalConfig
+from lib.cache_definitions import NoNoneOrNegativeValuesCache
+from lib import error_helpers
+
+# Two level cache for the artifacts the API computes from the DB (compare and stats objects, badges etc.)
+#
+# L2 is Redis. It is shared by all API workers and keeps the artifacts for days.
+# L1 lives in every API worker process and holds the artifacts already rendered into what the route sends
+# (e.g. the complete JSON response body). A hit there needs neither a network round trip nor parsing.
+# L1 is bounded by the summed size of its values and evicts the least recently used ones first. Its TTL is short,
+# as the L1 of other workers cannot be invalidated from the outside. See invalidate_phase_stats_artifacts()
+
+# Every type is stored in its own Redis DB. The value is the DB number
+ArtifactType = Enum('ArtifactType', ['DIFF', 'COMPARE', 'STATS', 'BADGE', 'SOFTWARE'])
+
+# These artifacts are computed from the phase_stats and are stale once the phase_stats of a run are rebuilt
+PHASE_STATS_ARTIFACT_TYPES = (ArtifactType.COMPARE, ArtifactType.STATS, ArtifactType.BADGE)
+
+# One connection pool per artifact DB and worker process, so a cache lookup reuses an open connection
+# instead of paying a new TCP handshake every time. redis-py resets the pools itself after a fork
+_redis_pools = {}
+
+# Cache hits and misses of this worker process per artifact type
+artifact_cache_stats = {}
+
+_l1_config = (GlobalConfig().config.get('redis') or {}).get('l1_cache') or {}
+_l1_cache = NoNoneOrNegativeValuesCache(
+    maxsize=_l1_config.get('max_bytes', 64*1024*1024),
+    ttl=_l1_config.get('ttl', 60),
+    getsizeof=len,
+)
+
+def _get_redis_client(artifact_type: Enum, decode_responses=True):
+    host = GlobalConfig().config['redis']['host']
+    port = GlobalConfig().config['redis']['port']
+    if not host:
+        return None
+
+    pool_key = (host, port, artifact_type.value, decode_responses)
+    if pool_key not in _redis_pools:
+        _redis_pools[pool_key] = redis.ConnectionPool(host=host, port=port, db=artifact_type.value, protocol=3, decode_responses=decode_responses)
+    return redis.Redis(connection_pool=_redis_pools[pool_key])
+
+def _count_artifact_lookups(artifact_type: Enum, l1_hits=0, hits=0, misses=0):
+    stats = artifact_cache_stats.setdefault(artifact_type.name, {'l1_hits': 0, 'hits': 0, 'misses': 0})
+    stats['l1_hits'] += l1_hits
+    stats['hits'] += hits
+    stats['misses'] += misses
+
+def get_artifact(artifact_type: Enum, key: str, decode_responses=True):
+    return get_artifacts(artifact_type, [key], decode_responses=decode_responses)[0]
+
+# Looks up several keys in one round trip. Returns the artifacts in the order of the keys and None for every miss
+def get_artifacts(artifact_type: Enum, keys: list, decode_responses=True):
+    r = _get_redis_client(artifact_type, decode_responses)
+    if r is None or not keys:
+        return [None] * len(keys)
+
+    try:
+        data = r.mget(keys)
+    except redis.RedisError as e:
+        error_helpers.log_error('Redis get_artifacts failed', exception=e)
+        return [None] * len(keys)
+
+    data = [None if artifact is None or artifact == [] else artifact for artifact in data]
+    hits = sum(artifact is not None for artifact in data)
+    _count_artifact_lookups(artifact_type, hits=hits, misses=len(data) - hits)
+    return data
+
+def store_artifact(artifact_type: Enum, key:str, data, ex=2592000):
+    store_artifacts(artifact_type, {key: data}, ex=ex)
+
+# Stores several artifacts in one round trip. Expiration => 2592000 = 30 days
+def store_artifacts(artifact_type: Enum, artifacts: dict, ex=2592000):
+    r = _get_redis_client(artifact_type)
+    if r is None or not artifacts:
+        return
+
+    try:
+        # no transaction, as the artifacts are independent of each other
+        with r.pipeline(transaction=False) as pipe:
+            for key, data in artifacts.items():
+                pipe.set(key, data, ex=ex)
+            pipe.execute()
+    except redis.RedisError as e:
+        error_helpers.log_error('Redis store_artifacts failed', exception=e)
+
+def _store_l1(artifact_type: Enum, key: str, rendered: bytes):
+    try:
+        _l1_cache[(artifact_type.name, key)] = rendered
+    except ValueError: # bigger than the whole cache
+        pass
+
+# Looks up the artifact in L1 first and then in Redis. `render` turns the raw artifact bytes from Redis
+# into the bytes that are kept in L1 and returned
+def get_rendered_artifact(artifact_type: Enum, key: str, render):
+    if (rendered := _l1_cache.get((artifact_type.name, key))) is not None:
+        _count_artifact_lookups(artifact_type, l1_hits=1)
+        return rendered
+
+    if (artifact := get_artifact(artifact_type, key, decode_responses=False)) is None:
+        return None
+
+    rendered = render(artifact)
+    _store_l1(artifact_type, key, rendered)
+    return rendered
+
+# Stores the raw artifact in Redis and its rendered form in L1
+def store_rendered_artifact(artifact_type: Enum, key: str, data, rendered: bytes, ex=2592000):
+    store_artifact(artifact_type, key, data, ex=ex)
+    _store_l1(artifact_type, key, rendered)
+
+# Badges of a single run are keyed <user_id>_<run_id>_<metric>_<unit>_<phase>. Badges of the timeline are keyed
+# by the repo uri instead and are computed over many runs
+RUN_BADGE_KEY_REGEX = re.compile(r'^[^_]*_[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}_')
+
+def _is_phase_stats_artifact(artifact_type_name, key, run_id):
+    if run_id is not None:
+        return run_id in key
+    return artifact_type_name != ArtifactType.BADGE.name or RUN_BADGE_KEY_REGEX.match(key) is not None
+
+# Removes the artifacts that were computed from the phase_stats of a run, or of all runs if run_id is None.
+# Artifact keys of a run contain its id (e.g. <user_id>_<run_id>_... or the list of compared ids).
+# Must be called after the phase_stats are rebuilt. L1 can only be cleared in the calling process. The other
+# API workers keep serving their L1 copy until the TTL of it ran out.
+# Badges of the timeline are not removed, also not if run_id is None. They expire after 12 hours
+def invalidate_phase_stats_artifacts(run_id=None):
+    phase_stats_artifact_type_names = [artifact_type.name for artifact_type in PHASE_STATS_ARTIFACT_TYPES]
+    for l1_key in list(_l1_cache.keys()):
+        if l1_key[0] in phase_stats_artifact_type_names and _is_phase_stats_artifact(l1_key[0], l1_key[1], run_id):
+            _l1_cache.pop(l1_key, None)
+
+    for artifact_type in PHASE_STATS_ARTIFACT_TYPES:
+        r = _get_redis_client(artifact_type)
+        if r is None:
+            return
+        try:
+            if run_id is None and artifact_type != ArtifactType.BADGE:
+                r.flushdb()
+                continue
+            match = '*' if run_id is None else f"*{run_id}*" # run ids are UUIDs and contain no glob characters
+            keys = [key for key in r.scan_iter(match=match, count=1000) if _is_phase_stats_artifact(artifact_type.name, key, run_id)]
+            if keys:
+                r.unlink(*keys)
+        except redis.RedisError as e:
+            error_helpers.log_error('Redis invalidate_phase_stats_artifacts failed', exception=e, run_id=run_id)
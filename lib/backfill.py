@@ -0,0 +1,79 @@
+import asyncio
+import time
+
+import aiohttp
+from psycopg import sql
+
+from lib.db import DB
+from lib.global_config import GlobalConfig
+
+# Shared engine of the backfill crons (cron/backfill_geo.py, cron/backfill_carbon_intensity.py).
+#
+# The rows with missing data are reduced to the distinct keys (IPs, coordinates) first, so every key is only
+# resolved once. The keys are then resolved concurrently by a bounded number of workers that share one HTTP
+# session, while every remote API gets its own rate limit. The results are written back with one set based
+# UPDATE per table instead of one UPDATE per row.
+
+def get_backfill_config():
+    return GlobalConfig().config.get('backfill') or {}
+
+# Spaces the requests to one API evenly, so a burst of workers does not exceed its rate limit.
+# No lock is needed, as the asyncio workers only switch at an await
+class RateLimiter:
+    def __init__(self, requests_per_second=None):
+        self._interval = 1 / requests_per_second if requests_per_second else 0
+        self._next_time = 0
+
+    async def wait(self):
+        now = time.monotonic()
+        delay = self._next_time - now
+        self._next_time = max(now, self._next_time) + self._interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+def get_rate_limiters(default_rate_limits):
+    rate_limits = {**default_rate_limits, **(get_backfill_config().get('rate_limits') or {})}
+    return {provider: RateLimiter(requests_per_second) for provider, requests_per_second in rate_limits.items()}
+
+# Resolves every key with `await resolve(session, key)` with at most `concurrency` requests in flight.
+# Returns ({key: result}, {key: exception}). A failing key does not stop the others
+async def resolve_keys(keys, resolve, concurrency=None, timeout=10):
+    if concurrency is None:
+        concurrency = get_backfill_config().get('concurrency', 8)
+    semaphore = asyncio.Semaphore(concurrency)
+    results = {}
+    errors = {}
+
+    async def worker(session, key):
+        async with semaphore:
+            try:
+                results[key] = await resolve(session, key)
+            except Exception as exc: # pylint: disable=broad-exception-caught
+                errors[key] = exc
+
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+        await asyncio.gather(*(worker(session, key) for key in keys))
+
+    return results, errors
+
+# Sets `columns` [(name, postgres type)] of the rows [(id, value, ...)] of `table` in one statement.
+# The values are passed as one array per column, so the statement does not grow with the number of rows.
+# Returns the ids of the updated rows
+def update_rows_by_id(table, columns, rows):
+    if not rows:
+        return []
+
+    query = sql.SQL('''
+        UPDATE {table} AS t
+        SET {assignments}
+        FROM unnest(%s::bigint[], {arrays}) AS v(id, {names})
+        WHERE t.id = v.id
+        RETURNING t.id
+    ''').format(
+        table=sql.Identifier(table),
+        assignments=sql.SQL(', ').join(sql.SQL('{name} = v.{name}').format(name=sql.Identifier(name)) for name, _ in columns),
+        arrays=sql.SQL(', ').join(sql.SQL(f"%s::{pg_type}[]") for _, pg_type in columns),
+        names=sql.SQL(', ').join(sql.Identifier(name) for name, _ in columns),
+    )
+
+    return [row[0] for row in DB().fetch_all(query, params=[list(column) for column in zip(*rows)])]
@@ -4,6 +4,8 @@
 #include <time.h>
 #include <sys/time.h>
 #include <stdbool.h>
+#include <stddef.h>
+#include <stdint.h>
 
 int check_path(const char* path);
 unsigned int parse_int(char *argument);
@@ -13,6 +15,10 @@ void get_adjusted_time(struct timeval *adjusted, struct timespec *offset);
 bool is_partition_sysfs(unsigned int major_number, unsigned int minor_number);
 unsigned int get_min_sleep_time_ms(void);
 void validate_min_sleep_time(unsigned int msleep_time, unsigned int min_msleep_time_ms);
+int64_t timeval_to_us(struct timeval *time);
+void enable_binary_output(void);
+bool binary_output_stopped(void);
+void write_binary_record(const int64_t *fields, size_t field_count);
 
 
 #endif // GMT_LIB_H
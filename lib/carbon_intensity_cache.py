@@ -0,0 +1,173 @@
+from datetime import datetime, timezone
+
+from lib.db import DB
+from lib.global_config import GlobalConfig
+from lib import error_helpers
+
+# Shared cache of the grid carbon intensity series the carbon intensity metric providers fetch from remote APIs.
+#
+# Runs on the same machine or in the same zone request mostly overlapping time ranges. The values are stored in
+# the DB per series (e.g. electricity_maps/DE) together with the time ranges that were fetched. A provider then
+# only requests the sub-ranges that are not covered yet and reads everything else from the DB.
+#
+# Providers publish their data with a delay and revise recent values. So only ranges older than `settle_minutes`
+# are covered forever. More recent ranges are covered for `refresh_minutes` only and then fetched again.
+# If the API cannot be reached the cached values are used, so a run does not fail on a short outage.
+
+def get_cache_config():
+    config = GlobalConfig().config.get('carbon_intensity_cache')
+    if not config:
+        return None
+    return {
+        'settle_minutes': config.get('settle_minutes', 120),
+        'refresh_minutes': config.get('refresh_minutes', 5),
+        'forecast_ttl_minutes': config.get('forecast_ttl_minutes', 60),
+    }
+
+def to_datetime(time_us):
+    return datetime.fromtimestamp(time_us / 1_000_000, tz=timezone.utc)
+
+# Returns the sub-ranges of [start_us, end_us] that are not in `covered_ranges`, which must be sorted by start.
+# Ranges are inclusive. A value exactly on the border of two ranges is fetched twice, which does no harm
+def get_missing_ranges(start_us, end_us, covered_ranges):
+    missing = []
+    cursor = start_us
+    for covered_start, covered_end in covered_ranges:
+        if covered_end < cursor:
+            continue
+        if covered_start > end_us:
+            break
+        if covered_start > cursor:
+            missing.append((cursor, covered_start))
+        cursor = max(cursor, covered_end)
+    if cursor < end_us:
+        missing.append((cursor, end_us))
+    return missing
+
+def _get_covered_ranges(series, start_us, end_us):
+    return DB().fetch_all('''
+        SELECT start_time, end_time
+        FROM grid_carbon_intensity_cache_coverage
+        WHERE series = %s AND start_time <= %s AND end_time >= %s AND (expires_at IS NULL OR expires_at > NOW())
+        ORDER BY start_time ASC
+    ''', params=(series, end_us, start_us))
+
+def _store_values(series, values):
+    if not values:
+        return
+    times, intensities = zip(*values)
+    DB().query('''
+        INSERT INTO grid_carbon_intensity_cache (series, time, value)
+        SELECT %s, time, value FROM unnest(%s::bigint[], %s::double precision[]) AS v(time, value)
+        ON CONFLICT (series, time) DO UPDATE SET value = EXCLUDED.value, created_at = NOW()
+    ''', params=(series, list(times), list(intensities)))
+
+# Expired ranges are removed. Covered ranges that will not change anymore are merged with the ones they overlap,
+# so the list per series stays short
+def _store_covered_range(series, start_us, end_us, expires_minutes=None):
+    if expires_minutes is not None:
+        DB().query('DELETE FROM grid_carbon_intensity_cache_coverage WHERE series = %s AND expires_at <= NOW()', params=(series, ))
+        DB().query('''
+            INSERT INTO grid_carbon_intensity_cache_coverage (series, start_time, end_time, expires_at)
+            VALUES (%s, %s, %s, NOW() + make_interval(mins => %s))
+        ''', params=(series, start_us, end_us, expires_minutes))
+        return
+
+    DB().query('''
+        WITH merged AS (
+            DELETE FROM grid_carbon_intensity_cache_coverage
+            WHERE series = %s AND expires_at IS NULL AND start_time <= %s AND end_time >= %s
+            RETURNING start_time, end_time
+        )
+        INSERT INTO grid_carbon_intensity_cache_coverage (series, start_time, end_time)
+        SELECT %s, LEAST(%s, MIN(start_time)), GREATEST(%s, MAX(end_time)) FROM merged
+    ''', params=(series, end_us, start_us, series, start_us, end_us))
+
+def _read_values(series, start_us, end_us):
+    return DB().fetch_all('''
+        SELECT time, value
+        FROM grid_carbon_intensity_cache
+        WHERE series = %s AND time BETWEEN %s AND %s
+        ORDER BY time ASC
+    ''', params=(series, start_us, end_us))
+
+def _read_last_value_before(series, time_us):
+    return DB().fetch_all('''
+        SELECT time, value
+        FROM grid_carbon_intensity_cache
+        WHERE series = %s AND time < %s
+        ORDER BY time DESC
+        LIMIT 1
+    ''', params=(series, time_us))
+
+# Returns the (time, value) tuples of `series` between start_us and end_us sorted by time, preceded by the last
+# value before start_us if there is one. The APIs also return the bucket start_us lies in, which providers use for
+# runs shorter than their granularity.
+# `fetch(start_us, end_us)` must return the (time, value) tuples of the remote API for that range and raise a
+# RuntimeError if the API cannot be queried. Without the cache being configured it is just called for the whole range
+def get_series(series, start_us, end_us, fetch):
+    config = get_cache_config()
+    if config is None:
+        return fetch(start_us, end_us)
+
+    settled_until_us = int(datetime.now(timezone.utc).timestamp() * 1_000_000) - config['settle_minutes'] * 60_000_000
+
+    for missing_start, missing_end in get_missing_ranges(start_us, end_us, _get_covered_ranges(series, start_us, end_us)):
+        try:
+            values = fetch(missing_start, missing_end)
+        except RuntimeError as exc:
+            cached = _read_last_value_before(series, start_us) + _read_values(series, start_us, end_us)
+            if not cached:
+                raise
+            error_helpers.log_error('Carbon intensity API could not be queried. Using the cached values instead', exception=exc, series=series)
+            return cached
+
+        _store_values(series, values)
+        if missing_start <= settled_until_us:
+            _store_covered_range(series, missing_start, min(missing_end, settled_until_us))
+        if missing_end > settled_until_us:
+            _store_covered_range(series, max(missing_start, settled_until_us), missing_end, expires_minutes=config['refresh_minutes'])
+
+    return _read_last_value_before(series, start_us) + _read_values(series, start_us, end_us)
+
+# Returns the (time, value) tuples of a series that is always fetched as a whole, like a forecast or the current value.
+# `fetch()` is only called if the cached series is older than `forecast_ttl_minutes`
+def get_snapshot(series, fetch):
+    config = get_cache_config()
+    if config is None:
+        return fetch()
+
+    cached = DB().fetch_all('''
+        SELECT time, value
+        FROM grid_carbon_intensity_cache
+        WHERE series = %s
+            AND EXISTS (SELECT 1 FROM grid_carbon_intensity_cache_coverage WHERE series = %s AND expires_at > NOW())
+        ORDER BY time ASC
+    ''', params=(series, series))
+    if cached:
+        return cached
+
+    try:
+        values = fetch()
+    except RuntimeError as exc:
+        if not (cached := DB().fetch_all('SELECT time, value FROM grid_carbon_intensity_cache WHERE series = %s ORDER BY time ASC', params=(series, ))):
+            raise
+        error_helpers.log_error('Carbon intensity API could not be queried. Using the expired cached values instead', exception=exc, series=series)
+        return cached
+
+    with DB().transaction_cursor() as cur:
+        cur.execute('DELETE FROM grid_carbon_intensity_cache WHERE series = %s', (series, ))
+        cur.execute('DELETE FROM grid_carbon_intensity_cache_coverage WHERE series = %s', (series, ))
+        if values:
+            times, intensities = zip(*values)
+            cur.execute('''
+                INSERT INTO grid_carbon_intensity_cache (series, time, value)
+                SELECT %s, time, value FROM unnest(%s::bigint[], %s::double precision[]) AS v(time, value)
+                ON CONFLICT (series, time) DO UPDATE SET value = EXCLUDED.value
+            ''', (series, list(times), list(intensities)))
+            cur.execute('''
+                INSERT INTO grid_carbon_intensity_cache_coverage (series, start_time, end_time, expires_at)
+                VALUES (%s, %s, %s, NOW() + make_interval(mins => %s))
+            ''', (series, min(times), max(times), config['forecast_ttl_minutes']))
+
+    return values
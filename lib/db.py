@@ -1,14 +1,16 @@
 #pylint: disable=consider-using-enumerate
 import os
 import time
+import asyncio
 import random
 from functools import wraps
-from contextlib import contextmanager
-from psycopg_pool import ConnectionPool
+from contextlib import contextmanager, asynccontextmanager
+from psycopg_pool import ConnectionPool, AsyncConnectionPool
 from psycopg.conninfo import make_conninfo
 import psycopg.rows
 import psycopg
 import pytest
+import numpy as np
 from lib.global_config import GlobalConfig
 
 def is_pytest_session():
@@ -34,12 +36,68 @@ def get_schema():
     return f"gmt_test_{worker_id}" if worker_id else "gmt_test"
 
 
+# Connection pool settings per process role. The measurement runner keeps its pool minimal, as every
+# extra connection is additional load on the machine under measurement. API workers serve many requests
+# concurrently and cron scripts are somewhere in between. max_idle and max_lifetime are in seconds.
+# The entry points select their profile with set_pool_profile(). Processes that do not select one use
+# postgresql.pool_profile from the config.yml. Every value can be overridden in postgresql.pool_profiles
+DB_POOL_PROFILES = {
+    'runner': {'min_size': 1, 'max_size': 2, 'max_idle': 600, 'max_lifetime': 3600},
+    'api': {'min_size': 2, 'max_size': 10, 'max_idle': 300, 'max_lifetime': 1800},
+    'api_sync': {'min_size': 1, 'max_size': 5, 'max_idle': 300, 'max_lifetime': 1800},
+    'cron': {'min_size': 1, 'max_size': 4, 'max_idle': 60, 'max_lifetime': 3600},
+}
+
+# API workers keep two pools: AsyncDB for the routes and DB for authenticate() and the lib code that runs in the
+# threadpool. The latter only sees short queries, so the sync pool of these processes uses its own smaller profile
+SYNC_DB_POOL_PROFILES = {'api': 'api_sync'}
+
+_selected_pool_profile = None
+
+# Must be called before the first query, as the pools are sized when they are created
+def set_pool_profile(profile):
+    global _selected_pool_profile # pylint: disable=global-statement
+    if profile not in DB_POOL_PROFILES:
+        raise ValueError(f"Unknown DB pool profile '{profile}'. Valid profiles are: {', '.join(DB_POOL_PROFILES)}")
+    _selected_pool_profile = profile
+
+# Returns (profile name, pool settings) with the overrides of the config.yml applied.
+# sync=True returns the profile for the pool of DB, which differs from the one of AsyncDB for some profiles (see SYNC_DB_POOL_PROFILES)
+def get_pool_profile(sync=False):
+    postgresql_config = GlobalConfig().config['postgresql']
+    profile = _selected_pool_profile or postgresql_config.get('pool_profile', 'runner')
+    if profile not in DB_POOL_PROFILES:
+        raise ValueError(f"Unknown DB pool profile '{profile}' in postgresql.pool_profile. Valid profiles are: {', '.join(DB_POOL_PROFILES)}")
+    if sync:
+        profile = SYNC_DB_POOL_PROFILES.get(profile, profile)
+
+    overrides = (postgresql_config.get('pool_profiles') or {}).get(profile) or {}
+    unknown_keys = set(overrides) - set(DB_POOL_PROFILES[profile])
+    if unknown_keys:
+        raise ValueError(f"Unknown settings in postgresql.pool_profiles.{profile}: {', '.join(sorted(unknown_keys))}")
+
+    return profile, {**DB_POOL_PROFILES[profile], **overrides}
+
+def _is_retryable_db_error(exc):
+    # Check if this is a connection-related error that we should retry
+    error_str = str(exc).lower()
+    retryable_errors = [
+        'connection', 'closed', 'terminated', 'timeout', 'network',
+        'server', 'unavailable', 'refused', 'reset', 'broken pipe'
+    ]
+    return any(keyword in error_str for keyword in retryable_errors)
+
+def _db_retry_sleep_time(attempt, retry_interval=1):
+    # Exponential backoff with jitter
+    backoff_time = min(retry_interval * (2 ** (attempt - 1)), 30)  # Cap at 30 seconds
+    jitter = random.uniform(0.1, 0.5) * backoff_time
+    return backoff_time + jitter
+
 def with_db_retry(func):
     @wraps(func)
     def wrapper(self, *args, **kwargs):
         config = GlobalConfig().config
         retry_timeout = config.get('postgresql', {}).get('retry_timeout', 300)
-        retry_interval = 1  # Base interval for exponential backoff
 
         start_time = time.time()
         attempt = 0
@@ -49,16 +107,7 @@ def with_db_retry(func):
             try:
                 return func(self, *args, **kwargs)
             except (psycopg.OperationalError, psycopg.DatabaseError) as e:
-                # Check if this is a connection-related error that we should retry
-                error_str = str(e).lower()
-                retryable_errors = [
-                    'connection', 'closed', 'terminated', 'timeout', 'network',
-                    'server', 'unavailable', 'refused', 'reset', 'broken pipe'
-                ]
-
-                is_retryable = any(keyword in error_str for keyword in retryable_errors)
-
-                if not is_retryable:
+                if not _is_retryable_db_error(e):
                     # Non-retryable error (e.g., SQL syntax error)
                     print(f"Database error (non-retryable): {e}")
                     raise
@@ -68,10 +117,7 @@ def with_db_retry(func):
                     print(f"Database retry timeout after {attempt} attempts over {time_elapsed:.1f} seconds. Last error: {e}")
                     raise
 
-                # Exponential backoff with jitter
-                backoff_time = min(retry_interval * (2 ** (attempt - 1)), 30)  # Cap at 30 seconds
-                jitter = random.uniform(0.1, 0.5) * backoff_time
-                sleep_time = backoff_time + jitter
+                sleep_time = _db_retry_sleep_time(attempt)
 
                 print(f"Database connection error (attempt {attempt}): {e}. Retrying in {sleep_time:.2f} seconds...")
 
@@ -91,11 +137,107 @@ def with_db_retry(func):
 
     return wrapper
 
+# Same as with_db_retry, but for the coroutines of AsyncDB. Waiting for the next attempt does not block the event loop
+def with_async_db_retry(func):
+    @wraps(func)
+    async def wrapper(self, *args, **kwargs):
+        config = GlobalConfig().config
+        retry_timeout = config.get('postgresql', {}).get('retry_timeout', 300)
+
+        start_time = time.time()
+        attempt = 0
+
+        while time.time() - start_time < retry_timeout:
+            attempt += 1
+            try:
+                return await func(self, *args, **kwargs)
+            except (psycopg.OperationalError, psycopg.DatabaseError) as e:
+                if not _is_retryable_db_error(e):
+                    # Non-retryable error (e.g., SQL syntax error)
+                    print(f"Database error (non-retryable): {e}")
+                    raise
+
+                time_elapsed = time.time() - start_time
+                if time_elapsed >= retry_timeout:
+                    print(f"Database retry timeout after {attempt} attempts over {time_elapsed:.1f} seconds. Last error: {e}")
+                    raise
+
+                sleep_time = _db_retry_sleep_time(attempt)
+
+                print(f"Database connection error (attempt {attempt}): {e}. Retrying in {sleep_time:.2f} seconds...")
+
+                # Try to recreate the connection pool if it's corrupted
+                try:
+                    if hasattr(self, '_pool'):
+                        await self._pool.close()
+                        del self._pool
+                    self._create_pool()
+                except (psycopg.OperationalError, psycopg.DatabaseError, AttributeError) as pool_error:
+                    print(f"Failed to recreate connection pool: {pool_error}")
+
+                await asyncio.sleep(sleep_time)
+
+        # If we get here, we've exhausted all retries
+        raise psycopg.OperationalError(f"Database connection failed after {attempt} attempts over {time.time() - start_time:.1f} seconds")
+
+    return wrapper
+
+def _make_conninfo():
+    config = GlobalConfig().config
+
+    # Important note: We are not using cursor_factory = psycopg2.extras.RealDictCursor
+    # as an argument, because this would increase the size of a single API request
+    # from 50 kB to 100kB.
+    # Users are required to use the mask of the API requests to read the data.
+    # force domain socket connection by not supplying host
+
+    return make_conninfo(
+        user=config['postgresql']['user'],
+        password=config['postgresql']['password'],
+        host=config['postgresql']['host'],
+        port=config['postgresql']['port'],
+        dbname=config['postgresql']['dbname'],
+        sslmode='require',
+        # search_path is only ever non-default under pytest-xdist (see get_schema());
+        # every connection in the pool gets it set at startup so callers never need to care.
+        options=f"-c search_path={get_schema()},public {' '.join(config['postgresql'].get('options', []))}",
+    )
+
+def _check_not_live_db_in_pytest():
+    if is_pytest_session() and GlobalConfig().config['postgresql']['host'] != 'test-green-coding-postgres-container':
+        pytest.exit(f"You are accessing the live/local database ({GlobalConfig().config['postgresql']['host']}) while running pytest. This might clear the DB. Aborting for security ...", returncode=1)
+
+# See "Binary Format" in https://www.postgresql.org/docs/current/sql-copy.html for the layout
+PG_COPY_BINARY_HEADER = b'PGCOPY\n\xff\r\n\x00' + (0).to_bytes(4, 'big') + (0).to_bytes(4, 'big') # signature, flags, header extension length
+PG_COPY_BINARY_TRAILER = (-1).to_bytes(2, 'big', signed=True)
+
+# Postgres integer types and the big-endian numpy dtype of their binary representation
+PG_COPY_BINARY_INTEGER_TYPES = {'smallint': '>i2', 'int': '>i4', 'bigint': '>i8'}
+
+# Every tuple of the binary COPY format is a big-endian int16 field count followed by an int32 byte length
+# and the value for every column. A packed numpy structured array has exactly this memory layout.
+def _binary_copy_integer_tuple_dtype(pg_types):
+    fields = [('field_count', '>i2')]
+    for idx, pg_type in enumerate(pg_types):
+        fields += [(f"length_{idx}", '>i4'), (f"value_{idx}", PG_COPY_BINARY_INTEGER_TYPES[pg_type])]
+    return np.dtype(fields)
+
+def build_binary_copy_integer_tuples(arrays, pg_types):
+    # Encodes equally long integer arrays as tuples of the binary COPY format in one vectorized step.
+    tuples = np.empty(len(arrays[0]), dtype=_binary_copy_integer_tuple_dtype(pg_types))
+    tuples['field_count'] = len(arrays)
+    for idx, (array, pg_type) in enumerate(zip(arrays, pg_types)):
+        value_dtype = np.dtype(PG_COPY_BINARY_INTEGER_TYPES[pg_type])
+        if len(array) and (array.min() < np.iinfo(value_dtype).min or array.max() > np.iinfo(value_dtype).max):
+            raise ValueError(f"Value out of range for column of type {pg_type}") # numpy would silently wrap around
+        tuples[f"length_{idx}"] = value_dtype.itemsize
+        tuples[f"value_{idx}"] = array
+    return tuples
+
 class DB:
 
     def __new__(cls):
-        if is_pytest_session() and GlobalConfig().config['postgresql']['host'] != 'test-green-coding-postgres-container':
-            pytest.exit(f"You are accessing the live/local database ({GlobalConfig().config['postgresql']['host']}) while running pytest. This might clear the DB. Aborting for security ...", returncode=1)
+        _check_not_live_db_in_pytest()
 
         if not hasattr(cls, 'instance'):
             cls.instance = super(DB, cls).__new__(cls)
@@ -106,30 +248,12 @@ class DB:
             self._create_pool()
 
     def _create_pool(self):
-        config = GlobalConfig().config
-
-        # Important note: We are not using cursor_factory = psycopg2.extras.RealDictCursor
-        # as an argument, because this would increase the size of a single API request
-        # from 50 kB to 100kB.
-        # Users are required to use the mask of the API requests to read the data.
-        # force domain socket connection by not supplying host
-
-        conninfo = make_conninfo(
-            user=config['postgresql']['user'],
-            password=config['postgresql']['password'],
-            host=config['postgresql']['host'],
-            port=config['postgresql']['port'],
-            dbname=config['postgresql']['dbname'],
-            sslmode='require',
-            # search_path is only ever non-default under pytest-xdist (see get_schema());
-            # every connection in the pool gets it set at startup so callers never need to care.
-            options=f"-c search_path={get_schema()},public {' '.join(config['postgresql'].get('options', []))}",
-        )
+        conninfo = _make_conninfo()
 
+        self._pool_profile, pool_settings = get_pool_profile(sync=True)
         self._pool = ConnectionPool(
             conninfo,
-            min_size=1,
-            max_size=2,
+            **pool_settings,
             open=True,
             # Explicitly disabled (default) to prevent measurement interference
             # from conn.execute("") calls, using @with_db_retry instead
@@ -141,6 +265,10 @@ class DB:
             self._pool.close()
             del self._pool
 
+    # Sizes and counters of the pool of this process. See "Pool stats" in the psycopg_pool docs
+    def get_pool_stats(self):
+        return {'profile': self._pool_profile, **self._pool.get_stats()}
+
 
     @with_db_retry
     def __query_single(self, query, params=None, return_type=None, fetch_mode=None):
@@ -183,6 +311,22 @@ class DB:
             yield cur
             conn.commit()
 
+    # Streams the result set through a named (server-side) cursor instead of materializing it
+    # client side, so only `itersize` rows are held in memory at a time. Meant for reading huge
+    # tables like measurement_values. The pool connection stays checked out until the generator
+    # is exhausted or closed, so callers should not issue other queries while iterating when the
+    # pool is small. Deliberately not wrapped in @with_db_retry: rows that were already yielded
+    # to the caller cannot be taken back, so a replay would hand them out a second time.
+    def fetch_iter(self, query, params=None, fetch_mode=None, itersize=10_000):
+        row_factory = psycopg.rows.dict_row if fetch_mode == 'dict' else None
+        with self._pool.connection() as conn:
+            conn.autocommit = False # named cursors only live inside a transaction
+            with conn.cursor(name=f"gmt_fetch_iter_{os.getpid()}_{id(conn)}", row_factory=row_factory) as cur:
+                cur.itersize = itersize
+                cur.execute(query, params)
+                yield from cur
+            conn.commit()
+
     def fetch_one(self, query, params=None, fetch_mode=None):
         return self.__query_single(query, params=params, return_type='one', fetch_mode=fetch_mode)
 
@@ -212,6 +356,140 @@ class DB:
             with cur.copy(statement) as copy:
                 copy.write(file.read())
 
+    # Like copy_from(), but for integer-only columns which are sent as binary COPY directly from
+    # numpy arrays. Postgres does not need to parse any text and no CSV string of the whole data has
+    # to be held in memory. Only one chunk of `chunk_size` rows is encoded at a time.
+    # pg_types must match the column types exactly (see PG_COPY_BINARY_INTEGER_TYPES), as binary COPY does no casting.
+    @with_db_retry
+    def copy_from_integer_arrays(self, arrays, table, columns, pg_types, chunk_size=1_000_000):
+        arrays = [np.asarray(array, dtype=np.int64) for array in arrays]
+        with self._pool.connection() as conn:
+            conn.autocommit = False # is implicit default
+            cur = conn.cursor()
+            statement = f"COPY {table}({','.join(list(columns))}) FROM stdin (format binary)"
+            with cur.copy(statement) as copy:
+                copy.write(PG_COPY_BINARY_HEADER)
+                for start in range(0, len(arrays[0]), chunk_size):
+                    copy.write(build_binary_copy_integer_tuples([array[start:start+chunk_size] for array in arrays], pg_types).tobytes())
+                copy.write(PG_COPY_BINARY_TRAILER)
+
+    # Counterpart of copy_from_integer_arrays(). Runs the SELECT `query` as binary COPY ... TO STDOUT and yields
+    # its result as one int64 numpy array per column, up to `chunk_size` rows at a time. The tuples are decoded
+    # in one vectorized step per chunk, so no Python object is created per row.
+    # All columns must be NOT NULL and of exactly the given pg_types, as every tuple is decoded with the same layout.
+    # Deliberately not wrapped in @with_db_retry for the same reason as fetch_iter()
+    def copy_to_integer_arrays(self, query, params, pg_types, chunk_size=1_000_000):
+        tuple_dtype = _binary_copy_integer_tuple_dtype(pg_types)
+        chunk_bytes = chunk_size * tuple_dtype.itemsize
+
+        def decode(buffer, row_count):
+            if not buffer.startswith(PG_COPY_BINARY_HEADER):
+                raise ValueError('Unexpected header in binary COPY result')
+            tuples = np.frombuffer(buffer, dtype=tuple_dtype, count=row_count, offset=len(PG_COPY_BINARY_HEADER))
+            if (tuples['field_count'] != len(pg_types)).any() or any((tuples[f"length_{idx}"] != np.dtype(PG_COPY_BINARY_INTEGER_TYPES[pg_type]).itemsize).any() for idx, pg_type in enumerate(pg_types)):
+                raise ValueError(f"COPY result does not match the column types {pg_types} or contains NULL")
+            return [tuples[f"value_{idx}"].astype(np.int64) for idx in range(len(pg_types))] # copies, so the buffer can be reused
+
+        with self._pool.connection() as conn:
+            conn.autocommit = False # is implicit default
+            cur = conn.cursor()
+            with cur.copy(f"COPY ({query}) TO STDOUT (FORMAT BINARY)", params) as copy: # params are bound client side for COPY
+                buffer = bytearray()
+                for data in copy:
+                    buffer += data
+                    while len(buffer) >= chunk_bytes + len(PG_COPY_BINARY_HEADER):
+                        yield decode(buffer, chunk_size)
+                        del buffer[len(PG_COPY_BINARY_HEADER):len(PG_COPY_BINARY_HEADER) + chunk_bytes]
+
+            rest = len(buffer) - len(PG_COPY_BINARY_HEADER) - len(PG_COPY_BINARY_TRAILER)
+            if not buffer.endswith(PG_COPY_BINARY_TRAILER) or rest % tuple_dtype.itemsize:
+                raise ValueError(f"COPY result does not match the column types {pg_types} or contains NULL")
+            if rest:
+                yield decode(buffer, rest // tuple_dtype.itemsize)
+            conn.commit()
+
+
+# Async counterpart of DB for the API. The FastAPI routes are coroutines and a synchronous query
+# blocks the whole event loop of the worker until it returns, so every other request has to wait.
+# Here the waiting on postgres is awaited instead.
+# The pool is opened lazily on first use, as it must be opened inside the running event loop.
+class AsyncDB:
+
+    def __new__(cls):
+        _check_not_live_db_in_pytest()
+
+        if not hasattr(cls, 'instance'):
+            cls.instance = super(AsyncDB, cls).__new__(cls)
+        return cls.instance
+
+    def __init__(self):
+        if not hasattr(self, '_pool'):
+            self._create_pool()
+
+    def _create_pool(self):
+        conninfo = _make_conninfo()
+
+        self._pool_profile, pool_settings = get_pool_profile()
+        self._pool = AsyncConnectionPool(
+            conninfo,
+            **pool_settings,
+            open=False,
+            # Explicitly disabled (default) to prevent measurement interference
+            # from conn.execute("") calls, using @with_async_db_retry instead
+            check=None
+        )
+
+    async def _connection(self):
+        await self._pool.open() # no-op if already open
+        return self._pool.connection()
+
+    async def shutdown(self):
+        if hasattr(self, '_pool'):
+            await self._pool.close()
+            del self._pool
+
+    def get_pool_stats(self):
+        return {'profile': self._pool_profile, **self._pool.get_stats()}
+
+
+    @with_async_db_retry
+    async def __query_single(self, query, params=None, return_type=None, fetch_mode=None):
+        ret = False
+        row_factory = psycopg.rows.dict_row if fetch_mode == 'dict' else None
+
+        async with await self._connection() as conn:
+            await conn.set_autocommit(False) # should be default, but we are explicit
+            cur = conn.cursor(row_factory=row_factory) # None is actually the default cursor factory
+            await cur.execute(query, params)
+            await conn.commit()
+            if return_type == 'one':
+                ret = await cur.fetchone()
+            elif return_type == 'all':
+                ret = await cur.fetchall()
+            else:
+                ret = cur.statusmessage
+
+        return ret
+
+    async def query(self, query, params=None, fetch_mode=None):
+        return await self.__query_single(query, params=params, return_type=None, fetch_mode=fetch_mode)
+
+    # Not retried for the same reason as DB.transaction_cursor
+    @asynccontextmanager
+    async def transaction_cursor(self, fetch_mode=None):
+        row_factory = psycopg.rows.dict_row if fetch_mode == 'dict' else None
+        async with await self._connection() as conn:
+            await conn.set_autocommit(False) # should be default, but we are explicit
+            cur = conn.cursor(row_factory=row_factory)
+            yield cur
+            await conn.commit()
+
+    async def fetch_one(self, query, params=None, fetch_mode=None):
+        return await self.__query_single(query, params=params, return_type='one', fetch_mode=fetch_mode)
+
+    async def fetch_all(self, query, params=None, fetch_mode=None):
+        return await self.__query_single(query, params=params, return_type='all', fetch_mode=fetch_mode)
+
 
 if __name__ == '__main__':
     DB()
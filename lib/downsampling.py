@@ -0,0 +1,101 @@
+import math
+import numpy as np
+
+# Downsampling of single measurement series (one metric and detail_name) for charting.
+#
+# Which method is allowed depends on what a sample means:
+# - Gauges (see MEAN_METRICS in lib/phase_stats.py) are a reading at a point in time. They are reduced by picking
+#   representative samples (lttb, minmax) or by averaging them per time bucket (avg).
+# - All other metrics hold the delta of the interval since the previous sample (e.g. uJ of energy). Picking single
+#   samples would drop the energy of all skipped intervals and the frontend divides every value by the time to the
+#   previous sample to get the power. So these are always summed per time bucket and stamped with the time of the
+#   last sample in the bucket, which keeps both the totals and the derived power correct.
+
+DOWNSAMPLING_METHODS = ('lttb', 'minmax', 'avg')
+
+# Largest-Triangle-Three-Buckets (Steinarsson, 2013). Returns the indices of `threshold` samples that keep the visual
+# shape of the series. First and last sample are always kept. Expects times to be sorted.
+def lttb_indices(times, values, threshold):
+    sample_count = len(times)
+    if threshold >= sample_count or threshold < 3:
+        return np.arange(sample_count)
+
+    x = times.astype(np.float64)
+    y = values.astype(np.float64)
+
+    # The samples between first and last are split into threshold-2 buckets of (almost) equal count
+    edges = np.floor(np.linspace(1, sample_count - 1, threshold - 1)).astype(np.int64)
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = sample_count - 1
+    a = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        if bucket + 2 < len(edges):
+            next_start, next_end = edges[bucket + 1], edges[bucket + 2]
+        else: # the bucket after the last one is the last sample
+            next_start, next_end = sample_count - 1, sample_count
+        next_x = x[next_start:next_end].mean()
+        next_y = y[next_start:next_end].mean()
+
+        # doubled area of the triangle between the last selected sample, the candidate and the average of the next bucket
+        areas = np.abs((x[a] - next_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (next_y - y[a]))
+        a = start + int(np.argmax(areas))
+        selected[bucket + 1] = a
+
+    return selected
+
+# Returns the start index of every non empty time bucket. Buckets are `bucket_us` wide, but at most `bucket_count`
+# buckets are used, which widens the buckets if needed
+def _time_bucket_starts(times, bucket_count=None, bucket_us=None):
+    span = int(times[-1] - times[0]) + 1
+    width = bucket_us or 1
+    if bucket_count is not None:
+        width = max(width, math.ceil(span / bucket_count))
+
+    bucket_ids = (times - times[0]) // width
+    return np.flatnonzero(np.concatenate(([True], bucket_ids[1:] != bucket_ids[:-1])))
+
+def _bucket_ends(starts, sample_count):
+    return np.concatenate((starts[1:], [sample_count]))
+
+def _minmax_indices(values, starts):
+    counts = _bucket_ends(starts, len(values)) - starts
+    bucket_index = np.repeat(np.arange(len(starts)), counts)
+    # sorted by bucket and then value, so the first sample of a bucket is its minimum and the last one its maximum
+    order = np.lexsort((values, bucket_index))
+    return np.unique(np.concatenate((order[starts], order[starts + counts - 1])))
+
+# Returns (times, values) with at most `max_points` samples and / or one (lttb, avg) or two (minmax) samples per
+# `bucket_us`. Without both the series is returned as is. `is_total` marks series that hold interval deltas.
+def downsample_series(times, values, method='lttb', max_points=None, bucket_us=None, is_total=False):
+    if method not in DOWNSAMPLING_METHODS:
+        raise ValueError(f"Unknown downsampling method '{method}'. Valid methods are: {', '.join(DOWNSAMPLING_METHODS)}")
+
+    times = np.asarray(times, dtype=np.int64)
+    values = np.asarray(values, dtype=np.int64)
+    sample_count = len(times)
+    if sample_count == 0 or (max_points is None and bucket_us is None):
+        return times, values
+    if bucket_us is None and sample_count <= max_points:
+        return times, values
+
+    if is_total or method == 'avg':
+        starts = _time_bucket_starts(times, max_points, bucket_us)
+        ends = _bucket_ends(starts, sample_count)
+        sums = np.add.reduceat(values, starts)
+        if is_total:
+            return times[ends - 1], sums
+        return times[ends - 1], np.rint(sums / (ends - starts)).astype(np.int64)
+
+    if method == 'minmax':
+        starts = _time_bucket_starts(times, None if max_points is None else max(max_points // 2, 1), bucket_us)
+        indices = _minmax_indices(values, starts)
+        return times[indices], values[indices]
+
+    threshold = sample_count if max_points is None else max_points
+    if bucket_us is not None:
+        threshold = min(threshold, int(times[-1] - times[0]) // bucket_us + 2)
+    indices = lttb_indices(times, values, threshold)
+    return times[indices], values[indices]
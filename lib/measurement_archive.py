@@ -0,0 +1,166 @@
+import os
+from pathlib import Path
+import numpy as np
+import pyarrow
+import pyarrow.parquet
+
+from lib.db import DB
+from lib.global_config import GlobalConfig
+from lib.measurement_partitions import get_run_measurement_metric_id_range
+
+# Cold storage for the raw measurement_values of old runs.
+#
+# measurement_values holds every sample of every run and is by far the biggest table. Once a run is older than
+# the configured age its values are written to one compressed Parquet file per run and deleted from Postgres.
+# This keeps the table and its primary key index small enough to stay in memory.
+# The measurement_metrics of the run stay in Postgres, as they are tiny and needed to resolve the ids.
+#
+# Readers (phase_stats, the measurements API) check for an archive file first and read from there. The file is
+# the source of truth as soon as it exists, as it is only moved into place once it is completely written.
+
+ARCHIVE_SCHEMA_COLUMNS = ('measurement_metric_id', 'time', 'value')
+ARCHIVE_BATCH_SIZE = 1_000_000 # rows per Parquet row group
+
+def get_archive_directory():
+    directory = (GlobalConfig().config.get('measurement_archive') or {}).get('directory', None)
+    return Path(directory) if directory else None
+
+def get_archive_file(run_id):
+    directory = get_archive_directory()
+    if directory is None:
+        return None
+    return directory.joinpath(f"{run_id}.parquet")
+
+def is_archived(run_id):
+    archive_file = get_archive_file(run_id)
+    return archive_file is not None and archive_file.is_file()
+
+# Returns (measurement_metric_ids, times, values) as numpy arrays sorted by measurement_metric_id and time
+# or None if the run is not archived. With `measurement_metric_ids` only these series are read. As the rows are
+# sorted by measurement_metric_id, this skips all row groups that do not contain them.
+def read_archived_measurements(run_id, measurement_metric_ids=None):
+    if not is_archived(run_id):
+        return None
+
+    filters = None if measurement_metric_ids is None else [('measurement_metric_id', 'in', list(measurement_metric_ids))]
+    table = pyarrow.parquet.read_table(get_archive_file(run_id), columns=list(ARCHIVE_SCHEMA_COLUMNS), filters=filters)
+
+    measurement_metric_ids = table.column('measurement_metric_id').to_numpy()
+    times = table.column('time').to_numpy()
+    values = table.column('value').to_numpy()
+
+    order = np.lexsort((times, measurement_metric_ids)) # rows are written in this order, but we do not rely on it
+    return measurement_metric_ids[order], times[order], values[order]
+
+# Yields (measurement_metric_id, times, values) of an archived run one series at a time, sorted by measurement_metric_id.
+# Every series is read on its own with a filter on its id, so only the largest single series is held in memory
+def iter_archived_measurements(run_id):
+    measurement_metric_ids = DB().fetch_all('SELECT id FROM measurement_metrics WHERE run_id = %s ORDER BY id ASC', params=(run_id, ))
+    for (measurement_metric_id, ) in measurement_metric_ids:
+        _, times, values = read_archived_measurements(run_id, [measurement_metric_id])
+        if len(times):
+            yield measurement_metric_id, times, values
+
+def _count_run_values(run_id, min_id, max_id):
+    return DB().fetch_one('''
+        SELECT COUNT(*) FROM measurement_values mv JOIN measurement_metrics mm ON mm.id = mv.measurement_metric_id
+        WHERE mm.run_id = %s AND mv.measurement_metric_id BETWEEN %s AND %s
+    ''', params=(run_id, min_id, max_id))[0]
+
+def _write_archive_file(run_id, archive_file):
+    schema = pyarrow.schema([('measurement_metric_id', pyarrow.int32()), ('time', pyarrow.int64()), ('value', pyarrow.int64())])
+
+    # Read as binary COPY straight into int64 arrays, one row group at a time
+    chunks = DB().copy_to_integer_arrays('''
+        SELECT mv.measurement_metric_id, mv.time, mv.value
+        FROM measurement_values mv
+        JOIN measurement_metrics mm ON mm.id = mv.measurement_metric_id
+        WHERE mm.run_id = %s
+            AND mv.measurement_metric_id BETWEEN %s AND %s -- lets postgres prune the partitions
+        ORDER BY mv.measurement_metric_id ASC, mv.time ASC
+    ''', (run_id, *get_run_measurement_metric_id_range(run_id)), pg_types=['int', 'bigint', 'bigint'], chunk_size=ARCHIVE_BATCH_SIZE)
+
+    row_count = 0
+    # Written to a temporary file first and only moved into place once complete, as readers take
+    # the existence of the archive file as the sign that the run is archived
+    tmp_file = archive_file.with_suffix('.parquet.tmp')
+    try:
+        with pyarrow.parquet.ParquetWriter(tmp_file, schema, compression='zstd') as writer:
+            for measurement_metric_ids, times, values in chunks:
+                writer.write_table(pyarrow.Table.from_arrays([
+                    pyarrow.array(measurement_metric_ids.astype(np.int32)),
+                    pyarrow.array(times),
+                    pyarrow.array(values),
+                ], schema=schema))
+                row_count += len(times)
+        os.replace(tmp_file, archive_file)
+    finally:
+        if tmp_file.exists():
+            tmp_file.unlink()
+
+    return row_count
+
+def archive_run(run_id):
+    archive_file = get_archive_file(run_id)
+    if archive_file is None:
+        raise RuntimeError('measurement_archive.directory is not set in the config.yml')
+
+    if archive_file.exists():
+        raise RuntimeError(f"Run {run_id} is already archived in {archive_file}")
+
+    archive_file.parent.mkdir(parents=True, exist_ok=True)
+    row_count = _write_archive_file(run_id, archive_file)
+
+    # Only delete what was actually written. If new values came in after the export the run is not complete
+    # in the archive and we keep the values in the DB instead
+    min_id, max_id = get_run_measurement_metric_id_range(run_id)
+    try:
+        deleted = DB().fetch_one('''
+            WITH deleted AS (
+                DELETE FROM measurement_values
+                WHERE measurement_metric_id IN (SELECT id FROM measurement_metrics WHERE run_id = %s)
+                    AND measurement_metric_id BETWEEN %s AND %s
+                    AND (
+                        SELECT COUNT(*) FROM measurement_values mv JOIN measurement_metrics mm ON mm.id = mv.measurement_metric_id
+                        WHERE mm.run_id = %s AND mv.measurement_metric_id BETWEEN %s AND %s
+                    ) = %s
+                RETURNING 1
+            )
+            SELECT COUNT(*) FROM deleted
+        ''', params=(run_id, min_id, max_id, run_id, min_id, max_id, row_count))[0]
+    except Exception:
+        # Readers prefer the archive file, so it must not stay next to the values it was supposed to replace.
+        # The DELETE might still have been committed before the error though (e.g. the connection dropped on the commit).
+        # Then the file is the only copy of the values and is kept
+        if _count_run_values(run_id, min_id, max_id) == row_count:
+            archive_file.unlink()
+        raise
+
+    if deleted != row_count:
+        archive_file.unlink()
+        raise RuntimeError(f"Run {run_id} got new measurement values while archiving. Archive was removed and values were kept in the DB")
+
+    return row_count
+
+def archive_expired_runs(after_days=None):
+    if after_days is None:
+        after_days = (GlobalConfig().config.get('measurement_archive') or {}).get('after_days', None)
+    if after_days is None:
+        raise RuntimeError('measurement_archive.after_days is not set in the config.yml')
+
+    # Only finished runs, as failed or running ones might still get values or be rerun
+    runs = DB().fetch_all('''
+        SELECT r.id
+        FROM runs as r
+        WHERE
+            r.created_at < NOW() - make_interval(days => %s)
+            AND r.end_measurement IS NOT NULL
+            AND EXISTS (SELECT 1 FROM measurement_metrics as mm JOIN measurement_values as mv ON mv.measurement_metric_id = mm.id WHERE mm.run_id = r.id)
+        ORDER BY r.created_at ASC
+    ''', params=(after_days, ))
+
+    for (run_id, ) in runs:
+        if is_archived(run_id):
+            continue # values that came in after the archiving. We do not merge those automatically
+        row_count = archive_run(run_id)
+        print(f"Archived {row_count} measurement values of run {run_id}")
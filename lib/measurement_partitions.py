@@ -0,0 +1,134 @@
+import re
+from psycopg import sql
+
+from lib.db import DB, AsyncDB
+from lib.global_config import GlobalConfig
+
+# measurement_values is range partitioned by measurement_metric_id. See docker/tables.sql
+#
+# The ids come from the identity of measurement_metrics, so they only grow and every run gets a narrow range
+# of them. A run therefore lives in one or two partitions, which keeps the index of the active partition
+# small and lets retention drop a whole partition instead of deleting rows one by one.
+#
+# Partitions are named measurement_values_p<lower bound>. Values whose id is not covered by any range
+# partition land in measurement_values_default, so inserts never fail if the maintenance did not run in time.
+# They are moved to their range partition once it gets created.
+
+PARTITIONED_TABLE = 'measurement_values'
+DEFAULT_PARTITION = 'measurement_values_default'
+PARTITION_BOUND_REGEX = re.compile(r"FROM \((MINVALUE|-?\d+)\) TO \((MAXVALUE|-?\d+)\)")
+
+def get_measurement_partitions_config():
+    return GlobalConfig().config.get('measurement_partitions') or {}
+
+# The queries on measurement_values join measurement_metrics to get the values of a run. Postgres cannot
+# prune partitions through that join at plan time, so we pass the id range of the run as constants in addition.
+# Returns (None, None) if the run has no metrics, which then matches no rows.
+RUN_MEASUREMENT_METRIC_ID_RANGE_QUERY = 'SELECT MIN(id), MAX(id) FROM measurement_metrics WHERE run_id = %s'
+
+def get_run_measurement_metric_id_range(run_id):
+    return DB().fetch_one(RUN_MEASUREMENT_METRIC_ID_RANGE_QUERY, params=(run_id, ))
+
+# for the API routes, which must not block the event loop
+async def get_run_measurement_metric_id_range_async(run_id):
+    return await AsyncDB().fetch_one(RUN_MEASUREMENT_METRIC_ID_RANGE_QUERY, params=(run_id, ))
+
+# Returns [(name, lower, upper)] of all range partitions sorted by their bounds. lower is None for MINVALUE
+def get_measurement_partitions():
+    rows = DB().fetch_all('''
+        SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+        FROM pg_inherits as i
+        JOIN pg_class as c ON c.oid = i.inhrelid
+        WHERE i.inhparent = %s::regclass
+    ''', params=(PARTITIONED_TABLE, ))
+
+    partitions = []
+    for name, bound in rows:
+        match = PARTITION_BOUND_REGEX.search(bound)
+        if match is None: # DEFAULT partition
+            continue
+        if match[2] == 'MAXVALUE':
+            raise RuntimeError(f"Partition {name} of {PARTITIONED_TABLE} has no upper bound. No partitions can be added after it")
+        partitions.append((name, None if match[1] == 'MINVALUE' else int(match[1]), int(match[2])))
+
+    return sorted(partitions, key=lambda partition: partition[2])
+
+def create_measurement_partition(lower, upper):
+    name = f"{PARTITIONED_TABLE}_p{lower}"
+
+    # The partition is filled and attached in one transaction, as ATTACH fails if the default partition
+    # still holds rows of the new range
+    with DB().transaction_cursor() as cur:
+        cur.execute(sql.SQL('CREATE TABLE {} (LIKE {})').format(sql.Identifier(name), sql.Identifier(PARTITIONED_TABLE)))
+        cur.execute(sql.SQL('''
+            WITH moved AS (
+                DELETE FROM {}
+                WHERE measurement_metric_id >= %s AND measurement_metric_id < %s
+                RETURNING measurement_metric_id, value, time
+            )
+            INSERT INTO {} (measurement_metric_id, value, time)
+            SELECT measurement_metric_id, value, time FROM moved
+        ''').format(sql.Identifier(DEFAULT_PARTITION), sql.Identifier(name)), (lower, upper))
+        # DDL takes no bind parameters, so the bounds are sent as literals
+        cur.execute(sql.SQL('ALTER TABLE {} ATTACH PARTITION {} FOR VALUES FROM ({}) TO ({})').format(
+            sql.Identifier(PARTITIONED_TABLE), sql.Identifier(name), sql.Literal(int(lower)), sql.Literal(int(upper))
+        ))
+
+    return name
+
+# Creates range partitions until the next `partitions_ahead` partitions after the highest
+# measurement_metric_id in use exist
+def create_measurement_partitions(ids_per_partition=None, partitions_ahead=None):
+    partitions_config = get_measurement_partitions_config()
+    if ids_per_partition is None:
+        ids_per_partition = partitions_config.get('ids_per_partition', 100_000)
+    if partitions_ahead is None:
+        partitions_ahead = partitions_config.get('partitions_ahead', 2)
+    if ids_per_partition <= 0:
+        raise ValueError(f"ids_per_partition must be a positive number, but is {ids_per_partition}")
+
+    max_id = DB().fetch_one('SELECT COALESCE(MAX(id), 0) FROM measurement_metrics')[0]
+    partitions = get_measurement_partitions()
+    upper = partitions[-1][2] if partitions else 0
+    target = max_id + 1 + ids_per_partition * partitions_ahead
+
+    created = []
+    while upper < target:
+        created.append(create_measurement_partition(upper, upper + ids_per_partition))
+        upper += ids_per_partition
+
+    return created
+
+# Detaches all partitions that only hold values of runs older than `retention_days`.
+# A partition is only expired once no id of it can be handed out anymore, so the partitions in use
+# and the ones created ahead are never touched. Detaching is a catalog change and returns instantly, unlike
+# a DELETE of the same rows, which would also leave the table bloated for vacuum.
+# With `drop` the detached tables are dropped, otherwise they are kept as standalone tables for manual export.
+def expire_measurement_partitions(retention_days=None, drop=None):
+    partitions_config = get_measurement_partitions_config()
+    if retention_days is None:
+        retention_days = partitions_config.get('retention_days', None)
+    if drop is None:
+        drop = partitions_config.get('drop_expired', False)
+    if retention_days is None:
+        return []
+
+    retained_from_id = DB().fetch_one('''
+        SELECT COALESCE(
+            (SELECT MIN(mm.id) FROM measurement_metrics as mm JOIN runs as r ON r.id = mm.run_id WHERE r.created_at >= NOW() - make_interval(days => %s)),
+            (SELECT COALESCE(MAX(id), 0) + 1 FROM measurement_metrics)
+        )
+    ''', params=(retention_days, ))[0]
+
+    expired = []
+    for name, _, upper in get_measurement_partitions():
+        if upper > retained_from_id:
+            break # partitions are sorted, so all following ones are retained too
+
+        # DETACH ... CONCURRENTLY is not possible, as the table has a default partition
+        DB().query(sql.SQL('ALTER TABLE {} DETACH PARTITION {}').format(sql.Identifier(PARTITIONED_TABLE), sql.Identifier(name)))
+        if drop:
+            DB().query(sql.SQL('DROP TABLE {}').format(sql.Identifier(name)))
+        expired.append(name)
+
+    return expired
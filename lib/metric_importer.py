@@ -1,11 +1,45 @@
 import json
 from io import StringIO
+import numpy as np
+import pandas
 
 from lib.db import DB
 from lib.log_types import LogType
 from metric_providers.network.connections.tcpdump.system.provider import generate_stats_string
 
 
+def _to_int64_array(series, column_name):
+    if pandas.api.types.is_integer_dtype(series.dtype):
+        return series.to_numpy(dtype=np.int64)
+
+    # measurement_values only holds BIGINT. Non integer data was rejected by Postgres when it was still sent as CSV.
+    # We keep it that way and do not silently truncate here
+    array = series.to_numpy()
+    int_array = array.astype(np.int64)
+    if not (int_array == array).all():
+        raise ValueError(f"Column {column_name} contains non integer values, which cannot be stored in measurement_values")
+    return int_array
+
+# Registers all (metric, detail_name, unit) keys of a run in one INSERT and returns their ids in the order of the keys.
+# Previously every key was a separate INSERT ... RETURNING round trip, which adds up for runs with many containers.
+def register_measurement_metrics(run_id, metric_keys):
+    metric_keys = list(metric_keys)
+    if not metric_keys:
+        return []
+
+    metrics, detail_names, units = ([str(value) for value in column] for column in zip(*metric_keys))
+
+    rows = DB().fetch_all('''
+        INSERT INTO measurement_metrics (run_id, metric, detail_name, unit)
+        SELECT %s, metric, detail_name, unit
+        FROM unnest(%s::text[], %s::text[], %s::text[]) AS keys(metric, detail_name, unit)
+        RETURNING id, metric, detail_name, unit
+    ''', params=(run_id, metrics, detail_names, units))
+
+    # RETURNING gives no order guarantee, so we match the ids back by their key
+    ids = {(metric, detail_name, unit): measurement_metric_id for measurement_metric_id, metric, detail_name, unit in rows}
+    return [ids[key] for key in zip(metrics, detail_names, units)]
+
 def import_measurements(df, metric_name, run_id):
 
     if metric_name == 'network_connections_proxy_container_dockerproxy':
@@ -38,21 +72,20 @@ def import_measurements(df, metric_name, run_id):
 
         df['run_id'] = run_id
 
-        metric_and_detail_names = df[['metric', 'detail_name', 'unit']].drop_duplicates()
-
-        for _, row in metric_and_detail_names.iterrows():
-            measurement_metric_id = DB().fetch_one('''
-                INSERT INTO measurement_metrics (run_id, metric, detail_name, unit)
-                VALUES (%s, %s, %s, %s)
-                RETURNING id
-            ''', params=(run_id, row['metric'], row['detail_name'], row['unit']))[0] # using row['metric'] here instead of metric_name, as some providers have multiple metrics inlined like powermetrics
-            df.loc[(df['metric'] == row['metric']) & (df['detail_name'] == row['detail_name']) & (df['unit'] == row['unit']), 'measurement_metric_id'] = measurement_metric_id
-
-        df['measurement_metric_id'] = df.measurement_metric_id.astype('int64')
-
-        f = StringIO(df[['measurement_metric_id', 'value', 'time']]
-            .to_csv(index=False, header=False))
-
-        DB().copy_from(file=f, table='measurement_values', columns=['measurement_metric_id', 'value', 'time'], sep=',')
-
-        f.close()
+        # using the metric column here instead of metric_name, as some providers have multiple metrics inlined like powermetrics
+        key_columns = ['metric', 'detail_name', 'unit']
+        metric_and_detail_names = df[key_columns].drop_duplicates()
+        measurement_metric_ids = register_measurement_metrics(run_id, metric_and_detail_names.itertuples(index=False, name=None))
+
+        # Position of every row's key in metric_and_detail_names, resolved in one hash join instead of a boolean mask per key
+        key_positions = pandas.MultiIndex.from_frame(metric_and_detail_names).get_indexer(pandas.MultiIndex.from_frame(df[key_columns]))
+        df['measurement_metric_id'] = np.asarray(measurement_metric_ids, dtype=np.int64)[key_positions]
+
+        # Sent as binary COPY straight from the int64 buffers of the DataFrame instead of formatting
+        # every row to CSV text first, which Postgres would then have to parse again
+        DB().copy_from_integer_arrays(
+            arrays=[df['measurement_metric_id'].to_numpy(), _to_int64_array(df['value'], 'value'), _to_int64_array(df['time'], 'time')],
+            table='measurement_values',
+            columns=['measurement_metric_id', 'value', 'time'],
+            pg_types=['int', 'bigint', 'bigint'],
+        )
@@ -4,16 +4,45 @@ import sys
 import faulthandler
 faulthandler.enable(file=sys.__stderr__)  # will catch segfaults and write to stderr
 
-import bisect
+import itertools
 import math
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 from decimal import Decimal
 from io import StringIO
+import numpy as np
 
 from lib.db import DB
 from lib import error_helpers
+from lib.global_config import GlobalConfig
+from lib.measurement_archive import is_archived, iter_archived_measurements, read_archived_measurements
+from lib.measurement_partitions import get_run_measurement_metric_id_range
 
 MAX_POSTGRES_BIGINT = 2**63 - 1
 
+# Metrics that are a momentary reading (gauge) and are averaged over a phase. All other metrics hold the
+# delta of their interval, which is summed up over a phase (or over a bucket when downsampling)
+MEAN_METRICS = (
+    'lmsensors_temperature_component',
+    'lmsensors_fan_component',
+    'cpu_utilization_procfs_system',
+    'cpu_utilization_mach_system',
+    'cpu_utilization_cgroup_container',
+    'cpu_utilization_cgroup_system',
+    'memory_used_cgroup_container',
+    'memory_used_cgroup_system',
+    'memory_used_procfs_system',
+    'energy_impact_powermetrics_vm',
+    'disk_used_statvfs_system',
+    'cpu_frequency_msr_core',
+    'cpu_throttling_thermal_msr_component',
+    'cpu_throttling_power_msr_component',
+    'carbon_intensity_elephant_machine',
+    'carbon_intensity_electricity_maps_machine',
+    'carbon_intensity_static_machine',
+    'carbon_intensitylevel_electricitymaps_machine',
+)
+
 def _is_carbon_intensity_metric(metric, unit):
     # Matched by naming convention (any provider under metric_providers/carbon/intensity/*/machine) instead of
     # an explicit list of provider names, so a newly added provider is picked up automatically. The unit check
@@ -104,59 +133,84 @@ def _percentile_cont(sorted_values, p):
     return float(sorted_values[lower] + frac * (sorted_values[upper] - sorted_values[lower]))
 
 
-def _compute_metric_phase_stats(times, values, phase_start, phase_end, next_phase_start, duration):
-    # Re-implements in Python what used to be a per (metric, phase) SQL query against
-    # measurement_values: sum/max/min/avg over the phase, a time-weighted average and
-    # a derivative (both based on a LAG-style diff to the previous sample), plus the
-    # sampling rate stats. `times`/`values` must already be sorted by time ascending.
+def _empty_metric_phase_stats():
+    # if we do not have at least one sample, we simply return.
+    # This is a design change to the previous version where we would still calculate but then set in_phase = 0
+    # However we did never use that value
+    # Technically it would be interesting to still pad the phase with one sample
+    # if possible, but it would give a very distorted picture as you would get the same amount of energy
+    # when using a 100 ms sampling rate for 10ms and 1ms windows. As simply the next value is taken
+    # Here we believe it is better to not show a value at all as the relative error margin then then is smaller
+    # The error when actually having seen one sample and then adding another is still substantial in case of only
+    # one measurement (100 ms  + 10 ms => 2 samples @ 100ms sampling rate ==> energy of 200 ms window instead of 110 ms)
+    # This code can be improved in the future by maybe deciding when to bring the value in for energy measurements
+    # or by forcing a sample tick in the provider.
+    return {
+        'value_sum': None, 'max_value': None, 'min_value': None, 'value_avg': None,
+        'derivative_avg': None, 'derivative_max': None, 'derivative_min': None, 'value_count': 0,
+        'sampling_rate_avg': None, 'sampling_rate_max': None, 'sampling_rate_95p': None,
+    }
+
+
+def _phase_sample_ranges(times, phases):
+    # Determines for every phase the index range [left, right) of the samples that belong to it, in one go
+    # for all phases instead of a separate bisect per (phase, metric) pair. `times` must be an int64 numpy array
+    # sorted ascending. Phase starts and ends are searched as two sorted arrays, for which searchsorted carries
+    # the previous position over to the next key, so this effectively walks the phase boundaries together
+    # with the samples. The [RUNTIME] phase gets None as it is reconstructed from its sub-phases later.
     #
+    # Samples strictly after the phase start and strictly before the phase end belong to the phase.
     # To be able to compute a diff/derivative at the phase boundary, the first sample
     # at or after phase_end (but still before the next phase starts) is folded into the
     # aggregates too - exactly like the previous query's "next_one" CTE did.
+    # This parts is the revamped "phase_padding" mechanic. Due to sampling we might have data that
+    # technically should belong to this phase in the pause between phases as for instance kernel might report during
+    # the sleep of the sampler. Only exception is if it already belongs to another phase or we have nor mor samples to map.
+    lefts = np.searchsorted(times, np.array([phase['start'] for phase in phases], dtype=np.int64), side='right')
+    rights = np.searchsorted(times, np.array([phase['end'] for phase in phases], dtype=np.int64), side='left')
+
+    ranges = []
+    for idx, phase in enumerate(phases):
+        if phase['name'] == '[RUNTIME]':
+            ranges.append(None)
+            continue
+
+        left = int(lefts[idx])
+        right = int(rights[idx])
+        next_phase_start = phases[idx+1]['start'] if idx+1 < len(phases) else MAX_POSTGRES_BIGINT
+
+        # Padding only happens if the phase has at least one sample of its own. See _empty_metric_phase_stats()
+        # - right boundary is not at phase border. (can be at max len(times) ... so right != len(times) would also work)
+        # - AND not part of next phase
+        if left < right:
+            if right < len(times) and times[right] < next_phase_start:
+                right += 1
+
+        ranges.append((left, right))
+    return ranges
+
+
+def _compute_metric_phase_stats(times, values, left, right, duration):
+    # Re-implements in Python what used to be a per (metric, phase) SQL query against
+    # measurement_values: sum/max/min/avg over the phase, a time-weighted average and
+    # a derivative (both based on a LAG-style diff to the previous sample), plus the
+    # sampling rate stats. `times`/`values` must already be sorted by time ascending and
+    # the phase consists of the samples in [left, right), see _phase_sample_ranges().
+    # The samples are accessed by index, so no slice of the series is ever copied.
+    #
     # Derivative Values
     # These are only a true derivate if value is already a difference, which is the case for energy values
     # and for _io_ providers or any other that outputs increments instead of totals
     # using the derivative for other providers makes no sense atm
 
-    left = bisect.bisect_right(times, phase_start)
-    right = bisect.bisect_left(times, phase_end)
-
-    combined_times = list(times[left:right])
-    combined_values = list(values[left:right])
-
-    if len(combined_values) == 0:
-        # if we do not have at least one sample, we simply return.
-        # This is a design change to the previous version where we would still calculate but then set in_phase = 0
-        # However we did never use that value
-        # Technically it would be interesting to still pad the phase with one sample
-        # if possible, but it would give a very distorted picture as you would get the same amount of energy
-        # when using a 100 ms sampling rate for 10ms and 1ms windows. As simply the next value is taken
-        # Here we believe it is better to not show a value at all as the relative error margin then then is smaller
-        # The error when actually having seen one sample and then adding another is still substantial in case of only
-        # one measurement (100 ms  + 10 ms => 2 samples @ 100ms sampling rate ==> energy of 200 ms window instead of 110 ms)
-        # This code can be improved in the future by maybe deciding when to bring the value in for energy measurements
-        # or by forcing a sample tick in the provider.
-        return {
-            'value_sum': None, 'max_value': None, 'min_value': None, 'value_avg': None,
-            'derivative_avg': None, 'derivative_max': None, 'derivative_min': None, 'value_count': 0,
-            'sampling_rate_avg': None, 'sampling_rate_max': None, 'sampling_rate_95p': None,
-        }
-
-    # This parts is the revamped "phase_padding" mechanic. Due to sampling we might have data that
-    # technically should belong to this phase in the pause between phases as for instance kernel might report during
-    # the sleep of the sampler. Only exception is if it already belongs to another phase or we have nor mor samples to map.
-    #
-    # - right boundary is not at phase border. (can be at max len(times) ... so right != len(times) would also work)
-    # - AND not part of next phase
-    if right < len(times) and times[right] < next_phase_start:
-        combined_times.append(times[right])
-        combined_values.append(values[right])
+    if left == right:
+        return _empty_metric_phase_stats()
 
     # we make everything Decimal so in subsequent divisions these values stay Decimal
-    value_count = Decimal(len(combined_values))
-    value_sum = Decimal(sum(combined_values))
-    max_value = Decimal(max(combined_values))
-    min_value = Decimal(min(combined_values))
+    value_count = Decimal(right - left)
+    value_sum = Decimal(sum(values[i] for i in range(left, right)))
+    max_value = Decimal(max(values[i] for i in range(left, right)))
+    min_value = Decimal(min(values[i] for i in range(left, right)))
     classic_value_avg = Decimal(value_sum) / Decimal(value_count)
 
     # sampling rate is derivable as soon as there is at least one diff between two samples,
@@ -171,11 +225,11 @@ def _compute_metric_phase_stats(times, values, phase_start, phase_end, next_phas
         # index 0 has no predecessor, its diff is NULL by concept
         # We could estimate it with an AVG, but this would increase complexity of this query as well as create fake values in case of network,
         # where we cannot assume that the value before the first measurement is linearly extraploateable. thus we do skip it
-        for i in range(1, int(value_count)):
-            diff = combined_times[i] - combined_times[i - 1]
-            weighted_num += Decimal(combined_values[i]) * diff
+        for i in range(left + 1, right):
+            diff = times[i] - times[i - 1]
+            weighted_num += Decimal(values[i]) * diff
             weighted_den += diff
-            derivative_values.append(Decimal(combined_values[i]) / diff) # can flake with division by zero if database is corrupted which should never be. Thus no guard. we simply fail
+            derivative_values.append(Decimal(values[i]) / diff) # can flake with division by zero if database is corrupted which should never be. Thus no guard. we simply fail
             diff_values.append(diff)
         weighted_value_avg = weighted_num / Decimal(weighted_den)
 
@@ -212,11 +266,247 @@ def _compute_metric_phase_stats(times, values, phase_start, phase_end, next_phas
 
 
 
-def build_and_store_phase_stats(run_id, sci=None, sci_metrics=None):
+def _exact_int_sum(values):
+    # int64 sums silently wrap around on overflow. Only use numpy if the result provably fits,
+    # otherwise fall back to Python's arbitrary precision ints
+    if values.size == 0:
+        return 0
+    if int(np.abs(values).max()) * values.size < MAX_POSTGRES_BIGINT:
+        return int(values.sum())
+    return sum(values.tolist())
+
+def _exact_int_dot(values, weights):
+    # see _exact_int_sum(). weights must be >= 0, which holds for time diffs of a sorted series
+    if values.size == 0:
+        return 0
+    if int(np.abs(values).max()) * int(weights.sum()) < MAX_POSTGRES_BIGINT:
+        return int(np.dot(values, weights))
+    return sum(value * weight for value, weight in zip(values.tolist(), weights.tolist()))
+
+def _percentile_cont_numpy(values, p):
+    # Same result as _percentile_cont(sorted(values), p), but only partitions around the two ranks
+    # that are needed instead of sorting the whole array. Interpolation is done on Python ints with the
+    # exact same formula so the returned float is bit-identical.
+    n = values.size
+    if n == 0:
+        return None
+    if n == 1:
+        return float(values[0])
+    rank = p * (n - 1)
+    lower = math.floor(rank)
+    upper = math.ceil(rank)
+    partitioned = np.partition(values, (lower, upper))
+    if lower == upper:
+        return float(partitioned[lower])
+    frac = rank - lower
+    lower_value = int(partitioned[lower])
+    upper_value = int(partitioned[upper])
+    return float(lower_value + frac * (upper_value - lower_value))
+
+
+def _exact_extreme_derivative(derivative_values, lagged_values, diff_values, is_max):
+    # Returns the max (or min) of the Decimal quotients lagged_values / diff_values like the reference does.
+    # The float64 quotients of int64 values are off by a few ulps at most, so near-equal derivatives can tie or swap
+    # order in float64. Every quotient within 2**-50 relative of the float64 extreme is thus a candidate and the
+    # candidates are compared exactly. Usually that is a single sample
+    extreme = derivative_values.max() if is_max else derivative_values.min()
+    tolerance = abs(extreme) * 2**-50
+    if is_max:
+        candidates = np.flatnonzero(derivative_values >= extreme - tolerance)
+    else:
+        candidates = np.flatnonzero(derivative_values <= extreme + tolerance)
+    quotients = (Decimal(int(lagged_values[idx])) / int(diff_values[idx]) for idx in candidates)
+    return max(quotients) if is_max else min(quotients)
+
+
+def _compute_metric_phase_stats_numpy(times, values, left, right, duration):
+    # Vectorized drop-in for _compute_metric_phase_stats(). `times`/`values` must be int64 numpy arrays
+    # sorted by time ascending. The phase is only accessed through array views, so nothing is copied.
+    #
+    # Precision contract against the Decimal reference implementation (checked by the equivalence tests
+    # in tests/lib/test_phase_stats.py):
+    # - value_count, value_sum, max_value, min_value and sampling_rate_max are identical. Integer sums are
+    #   done in int64 only if they cannot overflow, otherwise with Python ints.
+    # - value_avg is identical for both the classic and the time weighted average, as the weighted
+    #   numerator is summed exactly and then divided in Decimal, just as the reference does.
+    # - derivative_max / derivative_min are identical. float64 only narrows down the candidates for the extreme
+    #   sample, which are then compared as Decimal quotients. See _exact_extreme_derivative()
+    # - sampling_rate_avg and sampling_rate_95p are identical floats.
+    # - derivative_avg is the mean of float64 quotients and has a relative error of <= 1e-12 compared to the
+    #   reference. After rounding to BIGINT for storage the value only differs if the exact result lies within
+    #   that error of a .5 boundary.
+
+    if left == right:
+        return _empty_metric_phase_stats()
+
+    phase_times = times[left:right] # views, no copies
+    phase_values = values[left:right]
+    count = right - left
+
+    value_count = Decimal(count)
+    value_sum = Decimal(_exact_int_sum(phase_values))
+    max_value = Decimal(int(phase_values.max()))
+    min_value = Decimal(int(phase_values.min()))
+    classic_value_avg = value_sum / value_count
+
+    if count > 1:
+        diff_values = np.diff(phase_times)
+        lagged_values = phase_values[1:] # index 0 has no predecessor, its diff is NULL by concept
+        weighted_den = int(phase_times[-1] - phase_times[0]) # equals the sum of all diffs
+        weighted_value_avg = Decimal(_exact_int_dot(lagged_values, diff_values)) / Decimal(weighted_den)
+
+        with np.errstate(divide='raise', invalid='raise'): # a zero diff means a corrupted database. We simply fail like the reference
+            derivative_values = lagged_values / diff_values
+        weighted_derivative_avg = Decimal(float(derivative_values.mean()))
+        weighted_derivative_max = _exact_extreme_derivative(derivative_values, lagged_values, diff_values, is_max=True)
+        weighted_derivative_min = _exact_extreme_derivative(derivative_values, lagged_values, diff_values, is_max=False)
+
+        sampling_rate_avg = weighted_den / (count - 1)
+        sampling_rate_max = int(diff_values.max())
+        sampling_rate_95p = _percentile_cont_numpy(diff_values, 0.95)
+    else:
+        sampling_rate_avg = sampling_rate_max = sampling_rate_95p = None
+
+    if count in (1, 2):
+        value_avg = classic_value_avg
+        derivative_avg = classic_value_avg / (duration / value_count)
+        derivative_max = max_value / (duration / value_count)
+        derivative_min = min_value / (duration / value_count)
+    else:
+        value_avg = weighted_value_avg # pylint: disable=possibly-used-before-assignment
+        derivative_avg = weighted_derivative_avg # pylint: disable=possibly-used-before-assignment
+        derivative_max = weighted_derivative_max # pylint: disable=possibly-used-before-assignment
+        derivative_min = weighted_derivative_min # pylint: disable=possibly-used-before-assignment
+
+    return {
+        'value_sum': value_sum, 'max_value': max_value, 'min_value': min_value, 'value_avg': value_avg,
+        'derivative_avg': derivative_avg, 'derivative_max': derivative_max, 'derivative_min': derivative_min, 'value_count': value_count,
+        'sampling_rate_avg': sampling_rate_avg, 'sampling_rate_max': sampling_rate_max, 'sampling_rate_95p': sampling_rate_95p,
+    }
+
+# 'decimal' is the pure Python reference implementation, 'numpy' the vectorized default
+PHASE_STATS_KERNELS = {
+    'decimal': _compute_metric_phase_stats,
+    'numpy': _compute_metric_phase_stats_numpy,
+}
+
+
+def _compute_metric_all_phase_stats(times, values, phases, kernel='numpy'):
+    # Returns the stats of one metric for every phase, indexed like `phases`. The [RUNTIME] phase
+    # gets None as it is not computed from samples but reconstructed from its sub-phases later.
+    # As the phases do not overlap every sample is aggregated at most twice (once more as padding),
+    # so the work per metric is linear in the number of samples plus phases.
+    compute_metric_phase_stats = PHASE_STATS_KERNELS[kernel]
+    time_array = np.asarray(times, dtype=np.int64)
+    if kernel == 'numpy':
+        times = time_array
+        values = np.asarray(values, dtype=np.int64)
+
+    all_phase_stats = []
+    for phase, sample_range in zip(phases, _phase_sample_ranges(time_array, phases)):
+        if sample_range is None:
+            all_phase_stats.append(None)
+            continue
+        duration = Decimal(phase['end']-phase['start'])
+        all_phase_stats.append(compute_metric_phase_stats(times, values, sample_range[0], sample_range[1], duration))
+    return all_phase_stats
+
+
+def _iter_metric_time_series(run_id, streaming=False):
+    # Yields (measurement_metric_id, times, values) for every metric of the run, values sorted by time.
+    #
+    # The default reads the whole run in one fetch_all. This is suprisingly efficient on CPU as even a 3 hour run
+    # only takes 11 seconds to process, however it is very costly on memory as a 3 hour run uses 800 MB resident memory.
+    # With `streaming` the rows are read through a server-side cursor in batches instead and grouped here
+    # one measurement_metric_id at a time, so peak memory is bounded by the largest single metric series
+    # and not by the size of the whole run. This is what makes runs of 24h+ possible.
+    # Runs that were moved to cold storage are read from their archive file. See lib/measurement_archive.py
+    if is_archived(run_id):
+        if streaming:
+            for measurement_metric_id, times, values in iter_archived_measurements(run_id):
+                yield measurement_metric_id, times.tolist(), values.tolist()
+            return
+
+        measurement_metric_ids, times, values = read_archived_measurements(run_id)
+        boundaries = np.flatnonzero(np.diff(measurement_metric_ids)) + 1
+        starts = np.concatenate(([0], boundaries)) if len(measurement_metric_ids) else []
+        for start, end in zip(starts, np.concatenate((boundaries, [len(measurement_metric_ids)]))):
+            yield int(measurement_metric_ids[start]), times[start:end].tolist(), values[start:end].tolist()
+        return
+
+    measurement_values_query = """
+        SELECT mv.measurement_metric_id, mv.time, mv.value
+        FROM measurement_values mv
+        JOIN measurement_metrics mm ON mm.id = mv.measurement_metric_id
+        WHERE mm.run_id = %s
+            AND mv.measurement_metric_id BETWEEN %s AND %s -- lets postgres prune the partitions
+        ORDER BY mv.measurement_metric_id ASC, mv.time ASC
+    """
+    params = (run_id, *get_run_measurement_metric_id_range(run_id))
+    if streaming:
+        rows = DB().fetch_iter(measurement_values_query, params)
+    else:
+        rows = DB().fetch_all(measurement_values_query, params)
+
+    for measurement_metric_id, metric_rows in itertools.groupby(rows, key=lambda row: row[0]):
+        times = []
+        values = []
+        for _, m_time, m_value in metric_rows:
+            times.append(m_time)
+            values.append(m_value)
+        yield measurement_metric_id, times, values
+
+
+def _compute_run_metric_phase_stats(run_id, phases, streaming, kernel, workers):
+    # Returns {measurement_metric_id: [stats per phase]} for all metrics of the run.
+    # The stats of one metric do not depend on any other metric, so with workers > 1 they are
+    # computed in a process pool. Everything that combines metrics (SCI, carbon, cgroup splitting) stays
+    # in build_and_store_phase_stats() in the parent process.
+    metric_phase_stats = {}
+    metric_time_series = _iter_metric_time_series(run_id, streaming)
+
+    if workers <= 1:
+        for measurement_metric_id, times, values in metric_time_series:
+            metric_phase_stats[measurement_metric_id] = _compute_metric_all_phase_stats(times, values, phases, kernel)
+        return metric_phase_stats
+
+    # spawn instead of fork, as the parent holds a threaded DB connection pool that must not be duplicated.
+    # The workers never touch the DB or the config, they only get the series and the phases.
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+        pending = {}
+        for measurement_metric_id, times, values in metric_time_series:
+            if kernel == 'numpy': # arrays are pickled as one buffer instead of element by element
+                times = np.asarray(times, dtype=np.int64)
+                values = np.asarray(values, dtype=np.int64)
+            pending[executor.submit(_compute_metric_all_phase_stats, times, values, phases, kernel)] = measurement_metric_id
+
+            # Bound the series in flight. Otherwise the whole run would be queued in memory at once,
+            # which defeats streaming.
+            if len(pending) >= workers * 2:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    metric_phase_stats[pending.pop(future)] = future.result() # re-raises exceptions from the worker
+
+        for future, measurement_metric_id in pending.items():
+            metric_phase_stats[measurement_metric_id] = future.result()
+
+    return metric_phase_stats
+
+
+def build_and_store_phase_stats(run_id, sci=None, sci_metrics=None, streaming=None, kernel=None, workers=None):
     if not sci:
         sci = {}
     if not sci_metrics:
         sci_metrics = []
+    phase_stats_config = GlobalConfig().config.get('phase_stats') or {}
+    if streaming is None:
+        streaming = phase_stats_config.get('streaming', False)
+    if kernel is None:
+        kernel = phase_stats_config.get('kernel', 'numpy')
+    if workers is None:
+        workers = phase_stats_config.get('workers', 1)
+    if kernel not in PHASE_STATS_KERNELS:
+        raise ValueError(f"Unknown phase_stats kernel '{kernel}'. Valid kernels are: {', '.join(PHASE_STATS_KERNELS)}")
 
     query = """
             SELECT id, metric, unit, detail_name
@@ -254,28 +544,11 @@ def build_and_store_phase_stats(run_id, sci=None, sci_metrics=None):
 
     phases = phase_data[0]
 
-    # Fetch every measurement value for the whole run in one go, pre-ordered by metric and
-    # time, instead of issuing one SELECT per (phase, metric) pair further down. All the
-    # window/aggregate math that used to live in that per-pair SQL query is now done in
-    # _compute_metric_phase_stats() on these in-memory, per-metric time series.
-    #
-    # Note: This function is suprisingly efficient on CPU as even a 3 hour run only takes 11 seconds to process here
-    # However it is very costly on memory as a 3 hour run uses 800 MB resident memory here
-    # If we ever want to support really long runs like 24h+ or even monitoring mode this must be chunked / stream
-    # or we need to process it on a machine directly locally connected to the database to not have connection overhead
-
-    measurement_values_query = """
-        SELECT mv.measurement_metric_id, mv.time, mv.value
-        FROM measurement_values mv
-        JOIN measurement_metrics mm ON mm.id = mv.measurement_metric_id
-        WHERE mm.run_id = %s
-        ORDER BY mv.measurement_metric_id ASC, mv.time ASC
-    """
-    metric_time_series = {}
-    for measurement_metric_id, m_time, m_value in DB().fetch_all(measurement_values_query, (run_id, )):
-        metric_time_series.setdefault(measurement_metric_id, ([], []))
-        metric_time_series[measurement_metric_id][0].append(m_time)
-        metric_time_series[measurement_metric_id][1].append(m_value)
+    # All per (metric, phase) aggregates are computed up front, one metric time series at a time.
+    # The phase loop further down then only needs these small per-phase result dicts and never
+    # the raw samples. Thus at most one metric series has to be held in memory at the same time,
+    # as long as the rows are also read in a streaming fashion (see _iter_metric_time_series()).
+    metric_phase_stats = _compute_run_metric_phase_stats(run_id, phases, streaming, kernel, workers)
 
     csv_buffer = StringIO()
 
@@ -300,17 +573,13 @@ def build_and_store_phase_stats(run_id, sci=None, sci_metrics=None):
         machine_energy_current_phase = None
 
         duration = Decimal(phase['end']-phase['start'])
-        next_phase_start = phases[idx+1]['start'] if idx+1 < len(phases) else MAX_POSTGRES_BIGINT
         duration_in_s = Decimal(duration / 1_000_000)
         csv_buffer.write(generate_csv_line(phase['hidden'], run_id, 'phase_time_syscall_system', '[SYSTEM]', f"{idx:03}_{phase['name']}", duration, 'TOTAL', None, None, None, None, None, 'us'))
 
-        # we go through all metrics in the run and aggregate them, using the pre-fetched
-        # per-metric time series instead of running a SELECT per (phase, metric) pair
+        # we go through all metrics in the run and aggregate them, using the pre-computed
+        # per-metric phase stats instead of running a SELECT per (phase, metric) pair
         for measurement_metric_id, metric, unit, detail_name in metrics: # unpack
-            times = metric_time_series[measurement_metric_id][0] # can fail if metric does not exist. This should never be. Thus we simply crash
-            values = metric_time_series[measurement_metric_id][1] # can fail if metric does not exist. This should never be. Thus we simply crash
-
-            metric_stats = _compute_metric_phase_stats(times, values, phase['start'], phase['end'], next_phase_start, duration)
+            metric_stats = metric_phase_stats[measurement_metric_id][idx] # can fail if metric does not exist. This should never be. Thus we simply crash
 
             # no need to calculate if we have no results to work on
             # This can happen if the phase is too short
@@ -337,26 +606,7 @@ def build_and_store_phase_stats(run_id, sci=None, sci_metrics=None):
                 if is_undersampled:
                     phase_warnings.add(f"Very few samples (< 50% of observed duration or < 2) encountered in phase '{phase['name']}' and metric '{metric}', MEAN values might be inaccurate")
 
-            if metric in (
-                'lmsensors_temperature_component',
-                'lmsensors_fan_component',
-                'cpu_utilization_procfs_system',
-                'cpu_utilization_mach_system',
-                'cpu_utilization_cgroup_container',
-                'cpu_utilization_cgroup_system',
-                'memory_used_cgroup_container',
-                'memory_used_cgroup_system',
-                'memory_used_procfs_system',
-                'energy_impact_powermetrics_vm',
-                'disk_used_statvfs_system',
-                'cpu_frequency_msr_core',
-                'cpu_throttling_thermal_msr_component',
-                'cpu_throttling_power_msr_component',
-                'carbon_intensity_elephant_machine',
-                'carbon_intensity_electricity_maps_machine',
-                'carbon_intensity_static_machine',
-                'carbon_intensitylevel_electricitymaps_machine',
-            ):
+            if metric in MEAN_METRICS:
                 csv_buffer.write(generate_csv_line(phase['hidden'], run_id, metric, detail_name, f"{idx:03}_{phase['name']}", metric_stats['value_avg'], 'MEAN', metric_stats['max_value'], metric_stats['min_value'], metric_stats['sampling_rate_avg'], metric_stats['sampling_rate_max'], metric_stats['sampling_rate_95p'], unit))
 
                 if metric in ('cpu_utilization_procfs_system', 'cpu_utilization_mach_system'):
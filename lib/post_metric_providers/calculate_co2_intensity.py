@@ -2,12 +2,31 @@ import sys
 import faulthandler
 faulthandler.enable(file=sys.__stderr__)  # will catch segfaults and write to stderr
 
-from bisect import bisect_right
-from decimal import Decimal
-from io import StringIO
+import numpy as np
 
 from lib.db import DB
 
+UJ_GCO2E_PER_KWH_TO_UGCO2E = 3_600_000 # uJ * gCO2e/kWh / 3.6e12 uJ/kWh * 1e6 ug/g
+
+# Returns the carbon in ugCO2e of every energy sample, using the carbon intensity that was current at its time.
+# Samples before the first carbon intensity sample use the first one.
+# Rounded half to even, which is what round() of the former Decimal implementation did.
+def carbon_ug_from_energy(energy_times, energy_values, carbon_times, carbon_intensities):
+    carbon_index = np.maximum(np.searchsorted(carbon_times, energy_times, side='right') - 1, 0)
+    intensities = carbon_intensities[carbon_index]
+
+    energy_values = np.asarray(energy_values, dtype=np.int64)
+    max_product = int(np.abs(energy_values).max(initial=0)) * int(np.abs(intensities).max(initial=0))
+    if max_product >= np.iinfo(np.int64).max:
+        # exact, but slow, python integers instead of silently wrapping around
+        energy_values = energy_values.astype(object)
+        intensities = intensities.astype(object)
+
+    products = energy_values * intensities
+    quotient, remainder = products // UJ_GCO2E_PER_KWH_TO_UGCO2E, products % UJ_GCO2E_PER_KWH_TO_UGCO2E # floor division, so remainder is never negative
+    round_up = (2 * remainder > UJ_GCO2E_PER_KWH_TO_UGCO2E) | ((2 * remainder == UJ_GCO2E_PER_KWH_TO_UGCO2E) & (quotient % 2 == 1))
+    return (quotient + round_up).astype(np.int64)
+
 def calculate_co2_intensity(run_id):
     carbon_intensity_metrics = DB().fetch_all('''
         SELECT id, metric, detail_name
@@ -29,27 +48,28 @@ def calculate_co2_intensity(run_id):
     if not machine_energy_metrics:
         return
 
+    # Every series is read once for all combinations. The ids are constants, so postgres only opens the partitions of the run
+    rows = DB().fetch_all('''
+        SELECT measurement_metric_id, time, value
+        FROM measurement_values
+        WHERE measurement_metric_id = ANY(%s::int[])
+        ORDER BY measurement_metric_id ASC, time ASC
+    ''', params=([metric[0] for metric in carbon_intensity_metrics + machine_energy_metrics], ))
+    measurement_metric_ids, times, values = np.array(rows, dtype=np.int64).reshape(-1, 3).T
 
+    def get_series(measurement_metric_id):
+        start, end = np.searchsorted(measurement_metric_ids, [measurement_metric_id, measurement_metric_id + 1])
+        return times[start:end], values[start:end]
+
+    derived_ids, derived_times, derived_values = [], [], []
     for carbon_metric_id, carbon_metric, carbon_detail_name in carbon_intensity_metrics:
-        carbon_values = DB().fetch_all('''
-            SELECT time, value
-            FROM measurement_values
-            WHERE measurement_metric_id = %s
-            ORDER BY time ASC
-        ''', params=(carbon_metric_id, ))
-
-        if not carbon_values:
+        carbon_times, carbon_intensities = get_series(carbon_metric_id)
+        if len(carbon_times) == 0:
             continue
 
         for energy_metric_id, energy_metric, energy_detail_name in machine_energy_metrics:
-            energy_values = DB().fetch_all('''
-                SELECT time, value
-                FROM measurement_values
-                WHERE measurement_metric_id = %s
-                ORDER BY time ASC
-            ''', params=(energy_metric_id, ))
-
-            if not energy_values:
+            energy_times, energy_values = get_series(energy_metric_id)
+            if len(energy_times) == 0:
                 continue
 
             detail_name = f"{energy_detail_name}_{carbon_metric}_{carbon_detail_name}"
@@ -60,23 +80,17 @@ def calculate_co2_intensity(run_id):
                 RETURNING id
             ''', params=(run_id, derived_metric, detail_name, 'ugCO2e'))[0]
 
-            csv_buffer = StringIO()
-            carbon_times = [entry[0] for entry in carbon_values]
-            carbon_intensities = [entry[1] for entry in carbon_values]
-
-            for energy_time, energy_value in energy_values:
-                carbon_index = bisect_right(carbon_times, energy_time) - 1
-                carbon_index = max(carbon_index, 0)
-
-                current_carbon_value = carbon_intensities[carbon_index]
-                carbon_ug = Decimal(energy_value) * Decimal(current_carbon_value) / Decimal(3_600_000)
-                csv_buffer.write(f"{derived_metric_id},{round(carbon_ug)},{energy_time}\n")
-
-            csv_buffer.seek(0)
-            DB().copy_from(
-                csv_buffer,
-                table='measurement_values',
-                sep=',',
-                columns=('measurement_metric_id', 'value', 'time')
-            )
-            csv_buffer.close()
+            derived_ids.append(np.full(len(energy_times), derived_metric_id, dtype=np.int64))
+            derived_times.append(energy_times)
+            derived_values.append(carbon_ug_from_energy(energy_times, energy_values, carbon_times, carbon_intensities))
+
+    if not derived_ids:
+        return
+
+    # all derived series in one COPY
+    DB().copy_from_integer_arrays(
+        [np.concatenate(derived_ids), np.concatenate(derived_values), np.concatenate(derived_times)],
+        table='measurement_values',
+        columns=('measurement_metric_id', 'value', 'time'),
+        pg_types=('int', 'bigint', 'bigint'),
+    )
@@ -2297,12 +2297,27 @@ class ScenarioRunner:
         if self._measurement_total_duration and (time.time() - self.__start_measurement_seconds) > self._measurement_total_duration:
             raise TimeoutError(f"Timeout of {self._measurement_total_duration} s was exceeded. This can be configured in the user authentication for 'total_duration'.")
 
+    # Parses what the metric providers have written so far, so that _stop_metric_providers() only has to parse the
+    # remainder of the log files. Done at the start of the phase transition, which is not attributed to any phase
+    # and then still followed by the full transition sleep so that the system can settle again.
+    # The flows of [RUNTIME] start without a transition, so nothing is parsed during [RUNTIME]. Its rows are only
+    # kept in memory and imported after the run. See measurement.tail_metric_logs in config.yml.example
+    def _tail_metric_providers(self):
+        if self._dev_no_metrics or not GlobalConfig().config['measurement'].get('tail_metric_logs', False):
+            return
+
+        for metric_provider in self.__metric_providers:
+            if metric_provider.has_started() and metric_provider.supports_tailing():
+                metric_provider.tail_metrics()
+
     def _start_phase(self, phase, *, hidden=False, transition=True):
         print(TerminalColors.HEADER, f"\nStarting phase {phase}.", TerminalColors.ENDC)
 
         self._check_total_runtime_exceeded()
 
         if transition:
+            self._tail_metric_providers()
+
             # The force-sleep must go and we must actually check for the temperature baseline
             print(f"\nForce-sleeping for {self._measurement_phase_transition_time}s")
             self._custom_sleep(self._measurement_phase_transition_time)
@@ -2535,6 +2550,10 @@ class ScenarioRunner:
             return
 
         errors = []
+        stopped_metric_providers = []
+
+        # All providers are stopped first, so that the measurement window closes at the same time for all of them
+        # and no provider keeps on sampling while the data of another one is still parsed and imported.
         for metric_provider in self.__metric_providers:
             if not metric_provider.has_started():
                 continue
@@ -2550,28 +2569,44 @@ class ScenarioRunner:
             except Exception as exc:
                 errors.append(f"Could not stop profiling on {metric_provider.__class__.__name__}: {str(exc)}")
 
-            try:
-                df = metric_provider.read_metrics()
-            except RuntimeError as exc:
-                errors.append(f"{metric_provider.__class__.__name__} returned error message: {str(exc)}")
-                continue
+            stopped_metric_providers.append(metric_provider)
 
-            if self._dev_no_save:
-                print('Skipping import of metrics from provider due to --dev-no-save')
-                continue
-
-            if isinstance(df, list):
-                for i, dfi in enumerate(df):
-                    metric_importer.import_measurements(dfi, metric_provider._sub_metrics_name[i], self._run_id)
-            else:
-                metric_importer.import_measurements(df, metric_provider._metric_name, self._run_id)
+        # Parsing, validation and the DB import of the single providers are independent of each other.
+        # pandas and psycopg release the GIL for most of that work, so threads overlap them well.
+        # The threads share the connection pool of DB()
+        import_workers = GlobalConfig().config['measurement'].get('metric_import_workers', 1)
+        if import_workers > 1 and len(stopped_metric_providers) > 1:
+            with ThreadPoolExecutor(max_workers=min(len(stopped_metric_providers), import_workers)) as executor:
+                import_errors = list(executor.map(self._import_metric_provider_measurements, stopped_metric_providers))
+        else:
+            import_errors = [self._import_metric_provider_measurements(metric_provider) for metric_provider in stopped_metric_providers]
 
-            print('Imported', TerminalColors.HEADER, len(df), TerminalColors.ENDC, 'metrics from ', metric_provider.__class__.__name__)
+        errors.extend(error for error in import_errors if error is not None)
 
         self.__metric_providers.clear()
         if errors:
             raise RuntimeError("\n".join(errors))
 
+    # Returns an error message instead of raising, so that a failing provider does not prevent the import of the others
+    def _import_metric_provider_measurements(self, metric_provider):
+        try:
+            df = metric_provider.read_metrics()
+        except RuntimeError as exc:
+            return f"{metric_provider.__class__.__name__} returned error message: {str(exc)}"
+
+        if self._dev_no_save:
+            print('Skipping import of metrics from provider due to --dev-no-save')
+            return None
+
+        if isinstance(df, list):
+            for i, dfi in enumerate(df):
+                metric_importer.import_measurements(dfi, metric_provider._sub_metrics_name[i], self._run_id)
+        else:
+            metric_importer.import_measurements(df, metric_provider._metric_name, self._run_id)
+
+        print('Imported', TerminalColors.HEADER, len(df), TerminalColors.ENDC, 'metrics from ', metric_provider.__class__.__name__)
+        return None
+
     def _handle_process_output(self, stdout, stderr, container_name, log_type,
                               log_id, cmd, phase, flow=None,
                               read_notes_stdout=False, detail_name=None):
@@ -1,8 +1,10 @@
 import os
+import io
+import mmap
 from pathlib import Path
 import platform
 import subprocess
-from io import StringIO
+import numpy as np
 import pandas
 from typing import final
 
@@ -12,7 +14,69 @@ from lib import process_helpers
 class MetricProviderConfigurationError(ConfigurationCheckError):
     pass
 
+# Read-only file object over a byte range of a memory mapped log file. pandas pulls the data through readinto()
+# in small pieces straight from the page cache, so the range is never copied into a Python bytes or str object
+class MappedRangeReader(io.RawIOBase):
+    def __init__(self, mapped, start, end):
+        super().__init__()
+        self._view = memoryview(mapped)[start:end]
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = min(len(buffer), len(self._view) - self._position)
+        buffer[:size] = self._view[self._position:self._position+size]
+        self._position += size
+        return size
+
+    def close(self):
+        self._view.release() # the mmap can only be closed once no view into it exists anymore
+        super().close()
+
+# Quantile (linear interpolation, like pandas and numpy default) of the time differences between consecutive
+# measurements of every group. Returns one value per group id, NaN for groups with less than two measurements.
+# Instead of a Python callback per group, everything is done with two sorts over the whole data
+def _grouped_time_diff_quantile(group_ids, times, quantile):
+    group_count = group_ids.max() + 1 if group_ids.size else 0
+
+    order = np.lexsort((times, group_ids)) # by group, then time
+    group_ids = group_ids[order]
+    same_group = group_ids[1:] == group_ids[:-1]
+    diff_group_ids = group_ids[1:][same_group]
+    diffs = np.diff(times[order])[same_group]
+
+    diffs = diffs[np.lexsort((diffs, diff_group_ids))] # diff_group_ids is already sorted, so the order of groups stays
+    counts = np.bincount(diff_group_ids, minlength=group_count)
+    starts = np.cumsum(counts) - counts
+
+    quantiles = np.full(group_count, np.nan)
+    has_diffs = counts > 0
+    position = quantile * (counts[has_diffs] - 1)
+    lower = np.floor(position).astype(np.int64)
+    upper = np.minimum(lower + 1, counts[has_diffs] - 1)
+    fraction = position - lower
+    lower_values = diffs[starts[has_diffs] + lower].astype(np.float64)
+    upper_values = diffs[starts[has_diffs] + upper].astype(np.float64)
+    # same interpolation formula as numpy.percentile, so the results are identical
+    quantiles[has_diffs] = np.where(fraction >= 0.5,
+                                    upper_values - (upper_values - lower_values) * (1 - fraction),
+                                    lower_values + (upper_values - lower_values) * fraction)
+    return quantiles
+
+# Maps the raw ids in a column (container ids, cgroup names) to their display names in one pass over the codes of
+# a Categorical, instead of one full column comparison per id. Ids without a mapping are kept as they are.
+# The result stays a Categorical to save memory. Its categories are sorted, so that sorting by it gives the same
+# order as sorting the plain strings
+def map_to_categorical(series, mapping):
+    raw = pandas.Categorical(series)
+    names = pandas.Index([mapping.get(token, token) for token in raw.categories])
+    categories = names.unique().sort_values()
+    return pandas.Series(pandas.Categorical.from_codes(categories.get_indexer(names)[raw.codes], categories=categories), index=series.index)
+
 class BaseMetricProvider:
+    TAIL_BLOCK_SIZE = 64 * 1024 * 1024 # bytes of the log file that tail_metrics() parses at once
 
     def __init__(self, *,
         metric_name,
@@ -25,6 +89,7 @@ class BaseMetricProvider:
         sudo=False,
         disable_buffer=True,
         skip_check=False,
+        binary_output=False,
     ):
         self._metric_name = metric_name
         self._metrics = metrics
@@ -36,11 +101,17 @@ class BaseMetricProvider:
         self._has_started = False
         self._disable_buffer = disable_buffer
         self._skip_check = skip_check
+        self._binary_output = binary_output
         self._ps = None
+        self._tail_offset = 0 # bytes of the log file that are already parsed into self._tail_dfs
+        self._tail_dfs = [] # held until _read_metrics() at the end of the run
 
         self._folder = Path(folder).resolve(strict=True)
         self._filename = self._folder.joinpath(f"{self._metric_name}.log")
 
+        if self._binary_output and any(dtype is not int for dtype in self._metrics.values()):
+            raise MetricProviderConfigurationError(f"{self._metric_name} provider cannot write binary output, as not all of its fields are integers")
+
         if not self._skip_check:
             self.check_system()
 
@@ -104,24 +175,73 @@ class BaseMetricProvider:
                 raise ValueError(f"Data from metric provider {self._metric_name} is running into a resolution underflow. Values are <= 1 {self._unit}")
 
     def _read_metrics(self):  # can be overriden in child
-        with open(self._filename, 'r', encoding='utf-8') as file:
-            csv_data = file.read()
-
-        # remove the last line from the string, as it may be broken due to the output buffering of the metrics reporter
-        csv_data = csv_data[:csv_data.rfind('\n')]
+        self.tail_metrics() # parses only what was not already parsed during the run
 
-        # pylint: disable=invalid-name
-        df = pandas.read_csv(StringIO(csv_data),
-                             sep=' ',
-                             names=self._metrics.keys(),
-                             dtype=self._metrics
-                             )
+        if self._tail_dfs:
+            df = pandas.concat(self._tail_dfs, ignore_index=True)
+        else:
+            df = pandas.DataFrame({column: pandas.Series(dtype=dtype) for column, dtype in self._metrics.items()})
 
         if df.isna().any().any():
             raise ValueError(f"Dataframe for {self._metric_name} contained NA values.")
 
         return df
 
+    # Only providers that read their log file with the default _read_metrics() can be parsed incrementally.
+    # All others have their own file formats or need the complete file at once
+    def supports_tailing(self):
+        return type(self)._read_metrics is BaseMetricProvider._read_metrics
+
+    # Parses all complete lines the provider has written since the last call and keeps them as typed DataFrames.
+    # Can be called repeatedly while the provider is still running, so that at the end of the run only the
+    # remainder of the file needs to be parsed. The rows stay in memory and are only written to the DB after the run.
+    # The file is memory mapped and the range up to the last newline is handed to the C parser of pandas in blocks
+    # of TAIL_BLOCK_SIZE bytes, so a long phase does not end up in one huge parse.
+    # The last line is only consumed once it is terminated by a newline, as it may still be broken due to the
+    # output buffering of the metrics reporter
+    def tail_metrics(self):
+        with open(self._filename, 'rb') as file:
+            if os.fstat(file.fileno()).st_size <= self._tail_offset:
+                return # nothing new. Also mmap cannot map empty files
+
+            if self._binary_output:
+                self._tail_binary_records(file)
+                return
+
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                data_end = mapped.rfind(b'\n', self._tail_offset) + 1
+                if data_end == 0:
+                    return
+
+                mapped.madvise(mmap.MADV_SEQUENTIAL)
+                while self._tail_offset < data_end:
+                    # blocks of at most TAIL_BLOCK_SIZE bytes that end on a line border. Only a single line that is
+                    # longer than the block is parsed as a whole
+                    end = mapped.rfind(b'\n', self._tail_offset, min(self._tail_offset + self.TAIL_BLOCK_SIZE, data_end)) + 1
+                    if end == 0:
+                        end = mapped.find(b'\n', self._tail_offset) + 1
+
+                    with io.BufferedReader(MappedRangeReader(mapped, self._tail_offset, end)) as reader:
+                        self._tail_dfs.append(pandas.read_csv(reader,
+                                             sep=' ',
+                                             names=self._metrics.keys(),
+                                             dtype=self._metrics
+                                             ))
+                    self._tail_offset = end
+
+    # In binary output mode (-b) the provider writes fixed width records of little-endian int64 fields in the
+    # order of self._metrics. They are read directly into a structured numpy array without any parsing.
+    # A trailing incomplete record is left for the next call
+    def _tail_binary_records(self, file):
+        record_dtype = np.dtype([(column, '<i8') for column in self._metrics])
+        record_count = (os.fstat(file.fileno()).st_size - self._tail_offset) // record_dtype.itemsize
+        if record_count == 0:
+            return
+
+        records = np.fromfile(file, dtype=record_dtype, count=record_count, offset=self._tail_offset)
+        self._tail_dfs.append(pandas.DataFrame({column: records[column].astype(np.int64) for column in self._metrics}))
+        self._tail_offset += record_count * record_dtype.itemsize
+
     def _check_empty(self, df):
         if df.empty:
             raise RuntimeError(f"Metrics provider {self._metric_name} seems to have not produced any measurements. Metrics log file was empty. Either consider having a higher sample rate or turn off provider.")
@@ -137,14 +257,17 @@ class BaseMetricProvider:
         # for most metric providers only detail_name and container_id should be present and differ though
         excluded_columns = ['time', 'value']
         grouping_columms = [col for col in df.columns if col not in excluded_columns]
-        df['sampling_rate'] = df.groupby(grouping_columms)['time'].diff()
-        df['sampling_rate_95p'] = df.groupby(grouping_columms)['sampling_rate'].transform(lambda x: x.quantile(0.95))
-        df = df.drop('sampling_rate', axis=1)
+        sampling_rates_95p = _grouped_time_diff_quantile(
+            df.groupby(grouping_columms, sort=False, observed=True, dropna=False).ngroup().to_numpy(),
+            df['time'].to_numpy(),
+            0.95
+        )
+        sampling_rates_95p = sampling_rates_95p[~np.isnan(sampling_rates_95p)] # groups with a single measurement have no sampling rate
 
-        if (sampling_rate_95p := df['sampling_rate_95p'].max()) >= self._sampling_rate*1000*1.2:
+        if sampling_rates_95p.size and (sampling_rate_95p := sampling_rates_95p.max()) >= self._sampling_rate*1000*1.2:
             raise RuntimeError(f"Effective sampling rate (95p) was absurdly high: {sampling_rate_95p} compared to configured rate of {self._sampling_rate*1000}", df)
 
-        if (sampling_rate_95p := df['sampling_rate_95p'].min()) <= self._sampling_rate*1000*0.8:
+        if sampling_rates_95p.size and (sampling_rate_95p := sampling_rates_95p.min()) <= self._sampling_rate*1000*0.8:
             raise RuntimeError(f"Effective sampling rate (95p) was absurdly low: {sampling_rate_95p} compared to configured rate of {self._sampling_rate*1000}", df)
 
         return df
@@ -157,7 +280,7 @@ class BaseMetricProvider:
         return df
 
     def _check_unique(self, df):
-        if not (df.groupby(['metric', 'detail_name'])['time'].transform('nunique') == df.groupby(['metric', 'detail_name'])['time'].transform('size')).all():
+        if df.duplicated(subset=['metric', 'detail_name', 'time']).any():
             raise ValueError(f"Metric provider {self._metric_name} did contain non unique timestamps for measurement values. This is not allowed and indicates an error with the clock.")
 
     @final
@@ -191,6 +314,8 @@ class BaseMetricProvider:
         else:
             call_string = f"{self._metric_provider_executable} -i {self._sampling_rate}"
 
+        if self._binary_output:
+            call_string = f"{call_string} -b"
 
         if self._metric_provider_executable[0] != '/':
             call_string = f"{self._current_dir}/{call_string}"
@@ -205,7 +330,7 @@ class BaseMetricProvider:
         if platform.system() == "Linux":
             call_string = f"taskset -c 0 {call_string}"
 
-        if self._disable_buffer:
+        if self._disable_buffer and not self._binary_output: # binary output is buffered by the provider itself and flushed on termination
             call_string = f"stdbuf -o0 {call_string}"
 
         print(call_string)
@@ -226,6 +351,8 @@ class BaseMetricProvider:
 
         # set_block False enables non-blocking reads on stderr.read(). Otherwise it would wait forever on empty
         os.set_blocking(self._ps.stderr.fileno(), False)
+        self._tail_offset = 0 # the log file is truncated by the shell redirect
+        self._tail_dfs = []
         self._has_started = True
 
     def stop_profiling(self):
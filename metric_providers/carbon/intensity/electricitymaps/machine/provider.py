@@ -6,6 +6,7 @@ import requests
 
 from metric_providers.base import BaseMetricProvider, MetricProviderConfigurationError
 from metric_providers.carbon.intensity.helpers import expand_to_sampling_rate
+from lib import carbon_intensity_cache
 
 
 API_PAST_URL = "https://api.electricitymaps.com/v4/carbon-intensity/past-range"
@@ -102,24 +103,29 @@ class CarbonIntensityElectricitymapsMachineProvider(BaseMetricProvider):
 
         return int(parsed.timestamp() * 1_000_000)
 
-    def _read_metrics(self):
+    def _to_values(self, data):
+        values = []
+        for entry in data:
+            time_value = entry.get('datetime')
+            value = entry.get('carbonIntensity')
 
-        headers = {'auth-token': self.token}
+            if time_value is None or value is None:
+                continue
 
-        if self._start_time is None or self._end_time is None:
-            raise RuntimeError(
-                f"{self._metric_name} provider did not record start/end times. Did start_profiling and stop_profiling run?")
+            values.append((self._parse_time(time_value), float(value)))
+        return values
 
+    def _fetch_past_range(self, start_us, end_us):
         params = {
                 'zone': self.region,
-                'start': self._format_time(self._start_time),
-                'end': self._format_time(self._end_time),
+                'start': self._format_time(carbon_intensity_cache.to_datetime(start_us)),
+                'end': self._format_time(carbon_intensity_cache.to_datetime(end_us)),
                 'temporalGranularity': TEMPORAL_GRANULARITY,
             }
 
         response = None
         try:
-            response = requests.get(API_PAST_URL, params=params, headers=headers, timeout=30)
+            response = requests.get(API_PAST_URL, params=params, headers={'auth-token': self.token}, timeout=30)
         except requests.RequestException as exc:
             raise RuntimeError(f"Failed to query Electricity Maps carbon intensity service: {exc}\n") from exc
         finally:
@@ -129,53 +135,59 @@ class CarbonIntensityElectricitymapsMachineProvider(BaseMetricProvider):
         if response.status_code != 200:
             raise RuntimeError(f"Electricity Maps carbon intensity request failed with status {response.status_code}: {response.text}\n")
 
-        data = _extract_timeseries(response.json())
+        return self._to_values(_extract_timeseries(response.json()))
 
-        if len(data) == 0:
-            # As the providers take quite some time to provide data it can happen that short running
-            # jobs don't have any data. So we get predictions
-            params = {
-                'zone': self.region,
-                'temporalGranularity': TEMPORAL_GRANULARITY,
-            }
-            fallback_response = None
-            try:
-                fallback_response = requests.get(
-                    API_FUTURE_URL,
-                    params=params,
-                    headers=headers,
-                    timeout=30,
-                )
+    def _fetch_forecast(self):
+        params = {
+            'zone': self.region,
+            'temporalGranularity': TEMPORAL_GRANULARITY,
+        }
+        fallback_response = None
+        try:
+            fallback_response = requests.get(
+                API_FUTURE_URL,
+                params=params,
+                headers={'auth-token': self.token},
+                timeout=30,
+            )
 
-                if fallback_response.status_code != 200:
-                    raise RuntimeError(f"Electricity Maps carbon intensity fallback request failed with status {fallback_response.status_code}: {fallback_response.text}\n")
+            if fallback_response.status_code != 200:
+                raise RuntimeError(f"Electricity Maps carbon intensity fallback request failed with status {fallback_response.status_code}: {fallback_response.text}\n")
 
-                fallback_data = fallback_response.json()
-            except requests.RequestException as exc:
-                raise RuntimeError(f"Failed to query Electricity Maps carbon intensity service for fallback: {exc}\n") from exc
+            fallback_data = fallback_response.json()
+        except requests.RequestException as exc:
+            raise RuntimeError(f"Failed to query Electricity Maps carbon intensity service for fallback: {exc}\n") from exc
 
-            finally:
-                if fallback_response is not None:
-                    fallback_response.close()
+        finally:
+            if fallback_response is not None:
+                fallback_response.close()
 
+        return self._to_values(_extract_timeseries(fallback_data))
 
-            data = _extract_timeseries(fallback_data)
+    def _read_metrics(self):
+
+        if self._start_time is None or self._end_time is None:
+            raise RuntimeError(
+                f"{self._metric_name} provider did not record start/end times. Did start_profiling and stop_profiling run?")
 
-        records = []
         start_us = int(self._start_time.timestamp() * 1_000_000)
         end_us = int(self._end_time.timestamp() * 1_000_000)
+
+        # Only the parts of the time range that no earlier run fetched are requested, if the cache is configured
+        data = carbon_intensity_cache.get_series(f"electricity_maps/{self.region}", start_us, end_us, self._fetch_past_range)
+
+        if len(data) == 0:
+            # As the providers take quite some time to provide data it can happen that short running
+            # jobs don't have any data. So we get predictions
+            data = carbon_intensity_cache.get_snapshot(f"electricity_maps/{self.region}/forecast", self._fetch_forecast)
+
+        records = []
         closest_entry = None
         closest_distance = None
 
-        for entry in data:
-            time_value = entry.get('datetime')
-            value = entry.get('carbonIntensity')
+        for parsed_time, value in data:
             provider = "electricity_maps"
 
-            if time_value is None or value is None:
-                continue
-
-            parsed_time = self._parse_time(time_value)
             if parsed_time < start_us:
                 distance = start_us - parsed_time
             elif parsed_time > end_us:
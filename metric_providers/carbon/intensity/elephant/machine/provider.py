@@ -6,6 +6,7 @@ import requests
 
 from metric_providers.base import BaseMetricProvider, MetricProviderConfigurationError
 from metric_providers.carbon.intensity.helpers import expand_to_sampling_rate
+from lib import carbon_intensity_cache
 
 
 class CarbonIntensityElephantMachineProvider(BaseMetricProvider):
@@ -141,15 +142,11 @@ class CarbonIntensityElephantMachineProvider(BaseMetricProvider):
 
         return int(parsed.timestamp() * 1_000_000)
 
-    def _read_metrics(self):
-        if self._start_time is None or self._end_time is None:
-            raise RuntimeError(
-                f"{self._metric_name} provider did not record start/end times. Did start_profiling and stop_profiling run?")
-
+    def _fetch_history(self, start_time, end_time):
         params = {
             'region': self.region,
-            'startTime': self._format_time(self._start_time),
-            'endTime': self._format_time(self._end_time),
+            'startTime': self._format_time(start_time),
+            'endTime': self._format_time(end_time),
         }
 
         if self.provider_filter:
@@ -177,12 +174,9 @@ class CarbonIntensityElephantMachineProvider(BaseMetricProvider):
         if not isinstance(data, list):
             raise RuntimeError(f"Unexpected Elephant response for carbon intensity: {data}")
 
-        if len(data) == 0:
-            data = self._get_current_intensity()
-
-        if not isinstance(data, list):
-            raise RuntimeError(f"Unexpected Elephant response for carbon intensity: {data}")
+        return data
 
+    def _to_records(self, data):
         records = []
         for entry in data:
             time_value = entry.get('time')
@@ -196,6 +190,48 @@ class CarbonIntensityElephantMachineProvider(BaseMetricProvider):
                 'value': float(value),
                 'provider': entry.get('provider'),
             })
+        return records
+
+    # Simulated carbon intensities only exist for a single run, so only the real ones of a single provider are cached
+    def _read_cached_records(self):
+        provider_name = f"{self.provider_filter.lower()}_{self.region.lower()}"
+        series = f"elephant/{self._elephant_base_url}/{provider_name}"
+
+        def to_values(data):
+            return [(record['time'], record['value']) for record in self._to_records(data)]
+
+        start_us = int(self._start_time.timestamp() * 1_000_000)
+        values = carbon_intensity_cache.get_series(
+            series,
+            start_us,
+            int(self._end_time.timestamp() * 1_000_000),
+            lambda fetch_start_us, fetch_end_us: to_values(self._fetch_history(carbon_intensity_cache.to_datetime(fetch_start_us), carbon_intensity_cache.to_datetime(fetch_end_us))),
+        )
+        # Unlike Electricity Maps the uncached path has no fallback to the closest value, so the value before the run is not used
+        values = [(time, value) for time, value in values if time >= start_us]
+
+        if len(values) == 0:
+            values = carbon_intensity_cache.get_snapshot(f"{series}/current", lambda: to_values(self._get_current_intensity()))
+
+        return [{'time': time, 'value': float(value), 'provider': provider_name} for time, value in values]
+
+    def _read_metrics(self):
+        if self._start_time is None or self._end_time is None:
+            raise RuntimeError(
+                f"{self._metric_name} provider did not record start/end times. Did start_profiling and stop_profiling run?")
+
+        if self.provider_filter and not self.simulation_uuid and carbon_intensity_cache.get_cache_config() is not None:
+            records = self._read_cached_records()
+        else:
+            data = self._fetch_history(self._start_time, self._end_time)
+
+            if len(data) == 0:
+                data = self._get_current_intensity()
+
+            if not isinstance(data, list):
+                raise RuntimeError(f"Unexpected Elephant response for carbon intensity: {data}")
+
+            records = self._to_records(data)
 
         df = pandas.DataFrame.from_records(records)
 
@@ -1,5 +1,10 @@
+import numpy
 import pandas
 
+# Expands the few carbon intensity samples of a provider to one sample every sampling_rate ms between start and end.
+# The times of the source samples inside the window are kept, so every change of the value is at its exact time.
+# Every sample carries the value of the last source sample at or before it, or of the first one before that.
+# Vectorized, as a 100 ms grid over a 10 hour run is already 360k samples per provider
 def expand_to_sampling_rate(self, df):
     if df.empty or self._sampling_rate is None:
         return df
@@ -20,7 +25,9 @@ def expand_to_sampling_rate(self, df):
     if end_us < start_us:
         return df
 
-    expanded_records = []
+    grid_times = numpy.arange(start_us, end_us + 1, step_us, dtype=numpy.int64)
+
+    expanded_frames = []
     provider_values = df['provider'].drop_duplicates().tolist()
 
     for provider_name in provider_values:
@@ -29,59 +36,35 @@ def expand_to_sampling_rate(self, df):
         else:
             provider_df = df[df['provider'] == provider_name]
 
-        provider_df = provider_df.sort_values(by='time', ascending=True)
-        source_times = provider_df['time'].tolist()
-        source_values = provider_df['value'].tolist()
+        provider_df = provider_df.sort_values(by='time', ascending=True, kind='stable')
+        source_times = provider_df['time'].to_numpy(dtype=numpy.int64)
+        source_values = provider_df['value'].to_numpy()
 
-        if not source_times:
+        if len(source_times) == 0:
             continue
 
-        current_index = 0
-        while current_index + 1 < len(source_times) and source_times[current_index + 1] <= start_us:
-            current_index += 1
-
-        change_times = []
-        last_change_time = None
-        for source_time in source_times:
-            if source_time < start_us or source_time > end_us:
-                continue
-            if source_time == last_change_time:
-                continue
-            change_times.append(source_time)
-            last_change_time = source_time
-
-        sample_time = start_us
-        change_idx = 0
-
-        while sample_time <= end_us or change_idx < len(change_times):
-            next_grid_time = sample_time if sample_time <= end_us else None
-            next_change_time = change_times[change_idx] if change_idx < len(change_times) else None
-
-            if next_grid_time is None or (next_change_time is not None and next_change_time < next_grid_time):
-                emit_time = next_change_time
-                change_idx += 1
-            elif next_change_time is not None and next_change_time == next_grid_time:
-                emit_time = next_grid_time
-                change_idx += 1
-                sample_time += step_us
-            else:
-                emit_time = next_grid_time
-                sample_time += step_us
-
-            while current_index + 1 < len(source_times) and source_times[current_index + 1] <= emit_time:
-                current_index += 1
-
-            expanded_records.append({
-                'time': emit_time,
-                'value': int(source_values[current_index]),
-                'provider': provider_name,
-            })
-
-    if not expanded_records:
+        # change times that are not on the grid anyway are inserted at their sorted position. Cheaper than
+        # numpy.union1d, which sorts or hashes the whole grid again
+        change_times = source_times[(source_times >= start_us) & (source_times <= end_us)]
+        change_times = numpy.unique(change_times[(change_times - start_us) % step_us != 0])
+        emit_times = numpy.insert(grid_times, numpy.searchsorted(grid_times, change_times), change_times)
+
+        source_index = numpy.maximum(numpy.searchsorted(source_times, emit_times, side='right') - 1, 0)
+
+        expanded_frames.append(pandas.DataFrame({
+            'time': emit_times,
+            'value': source_values[source_index].astype(numpy.int64),
+            'provider': numpy.full(len(emit_times), provider_name, dtype=object),
+        }))
+
+    if not expanded_frames:
         return df.iloc[0:0].copy()
 
+    if len(expanded_frames) == 1:
+        return expanded_frames[0]
+
     return (
-        pandas.DataFrame.from_records(expanded_records)
+        pandas.concat(expanded_frames, ignore_index=True)
         .sort_values(by=['time', 'provider'], kind='stable')
         .reset_index(drop=True)
     )
@@ -1,5 +1,5 @@
 from lib import utils
-from metric_providers.base import BaseMetricProvider
+from metric_providers.base import BaseMetricProvider, map_to_categorical
 
 class CgroupMetricProvider(BaseMetricProvider):
     def __init__(self, *,
@@ -28,9 +28,7 @@ class CgroupMetricProvider(BaseMetricProvider):
         return f"{call_string} -s {','.join(self._cgroup_string_tokens.keys())}"
 
     def _parse_metrics(self, df):
-        df['detail_name'] = df.cgroup_str
-        for token in self._cgroup_string_tokens:
-            df.loc[df.detail_name == token, 'detail_name'] = self._cgroup_string_tokens[token]['name']
+        df['detail_name'] = map_to_categorical(df.cgroup_str, {token: cgroup['name'] for token, cgroup in self._cgroup_string_tokens.items()})
         df = df.drop('cgroup_str', axis=1)
 
         return df
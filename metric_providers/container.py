@@ -1,4 +1,4 @@
-from metric_providers.base import BaseMetricProvider
+from metric_providers.base import BaseMetricProvider, map_to_categorical
 
 class ContainerMetricProvider(BaseMetricProvider):
     def __init__(self, *,
@@ -30,9 +30,7 @@ class ContainerMetricProvider(BaseMetricProvider):
         self._cgroup_string_tokens.update(containers)
 
     def _parse_metrics(self, df):
-        df['detail_name'] = df.container_id
-        for token in self._cgroup_string_tokens:
-            df.loc[df.detail_name == token, 'detail_name'] = self._cgroup_string_tokens[token]['name']
+        df['detail_name'] = map_to_categorical(df.container_id, {token: container['name'] for token, container in self._cgroup_string_tokens.items()})
         df = df.drop('container_id', axis=1)
 
         return df
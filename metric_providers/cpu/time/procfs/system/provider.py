@@ -3,7 +3,7 @@ import os
 from metric_providers.base import BaseMetricProvider
 
 class CpuTimeProcfsSystemProvider(BaseMetricProvider):
-    def __init__(self, sampling_rate, folder, skip_check=False):
+    def __init__(self, sampling_rate, folder, skip_check=False, binary_output=False):
         super().__init__(
             metric_name='cpu_time_procfs_system',
             metrics={'time': int, 'value': int},
@@ -12,4 +12,5 @@ class CpuTimeProcfsSystemProvider(BaseMetricProvider):
             current_dir=os.path.dirname(os.path.abspath(__file__)),
             skip_check = skip_check,
             folder=folder,
+            binary_output=binary_output,
         )
@@ -17,6 +17,7 @@
 static long int user_hz;
 static unsigned int msleep_time=1000;
 static struct timespec offset;
+static bool binary_output = false;
 
 static long int read_cpu_proc() {
     long int user_time, nice_time, system_time, idle_time, iowait_time, irq_time, softirq_time, steal_time;
@@ -42,7 +43,12 @@ static void output_stats() {
     struct timeval now;
     get_adjusted_time(&now, &offset);
 
-    printf("%ld%06ld %ld\n", now.tv_sec, now.tv_usec, read_cpu_proc());
+    if (binary_output) {
+        int64_t record[2] = {timeval_to_us(&now), (int64_t)read_cpu_proc()};
+        write_binary_record(record, 2);
+    } else {
+        printf("%ld%06ld %ld\n", now.tv_sec, now.tv_usec, read_cpu_proc());
+    }
     usleep(msleep_time*1000);
 }
 
@@ -55,13 +61,14 @@ int main(int argc, char **argv) {
 
     user_hz = sysconf(_SC_CLK_TCK);
 
-    while ((c = getopt (argc, argv, "i:hc")) != -1) {
+    while ((c = getopt (argc, argv, "i:hcb")) != -1) {
         switch (c) {
         case 'h':
             printf("Usage: %s [-i msleep_time] [-h]\n\n",argv[0]);
             printf("\t-h      : displays this help\n");
             printf("\t-i      : specifies the milliseconds sleep time that will be slept between measurements\n");
             printf("\t-c      : check system and exit\n");
+            printf("\t-b      : writes binary records of little-endian int64 (time, value) instead of text lines\n");
             printf("\n");
 
             struct timespec res;
@@ -80,6 +87,9 @@ int main(int argc, char **argv) {
         case 'c':
             check_system_flag = true;
             break;
+        case 'b':
+            binary_output = true;
+            break;
         default:
             fprintf(stderr,"Unknown option %c\n",c);
             exit(-1);
@@ -90,9 +100,13 @@ int main(int argc, char **argv) {
         exit(check_path("/proc/stat"));
     }
 
+    if (binary_output) {
+        enable_binary_output();
+    }
+
     get_time_offset(&offset);
 
-    while(1) {
+    while(!binary_output_stopped()) {
         output_stats();
     }
 
@@ -34,6 +34,7 @@ typedef struct procfs_time_t { // struct is a specification and this static make
 // not pollute another threads state
 static unsigned int msleep_time=1000;
 static struct timespec offset;
+static bool binary_output = false;
 static unsigned int min_msleep_time_ms = 0;
 
 static void read_cpu_proc(procfs_time_t* procfs_time_struct) {
@@ -93,7 +94,12 @@ static void output_stats() {
     }
 
     // main output to Stdout
-    printf("%ld%06ld %ld\n", now.tv_sec, now.tv_usec, reading);
+    if (binary_output) {
+        int64_t record[2] = {timeval_to_us(&now), (int64_t)reading};
+        write_binary_record(record, 2);
+    } else {
+        printf("%ld%06ld %ld\n", now.tv_sec, now.tv_usec, reading);
+    }
 }
 
 int main(int argc, char **argv) {
@@ -105,7 +111,7 @@ int main(int argc, char **argv) {
 
     min_msleep_time_ms = get_min_sleep_time_ms(); // must run before we validate -i
 
-    while ((c = getopt (argc, argv, "i:hc")) != -1) {
+    while ((c = getopt (argc, argv, "i:hcb")) != -1) {
         switch (c) {
         case 'h':
             printf("Usage: %s [-i msleep_time] [-h]\n\n",argv[0]);
@@ -113,6 +119,7 @@ int main(int argc, char **argv) {
             printf("\t-i      : specifies the milliseconds sleep time that will be slept between measurements\n");
             printf("\t          (must be >= kernel tick period, currently %u ms)\n", min_msleep_time_ms);
             printf("\t-c      : check system and exit\n");
+            printf("\t-b      : writes binary records of little-endian int64 (time, value) instead of text lines\n");
             printf("\n");
 
             struct timespec res;
@@ -131,6 +138,9 @@ int main(int argc, char **argv) {
         case 'c':
             check_system_flag = true;
             break;
+        case 'b':
+            binary_output = true;
+            break;
         default:
             fprintf(stderr,"Unknown option %c\n",c);
             exit(-1);
@@ -143,9 +153,13 @@ int main(int argc, char **argv) {
 
     validate_min_sleep_time(msleep_time, min_msleep_time_ms);
 
+    if (binary_output) {
+        enable_binary_output();
+    }
+
     get_time_offset(&offset);
 
-    while(1) {
+    while(!binary_output_stopped()) {
         output_stats();
     }
 
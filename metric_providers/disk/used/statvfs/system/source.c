@@ -15,6 +15,7 @@
 // in any case, none of these variables should change between threads
 static unsigned int msleep_time=1000;
 static struct timespec offset;
+static bool binary_output = false;
 
 static unsigned long long get_disk_usage() {
     struct statvfs buf;
@@ -36,7 +37,12 @@ static void output_stats() {
     struct timeval now;
     get_adjusted_time(&now, &offset);
 
-    printf("%ld%06ld %llu\n", now.tv_sec, now.tv_usec, get_disk_usage());
+    if (binary_output) {
+        int64_t record[2] = {timeval_to_us(&now), (int64_t)get_disk_usage()};
+        write_binary_record(record, 2);
+    } else {
+        printf("%ld%06ld %llu\n", now.tv_sec, now.tv_usec, get_disk_usage());
+    }
     usleep(msleep_time*1000);
 
 }
@@ -64,16 +70,18 @@ int main(int argc, char **argv) {
         {"help", no_argument, NULL, 'h'},
         {"interval", no_argument, NULL, 'i'},
         {"check", no_argument, NULL, 'c'},
+        {"binary", no_argument, NULL, 'b'},
         {NULL, 0, NULL, 0}
     };
 
-    while ((c = getopt_long(argc, argv, "i:hc", long_options, NULL)) != -1) {
+    while ((c = getopt_long(argc, argv, "i:hcb", long_options, NULL)) != -1) {
         switch (c) {
         case 'h':
             printf("Usage: %s [-i msleep_time] [-h]\n\n",argv[0]);
             printf("\t-h      : displays this help\n");
             printf("\t-i      : specifies the milliseconds sleep time that will be slept between measurements\n");
             printf("\t-c      : check system and exit\n");
+            printf("\t-b      : writes binary records of little-endian int64 (time, value) instead of text lines\n");
             printf("\n");
             exit(0);
         case 'i':
@@ -82,6 +90,9 @@ int main(int argc, char **argv) {
         case 'c':
             check_system_flag = true;
             break;
+        case 'b':
+            binary_output = true;
+            break;
         default:
             fprintf(stderr,"Unknown option %c\n",c);
             exit(-1);
@@ -92,9 +103,13 @@ int main(int argc, char **argv) {
         exit(check_system());
     }
 
+    if (binary_output) {
+        enable_binary_output();
+    }
+
     get_time_offset(&offset);
 
-    while(1) {
+    while(!binary_output_stopped()) {
         output_stats();
     }
 
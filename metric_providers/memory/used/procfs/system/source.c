@@ -16,6 +16,7 @@
 // in any case, none of these variables should change between threads
 static unsigned int msleep_time=1000;
 static struct timespec offset;
+static bool binary_output = false;
 
 // just a helper function
 void print_repr(const char *str) {
@@ -113,7 +114,12 @@ static void output_stats() {
     struct timeval now;
     get_adjusted_time(&now, &offset);
 
-    printf("%ld%06ld %lld\n", now.tv_sec, now.tv_usec, get_memory_procfs());
+    if (binary_output) {
+        int64_t record[2] = {timeval_to_us(&now), (int64_t)get_memory_procfs()};
+        write_binary_record(record, 2);
+    } else {
+        printf("%ld%06ld %lld\n", now.tv_sec, now.tv_usec, get_memory_procfs());
+    }
     usleep(msleep_time*1000);
 
 }
@@ -131,16 +137,18 @@ int main(int argc, char **argv) {
         {"help", no_argument, NULL, 'h'},
         {"interval", no_argument, NULL, 'i'},
         {"check", no_argument, NULL, 'c'},
+        {"binary", no_argument, NULL, 'b'},
         {NULL, 0, NULL, 0}
     };
 
-    while ((c = getopt_long(argc, argv, "i:hc", long_options, NULL)) != -1) {
+    while ((c = getopt_long(argc, argv, "i:hcb", long_options, NULL)) != -1) {
         switch (c) {
         case 'h':
             printf("Usage: %s [-i msleep_time] [-h]\n\n",argv[0]);
             printf("\t-h      : displays this help\n");
             printf("\t-i      : specifies the milliseconds sleep time that will be slept between measurements\n");
             printf("\t-c      : check system and exit\n");
+            printf("\t-b      : writes binary records of little-endian int64 (time, value) instead of text lines\n");
             printf("\n");
             exit(0);
         case 'i':
@@ -149,6 +157,9 @@ int main(int argc, char **argv) {
         case 'c':
             check_system_flag = true;
             break;
+        case 'b':
+            binary_output = true;
+            break;
         default:
             fprintf(stderr,"Unknown option %c\n",c);
             exit(-1);
@@ -159,9 +170,13 @@ int main(int argc, char **argv) {
         exit(check_path("/proc/meminfo"));
     }
 
+    if (binary_output) {
+        enable_binary_output();
+    }
+
     get_time_offset(&offset);
 
-    while(1) {
+    while(!binary_output_stopped()) {
         output_stats();
     }
 
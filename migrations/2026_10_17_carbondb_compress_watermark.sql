@@ -0,0 +1,7 @@
+-- Incremental compress of carbondb_data_raw. See cron/carbondb_compress.py
+CREATE TABLE IF NOT EXISTS carbondb_compress_watermark (
+    id integer PRIMARY KEY CHECK (id = 1),
+    processed_until timestamp with time zone NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS carbondb_data_raw_changed_at ON carbondb_data_raw ((COALESCE(updated_at, created_at)));
@@ -0,0 +1,18 @@
+-- Grid carbon intensity series fetched by the carbon intensity metric providers. See lib/carbon_intensity_cache.py
+CREATE TABLE IF NOT EXISTS grid_carbon_intensity_cache (
+    series text NOT NULL,
+    time bigint NOT NULL,
+    value DOUBLE PRECISION NOT NULL,
+    created_at timestamp with time zone NOT NULL DEFAULT now(),
+    PRIMARY KEY (series, time)
+);
+
+CREATE TABLE IF NOT EXISTS grid_carbon_intensity_cache_coverage (
+    id integer GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    series text NOT NULL,
+    start_time bigint NOT NULL,
+    end_time bigint NOT NULL,
+    expires_at timestamp with time zone, -- NULL for time ranges the provider will not change anymore
+    created_at timestamp with time zone NOT NULL DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS grid_carbon_intensity_cache_coverage_series ON grid_carbon_intensity_cache_coverage(series, start_time);
@@ -0,0 +1,28 @@
+-- measurement_values becomes range partitioned by measurement_metric_id. See lib/measurement_partitions.py
+-- The existing table is not copied but attached as the first partition. Attaching scans it once to verify
+-- the range, but it does not rewrite any data.
+
+ALTER TABLE measurement_values RENAME TO measurement_values_p0;
+-- index names are schema wide and the new parent needs this name
+ALTER INDEX IF EXISTS measurement_values_pkey RENAME TO measurement_values_p0_pkey;
+
+CREATE TABLE measurement_values (
+    measurement_metric_id int NOT NULL REFERENCES measurement_metrics(id) ON DELETE CASCADE ON UPDATE CASCADE,
+    value bigint NOT NULL,
+    time bigint NOT NULL
+) PARTITION BY RANGE (measurement_metric_id);
+
+ALTER TABLE measurement_values ADD CONSTRAINT measurement_values_pkey PRIMARY KEY (measurement_metric_id, time);
+
+DO $$
+DECLARE
+    upper_bound int;
+BEGIN
+    SELECT COALESCE(MAX(id), 0) + 1 INTO upper_bound FROM measurement_metrics;
+
+    EXECUTE format('ALTER TABLE measurement_values ATTACH PARTITION measurement_values_p0 FOR VALUES FROM (MINVALUE) TO (%s)', upper_bound);
+    EXECUTE format('CREATE TABLE measurement_values_p%s PARTITION OF measurement_values FOR VALUES FROM (%s) TO (%s)', upper_bound, upper_bound, upper_bound + 100000);
+END $$;
+
+-- catches all values for which cron/measurement_partitions.py has not created a partition yet
+CREATE TABLE measurement_values_default PARTITION OF measurement_values DEFAULT;
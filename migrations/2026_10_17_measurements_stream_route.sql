@@ -0,0 +1,8 @@
+UPDATE users
+SET capabilities = jsonb_set(
+    capabilities,
+    '{api,routes}',
+    (capabilities->'api'->'routes') || '"/v1/measurements/single/{run_id}/stream"'::jsonb
+)
+WHERE id = 1
+    AND NOT (capabilities->'api'->'routes' ? '/v1/measurements/single/{run_id}/stream');
@@ -187,3 +187,12 @@ def test_jobs_with_dummy_job():
 def test_jobs_clean():
     response = requests.get(f"{API_URL}/v2/jobs", timeout=15, headers={'X-Authentication': 'DEFAULT'})
     assert response.status_code == 204
+
+def test_db_pool_stats():
+    response = requests.get(f"{API_URL}/v1/db-pool-stats", timeout=15)
+    assert response.status_code == 200, Tests.assertion_info('success', response.text)
+
+    data = response.json()['data']
+    assert data['async']['profile'] == 'api'
+    assert data['sync']['profile'] == 'api'
+    assert data['sync']['pool_max'] >= data['sync']['pool_min']
@@ -2,6 +2,7 @@ import math
 from pydantic import BaseModel
 
 from api import api_helpers
+from api.object_specifications import ArtifactType
 
 class Run(BaseModel):
     name: str
@@ -61,3 +62,13 @@ def test_convert_value():
     assert api_helpers.convert_value(100, 'xJ') == [100, 'xJ']
 
     assert api_helpers.convert_value(100, 'uj') == [100, 'uj']
+
+def test_artifacts_round_trip():
+    api_helpers.artifact_cache_stats.clear()
+
+    api_helpers.store_artifacts(ArtifactType.BADGE, {'test_artifacts_a': 'badge_a', 'test_artifacts_b': 'badge_b'})
+
+    assert api_helpers.get_artifacts(ArtifactType.BADGE, ['test_artifacts_a', 'test_artifacts_missing', 'test_artifacts_b']) == ['badge_a', None, 'badge_b']
+    assert api_helpers.get_artifact(ArtifactType.BADGE, 'test_artifacts_a') == 'badge_a'
+    assert api_helpers.get_artifact(ArtifactType.COMPARE, 'test_artifacts_a') is None, 'Artifact types must not share a DB'
+    assert api_helpers.artifact_cache_stats == {'BADGE': {'l1_hits': 0, 'hits': 3, 'misses': 1}, 'COMPARE': {'l1_hits': 0, 'hits': 0, 'misses': 1}}
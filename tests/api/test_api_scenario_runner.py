@@ -1,4 +1,5 @@
 import os
+import asyncio
 import requests
 import json
 
@@ -7,7 +8,8 @@ import pytest
 
 CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
 
-from lib.db import DB
+from lib.db import DB, AsyncDB
+from api import scenario_runner as api_scenario_runner
 from lib import utils
 from lib.job.run import RunJob
 from lib import metric_importer
@@ -299,3 +301,87 @@ def test_phase_stats_single_returns_component_carbon():
     cpu_energy = Tests.filter_df_runtime_subphase(df, hidden=False)['value'].sum()
     operational_carbon_expected = int(cpu_energy * MICROJOULES_TO_KWH * carbon_intensity_value * 1_000_000)
     assert detail['mean'] == pytest.approx(operational_carbon_expected, abs=10)
+
+
+def _series_of_measurements(data):
+    series = {}
+    for detail_name, time, metric, value, unit in data:
+        series.setdefault((metric, detail_name, unit), []).append((time, value))
+    return series
+
+def test_get_measurements_single_downsampled():
+    run_id = Tests.insert_run(Tests.TEST_MEASUREMENT_PHASES)
+    Tests.import_cpu_energy(run_id)
+    Tests.import_cpu_utilization_container(run_id)
+
+    response = requests.get(f"{API_URL}/v1/measurements/single/{run_id}", timeout=15)
+    assert response.status_code == 200, Tests.assertion_info('success', response.text)
+    full = _series_of_measurements(response.json()['data'])
+
+    response = requests.get(f"{API_URL}/v1/measurements/single/{run_id}?max_points=5", timeout=15)
+    assert response.status_code == 200, Tests.assertion_info('success', response.text)
+    downsampled = _series_of_measurements(response.json()['data'])
+
+    assert list(downsampled.keys()) == list(full.keys()), 'Series and their order must not change'
+    for (metric, detail_name, unit), samples in downsampled.items():
+        full_samples = full[(metric, detail_name, unit)]
+        assert len(samples) <= 5
+        assert [time for time, _ in samples] == sorted(time for time, _ in samples)
+        if metric == 'cpu_energy_rapl_msr_component': # energy is summed per bucket, so no energy gets lost
+            assert sum(value for _, value in samples) == sum(value for _, value in full_samples)
+            assert samples[-1][0] == full_samples[-1][0]
+        else: # utilization is a gauge and lttb only picks existing samples
+            assert set(samples) <= set(full_samples)
+
+def test_get_measurements_single_downsampling_validation():
+    run_id = Tests.insert_run(Tests.TEST_MEASUREMENT_PHASES)
+
+    for query_string in ('max_points=2', 'bucket_us=0', 'max_points=100&downsampling=median'):
+        response = requests.get(f"{API_URL}/v1/measurements/single/{run_id}?{query_string}", timeout=15)
+        assert response.status_code == 422, Tests.assertion_info('422', response.text)
+
+def test_get_measurements_single_stream():
+    run_id = Tests.insert_run(Tests.TEST_MEASUREMENT_PHASES)
+    Tests.import_cpu_energy(run_id)
+    Tests.import_cpu_utilization_container(run_id)
+
+    response = requests.get(f"{API_URL}/v1/measurements/single/{run_id}", timeout=15)
+    assert response.status_code == 200, Tests.assertion_info('success', response.text)
+    full = response.json()['data']
+
+    response = requests.get(f"{API_URL}/v1/measurements/single/{run_id}/stream", timeout=15)
+    assert response.status_code == 200, Tests.assertion_info('success', response.text)
+    assert response.headers['content-type'] == 'application/x-ndjson'
+    streamed = [
+        [line['detail_name'], time, line['metric'], value, line['unit']]
+        for line in map(json.loads, response.text.splitlines())
+        for time, value in line['data']
+    ]
+    assert streamed == full
+
+    response = requests.get(f"{API_URL}/v1/measurements/single/{run_id}/stream?metric=cpu_energy_rapl_msr_component", timeout=15)
+    assert response.status_code == 200, Tests.assertion_info('success', response.text)
+    assert {json.loads(line)['metric'] for line in response.text.splitlines()} == {'cpu_energy_rapl_msr_component'}
+
+    response = requests.get(f"{API_URL}/v1/measurements/single/{run_id}/stream?metric=cpu_energy_rapl_msr_component&detail_name=does-not-exist", timeout=15)
+    assert response.status_code == 204
+
+def test_stream_measurements_single_pages_through_series(monkeypatch):
+    run_id = Tests.insert_run(Tests.TEST_MEASUREMENT_PHASES)
+    Tests.import_cpu_energy(run_id)
+    monkeypatch.setattr(api_scenario_runner, 'MEASUREMENTS_STREAM_BATCH_SIZE', 7)
+
+    metrics = DB().fetch_all('SELECT id, detail_name, metric, unit FROM measurement_metrics WHERE run_id = %s ORDER BY id', params=(run_id, ))
+
+    async def stream():
+        try:
+            return [json.loads(line) async for line in api_scenario_runner._stream_measurements_single(run_id, metrics, False)]
+        finally:
+            await AsyncDB().shutdown() # the pool is bound to this event loop
+    lines = asyncio.run(stream())
+
+    assert all(len(line['data']) <= 7 for line in lines)
+    for measurement_metric_id, detail_name, metric, _ in metrics:
+        expected = DB().fetch_all('SELECT time, value FROM measurement_values WHERE measurement_metric_id = %s ORDER BY time', params=(measurement_metric_id, ))
+        streamed = [tuple(row) for line in lines if (line['metric'], line['detail_name']) == (metric, detail_name) for row in line['data']]
+        assert streamed == expected
@@ -0,0 +1,116 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+
+import pytest
+import yaml
+
+from lib.db import DB
+from lib.global_config import GlobalConfig
+from lib import backfill
+from cron import backfill_geo
+from cron import backfill_carbon_intensity
+
+BASE_CONFIG_PATH = Path(__file__).parent.parent / 'test-config.yml'
+
+# Stands in for the geo IP and carbon intensity APIs. Paths are /<provider>/<ip> or /electricitymaps?lat=..&lon=..
+STUB_RESPONSES = {
+    ('ip-api.com', '8.8.8.8'): (200, {'status': 'fail'}),
+    ('ipapi.co', '8.8.8.8'): (200, {'latitude': 37.4, 'longitude': -122.1, 'city': 'Mountain View', 'postal': '94043', 'org': 'Google', 'country_code': 'US'}),
+    ('ip-api.com', '1.1.1.1'): (200, {'lat': -33.5, 'lon': 151.0, 'city': 'Sydney', 'zip': '2000', 'org': 'Cloudflare', 'countryCode': 'AU'}),
+    ('electricitymaps', '52.5,13.4'): (200, {'carbonIntensity': 345, 'zone': 'DE'}),
+    ('electricitymaps', '48.8,2.3'): (500, {'error': 'Internal Server Error'}),
+}
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self): # pylint: disable=invalid-name
+        url = urlparse(self.path)
+        provider, _, key = url.path.strip('/').partition('/')
+        if not key:
+            query = parse_qs(url.query)
+            key = f"{query['lat'][0]},{query['lon'][0]}"
+        self.server.requests.append((provider, key))
+
+        status, body = STUB_RESPONSES.get((provider, key), (404, {'error': 'not found'}))
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps(body).encode())
+
+    def log_message(self, format, *args): # pylint: disable=redefined-builtin
+        pass
+
+@pytest.fixture(name='stub_server')
+def stub_server_fixture(monkeypatch, tmp_path):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    monkeypatch.setattr(backfill_geo, 'GEO_PROVIDERS', [
+        (provider, f"{base_url}/{provider}/{{ip}}", parse) for provider, _, parse in backfill_geo.GEO_PROVIDERS
+    ])
+    monkeypatch.setattr(backfill_carbon_intensity, 'ELECTRICITY_MAPS_LATEST_URL', f"{base_url}/electricitymaps")
+
+    with open(BASE_CONFIG_PATH, encoding='utf-8') as fh:
+        config = yaml.safe_load(fh)
+    config['backfill'] = {'concurrency': 4, 'rate_limits': {'ip-api.com': None, 'ipapi.co': None, 'ipinfo.io': None, 'electricitymaps': None}} # no need to wait in tests
+    config['electricity_maps_token'] = 'stub-token' # 'testing' would not send any request
+    tmp_config = tmp_path / 'test-config.yml'
+    with open(tmp_config, 'w', encoding='utf-8') as fh:
+        yaml.safe_dump(config, fh)
+    GlobalConfig().override_config(config_location=tmp_config.as_posix())
+
+    yield server
+
+    GlobalConfig().override_config(config_location=BASE_CONFIG_PATH.as_posix())
+    server.shutdown()
+    server.server_close()
+
+def test_resolve_geo_falls_back_to_next_provider(stub_server):
+    resolved, errors = asyncio.run(backfill_geo.resolve_geo({'8.8.8.8', '1.1.1.1', '9.9.9.9'}))
+
+    assert resolved == {
+        '8.8.8.8': (37.4, -122.1, ('Mountain View', '94043', 'Google', 'US')),
+        '1.1.1.1': (-33.5, 151.0, ('Sydney', '2000', 'Cloudflare', 'AU')),
+    }
+    assert list(errors) == ['9.9.9.9'], 'An IP no provider knows must not stop the others'
+    assert sorted(stub_server.requests) == sorted([
+        ('ip-api.com', '8.8.8.8'), ('ipapi.co', '8.8.8.8'),
+        ('ip-api.com', '1.1.1.1'),
+        ('ip-api.com', '9.9.9.9'), ('ipapi.co', '9.9.9.9'), ('ipinfo.io', '9.9.9.9'),
+    ])
+
+def test_resolve_carbon_intensities(stub_server):
+    resolved, errors = asyncio.run(backfill_carbon_intensity.resolve_carbon_intensities({(52.5, 13.4), (48.8, 2.3)}))
+
+    assert resolved == {(52.5, 13.4): (345, {'carbonIntensity': 345, 'zone': 'DE'})}
+    assert list(errors) == [(48.8, 2.3)]
+    assert '500' in str(errors[(48.8, 2.3)])
+    assert len(stub_server.requests) == 2
+
+def test_rate_limiter_spaces_requests():
+    async def run():
+        rate_limiter = backfill.RateLimiter(requests_per_second=20)
+        await asyncio.gather(*(rate_limiter.wait() for _ in range(5)))
+
+    start = time.monotonic()
+    asyncio.run(run())
+    assert time.monotonic() - start >= 4 / 20
+
+def test_update_rows_by_id():
+    DB().query('''
+        INSERT INTO ip_data (id, ip_address, latitude, longitude, city, zip, org, country_code)
+        VALUES (1, '8.8.8.8', 0, 0, '', '', '', ''), (2, '1.1.1.1', 0, 0, '', '', '', ''), (3, '9.9.9.9', 0, 0, '', '', '', '')
+    ''')
+
+    updated_ids = backfill.update_rows_by_id('ip_data', [('latitude', 'double precision'), ('longitude', 'double precision')], [(1, 37.4, -122.1), (2, -33.5, 151.0)])
+
+    assert sorted(updated_ids) == [1, 2]
+    assert DB().fetch_all('SELECT id, latitude, longitude FROM ip_data ORDER BY id') == [(1, 37.4, -122.1), (2, -33.5, 151.0), (3, 0, 0)]
+    assert not backfill.update_rows_by_id('ip_data', [('latitude', 'double precision')], [])
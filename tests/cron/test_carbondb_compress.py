@@ -11,7 +11,7 @@ from tests import test_functions as Tests
 
 from cron import backfill_carbon_intensity
 from cron import backfill_geo
-from cron.carbondb_compress import compress_carbondb_raw
+from cron.carbondb_compress import compress_carbondb_raw, compress_carbondb_raw_incremental
 from cron.carbondb_copy_over_and_remove_duplicates import copy_over_scenario_runner, copy_over_eco_ci, remove_duplicates
 
 
@@ -357,3 +357,88 @@ def test_carbondb_filter_mapped_to_same_id():
     response = requests.get(f"{API_URL}/v2/carbondb/filters", timeout=15, headers={'X-Authentication': 'ALTERNATIVE-USER-CARBONDB'}) # ID 345
     assert response.status_code == 200, Tests.assertion_info('success', response.text)
     assert response.text == '{"success":true,"data":{"types":{"1":"machine.ci"},"tags":{"1":"cool","2":"mystery"},"machines":{"1":"my-machine"},"projects":{"1":"my-project"},"sources":{"1":"CUSTOM"},"users":{"345":"ALTERNATIVE-USER-CARBONDB"}}}'
+
+
+def insert_raw_rows(rows, created_at_interval='0 days'):
+    for row_type, machine, tags, days_ago, energy_kwh, carbon_kg, user_id in rows:
+        DB().query('''
+            INSERT INTO carbondb_data_raw (type, project, machine, source, tags, time, energy_kwh, carbon_kg, carbon_intensity_g, user_id, created_at)
+            VALUES (%s, 'my-project', %s, 'CUSTOM', %s, EXTRACT(EPOCH FROM CURRENT_DATE - make_interval(days => %s) + INTERVAL '12 hours')*1e6, %s, %s, 200, %s, NOW() - %s::interval)
+        ''', params=(row_type, machine, tags, days_ago, energy_kwh, carbon_kg, user_id, created_at_interval))
+
+def get_carbondb_data():
+    return DB().fetch_all('''
+        SELECT type_str, source_str, machine_str, project_str, tags, date, energy_kwh_sum, carbon_kg_sum, carbon_intensity_g_avg, record_count, user_id
+        FROM carbondb_data_view
+        ORDER BY user_id, date, type_str, machine_str, tags
+    ''')
+
+def test_incremental_compress_matches_full_compress():
+    Tests.insert_user(345, 'ALTERNATIVE-USER')
+
+    insert_raw_rows([
+        ('machine.ci', 'my-machine', ['cool'], 0, 10, 2, 1),
+        ('machine.ci', 'my-machine', ['cool'], 0, 20, 4, 1),
+        ('machine.ci', 'my-machine', ['cool', 'mystery'], 1, 5, 1, 1),
+        ('machine.ci', 'my-machine', ['cool'], 2, 7, None, 1), # carbon_kg not backfilled yet
+        ('machine.ci', 'other-machine', ['cool'], 0, 3, 0.5, 345),
+        ('machine.server', 'other-machine', [], 5, 100, 30, 345),
+    ], created_at_interval='1 day')
+
+    compress_carbondb_raw_incremental() # no watermark yet, so everything is compressed
+    assert DB().fetch_one('SELECT COUNT(*) FROM carbondb_data')[0] == 4, 'Rows without carbon_kg must not be compressed'
+
+    # new row in an existing group, in a new group and with a new dimension
+    insert_raw_rows([
+        ('machine.ci', 'my-machine', ['cool'], 0, 30, 6, 1),
+        ('machine.ci', 'other-machine', ['new-tag'], 1, 4, 1, 345),
+        ('machine.laptop', 'my-machine', ['cool'], 3, 2, 0.2, 1),
+    ])
+    # backfilled carbon_kg
+    DB().query("UPDATE carbondb_data_raw SET carbon_kg = 1.4 WHERE carbon_kg IS NULL")
+    # copied over again and removed as duplicate
+    insert_raw_rows([('machine.server', 'other-machine', [], 5, 100, 30, 345)])
+    remove_duplicates()
+
+    compress_carbondb_raw_incremental()
+    incremental = get_carbondb_data()
+
+    DB().query('TRUNCATE carbondb_data')
+    compress_carbondb_raw()
+
+    assert incremental == get_carbondb_data()
+    assert len(incremental) == 7
+
+def test_incremental_compress_after_duplicates_were_removed():
+    # a duplicate that arrived long before the compress and is only removed after it
+    duplicate = ('machine.ci', 'my-machine', ['cool'], 0, 10, 2, 1)
+    insert_raw_rows([duplicate, duplicate, ('machine.ci', 'my-machine', ['cool'], 1, 10, 2, 1)], created_at_interval='1 day')
+    DB().query("INSERT INTO carbondb_compress_watermark (id, processed_until) VALUES (1, NOW() - INTERVAL '1 day 2 hours')")
+
+    compress_carbondb_raw_incremental()
+    assert DB().fetch_one('SELECT record_count FROM carbondb_data WHERE date = CURRENT_DATE')[0] == 2
+
+    remove_duplicates()
+    compress_carbondb_raw_incremental()
+    incremental = get_carbondb_data()
+
+    DB().query('TRUNCATE carbondb_data')
+    compress_carbondb_raw()
+
+    assert incremental == get_carbondb_data()
+    assert DB().fetch_one('SELECT record_count FROM carbondb_data WHERE date = CURRENT_DATE')[0] == 1
+
+def test_incremental_compress_only_touches_changed_groups():
+    insert_raw_rows([
+        ('machine.ci', 'my-machine', ['cool'], 0, 10, 2, 1),
+        ('machine.ci', 'my-machine', ['cool'], 1, 10, 2, 1),
+    ], created_at_interval='1 day')
+    compress_carbondb_raw_incremental()
+
+    # a group that got no new rows must not be recomputed
+    DB().query("UPDATE carbondb_data SET record_count = 0 WHERE date = CURRENT_DATE - INTERVAL '1 day'")
+
+    insert_raw_rows([('machine.ci', 'my-machine', ['cool'], 0, 10, 2, 1)])
+    compress_carbondb_raw_incremental()
+
+    assert DB().fetch_all('SELECT date = CURRENT_DATE, record_count FROM carbondb_data ORDER BY date') == [(False, 0), (True, 2)]
@@ -0,0 +1,53 @@
+import uuid
+
+from lib import artifact_cache
+from lib.artifact_cache import ArtifactType
+
+def render(artifact):
+    return b'<' + artifact + b'>'
+
+def test_rendered_artifact_two_levels():
+    run_id = str(uuid.uuid4())
+    key = f"1_{run_id}"
+    artifact_cache.artifact_cache_stats.clear()
+
+    artifact_cache.store_rendered_artifact(ArtifactType.STATS, key, b'stats', render(b'stats'))
+
+    assert artifact_cache.get_rendered_artifact(ArtifactType.STATS, key, render) == b'<stats>'
+    assert artifact_cache.artifact_cache_stats['STATS'] == {'l1_hits': 1, 'hits': 0, 'misses': 0}
+
+    artifact_cache._l1_cache.clear() # like another worker, that only has Redis
+    assert artifact_cache.get_rendered_artifact(ArtifactType.STATS, key, render) == b'<stats>'
+    assert artifact_cache.get_rendered_artifact(ArtifactType.STATS, key, render) == b'<stats>'
+    assert artifact_cache.artifact_cache_stats['STATS'] == {'l1_hits': 2, 'hits': 1, 'misses': 0}
+
+def test_invalidate_phase_stats_artifacts_of_run():
+    run_id = str(uuid.uuid4())
+    other_run_id = str(uuid.uuid4())
+    artifact_cache.store_rendered_artifact(ArtifactType.STATS, f"1_{run_id}", b'stats', b'stats')
+    artifact_cache.store_rendered_artifact(ArtifactType.COMPARE, f"1_['{other_run_id}', '{run_id}']", b'compare', b'compare')
+    artifact_cache.store_rendered_artifact(ArtifactType.STATS, f"1_{other_run_id}", b'other', b'other')
+    artifact_cache.store_artifact(ArtifactType.DIFF, f"1_['{other_run_id}', '{run_id}']", 'diff')
+
+    artifact_cache.invalidate_phase_stats_artifacts(run_id)
+
+    assert artifact_cache.get_rendered_artifact(ArtifactType.STATS, f"1_{run_id}", render) is None
+    assert artifact_cache.get_rendered_artifact(ArtifactType.COMPARE, f"1_['{other_run_id}', '{run_id}']", render) is None
+    assert artifact_cache.get_rendered_artifact(ArtifactType.STATS, f"1_{other_run_id}", render) == b'other'
+    assert artifact_cache.get_artifact(ArtifactType.DIFF, f"1_['{other_run_id}', '{run_id}']") == 'diff', 'Diffs are not computed from the phase_stats'
+
+def test_invalidate_phase_stats_artifacts_of_all_runs_keeps_timeline_badges():
+    run_id = str(uuid.uuid4())
+    run_badge_key = f"1_{run_id}_psu_energy_ac_mcp_machine_mJ_[RUNTIME]"
+    timeline_badge_key = '1_https://github.com/green-coding-solutions/green-metrics-tool_usage_scenario.yml_1_main_psu_energy_ac_mcp_machine_[MACHINE]_mJ'
+    artifact_cache.store_rendered_artifact(ArtifactType.STATS, f"1_{run_id}", b'stats', b'stats')
+    artifact_cache.store_rendered_artifact(ArtifactType.BADGE, run_badge_key, b'run', b'run')
+    artifact_cache.store_rendered_artifact(ArtifactType.BADGE, timeline_badge_key, b'timeline', b'timeline', ex=60*60*12)
+
+    artifact_cache.invalidate_phase_stats_artifacts()
+
+    assert artifact_cache.get_rendered_artifact(ArtifactType.STATS, f"1_{run_id}", render) is None
+    assert artifact_cache.get_rendered_artifact(ArtifactType.BADGE, run_badge_key, render) is None
+    assert artifact_cache.get_rendered_artifact(ArtifactType.BADGE, timeline_badge_key, render) == b'timeline'
+    artifact_cache._l1_cache.clear()
+    assert artifact_cache.get_rendered_artifact(ArtifactType.BADGE, timeline_badge_key, render) == b'<timeline>'
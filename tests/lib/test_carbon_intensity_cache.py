@@ -0,0 +1,110 @@
+from datetime import datetime, timezone
+from pathlib import Path
+import pytest
+import yaml
+
+from lib.global_config import GlobalConfig
+from lib import carbon_intensity_cache
+
+BASE_CONFIG_PATH = Path(__file__).parent.parent / 'test-config.yml'
+
+SERIES = 'electricity_maps/DE'
+HOUR_US = 3_600_000_000
+# old enough to be settled
+START_US = int(datetime(2026, 1, 1, tzinfo=timezone.utc).timestamp() * 1_000_000)
+
+@pytest.fixture(name='override_cache_config', autouse=True)
+def override_cache_config_fixture(tmp_path):
+    def override_cache_config(cache_config):
+        with open(BASE_CONFIG_PATH, encoding='utf-8') as fh:
+            config = yaml.safe_load(fh)
+        config['carbon_intensity_cache'] = cache_config
+
+        tmp_config = tmp_path / 'test-config.yml'
+        with open(tmp_config, 'w', encoding='utf-8') as fh:
+            yaml.safe_dump(config, fh)
+        GlobalConfig().override_config(config_location=tmp_config.as_posix())
+
+    override_cache_config({'settle_minutes': 120, 'refresh_minutes': 5, 'forecast_ttl_minutes': 60})
+    yield override_cache_config
+    GlobalConfig().override_config(config_location=BASE_CONFIG_PATH.as_posix())
+
+class FakeApi:
+    def __init__(self):
+        self.requested_ranges = []
+        self.reachable = True
+
+    # one value every 15 minutes
+    def fetch(self, start_us, end_us):
+        self.requested_ranges.append((start_us, end_us))
+        if not self.reachable:
+            raise RuntimeError('API not reachable')
+        first = -(-start_us // (HOUR_US // 4)) * (HOUR_US // 4)
+        return [(time, float(time // (HOUR_US // 4) % 500)) for time in range(first, end_us + 1, HOUR_US // 4)]
+
+def test_missing_ranges():
+    assert carbon_intensity_cache.get_missing_ranges(0, 100, []) == [(0, 100)]
+    assert carbon_intensity_cache.get_missing_ranges(0, 100, [(-10, 20), (40, 60), (50, 70)]) == [(20, 40), (70, 100)]
+    assert not carbon_intensity_cache.get_missing_ranges(0, 100, [(-10, 200)])
+    assert carbon_intensity_cache.get_missing_ranges(10, 20, [(0, 5), (30, 40)]) == [(10, 20)]
+
+def test_only_missing_ranges_are_fetched():
+    api = FakeApi()
+
+    first = carbon_intensity_cache.get_series(SERIES, START_US, START_US + 2 * HOUR_US, api.fetch)
+    second = carbon_intensity_cache.get_series(SERIES, START_US + HOUR_US, START_US + 3 * HOUR_US, api.fetch)
+    third = carbon_intensity_cache.get_series(SERIES, START_US, START_US + 3 * HOUR_US, api.fetch)
+
+    assert api.requested_ranges == [(START_US, START_US + 2 * HOUR_US), (START_US + 2 * HOUR_US, START_US + 3 * HOUR_US)]
+    assert first == api.fetch(START_US, START_US + 2 * HOUR_US)
+    assert second == api.fetch(START_US + HOUR_US - HOUR_US // 4, START_US + 3 * HOUR_US), 'The last value before the range must be returned as well'
+    assert third == api.fetch(START_US, START_US + 3 * HOUR_US)
+
+def test_recent_ranges_expire(override_cache_config):
+    api = FakeApi()
+    now_us = int(datetime.now(timezone.utc).timestamp() * 1_000_000)
+
+    carbon_intensity_cache.get_series(SERIES, now_us - 3 * HOUR_US, now_us, api.fetch)
+    carbon_intensity_cache.get_series(SERIES, now_us - 3 * HOUR_US, now_us, api.fetch)
+    assert len(api.requested_ranges) == 1, 'Recent range must be cached for refresh_minutes'
+
+    override_cache_config({'settle_minutes': 120, 'refresh_minutes': 0, 'forecast_ttl_minutes': 60})
+    carbon_intensity_cache.get_series(SERIES, now_us - 3 * HOUR_US, now_us, api.fetch)
+    carbon_intensity_cache.get_series(SERIES, now_us - 3 * HOUR_US, now_us, api.fetch)
+
+    # only the part younger than settle_minutes is fetched again
+    assert len(api.requested_ranges) == 3
+    assert api.requested_ranges[2][0] == api.requested_ranges[1][0]
+    assert api.requested_ranges[1][0] > now_us - 3 * HOUR_US
+
+def test_cached_values_are_used_if_api_is_unreachable():
+    api = FakeApi()
+    carbon_intensity_cache.get_series(SERIES, START_US, START_US + HOUR_US, api.fetch)
+
+    last_cached_value = api.fetch(START_US + HOUR_US, START_US + HOUR_US)
+
+    api.reachable = False
+    values = carbon_intensity_cache.get_series(SERIES, START_US + 2 * HOUR_US, START_US + 3 * HOUR_US, api.fetch)
+    assert values == last_cached_value, 'The last value before the range must be used'
+
+    with pytest.raises(RuntimeError, match='not reachable'):
+        carbon_intensity_cache.get_series('electricity_maps/FR', START_US, START_US + HOUR_US, api.fetch)
+
+def test_snapshot_is_fetched_once_per_ttl():
+    calls = []
+    def fetch():
+        calls.append(1)
+        return [(START_US, 100.0), (START_US + HOUR_US, 200.0)]
+
+    assert carbon_intensity_cache.get_snapshot(f"{SERIES}/forecast", fetch) == [(START_US, 100.0), (START_US + HOUR_US, 200.0)]
+    assert carbon_intensity_cache.get_snapshot(f"{SERIES}/forecast", fetch) == [(START_US, 100.0), (START_US + HOUR_US, 200.0)]
+    assert len(calls) == 1
+
+def test_disabled_cache_always_fetches(override_cache_config):
+    override_cache_config(None)
+    api = FakeApi()
+
+    carbon_intensity_cache.get_series(SERIES, START_US, START_US + HOUR_US, api.fetch)
+    carbon_intensity_cache.get_series(SERIES, START_US, START_US + HOUR_US, api.fetch)
+
+    assert len(api.requested_ranges) == 2
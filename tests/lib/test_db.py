@@ -1,8 +1,10 @@
+import asyncio
 import unittest
-from unittest.mock import Mock, patch
+from unittest.mock import Mock, AsyncMock, patch
 import io
+import numpy
 import psycopg
-from lib.db import with_db_retry, DB
+from lib.db import with_db_retry, with_async_db_retry, DB, AsyncDB, DB_POOL_PROFILES, get_pool_profile, set_pool_profile
 
 
 class TestWithDbRetryDecorator(unittest.TestCase):
@@ -73,6 +75,80 @@ class TestWithDbRetryDecorator(unittest.TestCase):
         self.assertFalse(mock_sleep.called)
 
 
+class TestWithAsyncDbRetryDecorator(unittest.TestCase):
+
+    def setUp(self):
+        class MockAsyncDB:
+            calls = 0
+
+            def __init__(self):
+                self._pool = Mock(close=AsyncMock())
+
+            def _create_pool(self):
+                self._pool = Mock(close=AsyncMock())
+
+            @with_async_db_retry
+            async def flaky_method(self):
+                self.calls += 1
+                if self.calls < 3:
+                    raise psycopg.OperationalError("connection refused")
+                return 'result'
+
+            @with_async_db_retry
+            async def non_retryable_method(self):
+                raise psycopg.DatabaseError("syntax error at or near")
+
+        self.mock_db = MockAsyncDB()
+
+    @patch('asyncio.sleep')
+    def test_retry_until_success(self, mock_sleep):
+        self.assertEqual(asyncio.run(self.mock_db.flaky_method()), 'result')
+
+        self.assertEqual(self.mock_db.calls, 3)
+        self.assertEqual(mock_sleep.call_count, 2)
+
+    def test_non_retryable_errors(self):
+        with self.assertRaises(psycopg.DatabaseError) as cm:
+            asyncio.run(self.mock_db.non_retryable_method())
+
+        self.assertIn("syntax error", str(cm.exception))
+
+
+class TestPoolProfiles(unittest.TestCase):
+
+    def get_pool_profile(self, postgresql_config, selected=None, sync=False):
+        with patch('lib.db.GlobalConfig') as mock_config, patch('lib.db._selected_pool_profile', selected):
+            mock_config.return_value.config = {'postgresql': postgresql_config}
+            return get_pool_profile(sync=sync)
+
+    def test_default_profile_is_runner(self):
+        self.assertEqual(self.get_pool_profile({}), ('runner', DB_POOL_PROFILES['runner']))
+
+    def test_selected_profile_wins_over_config(self):
+        self.assertEqual(self.get_pool_profile({'pool_profile': 'cron'})[0], 'cron')
+        self.assertEqual(self.get_pool_profile({'pool_profile': 'cron'}, selected='api')[0], 'api')
+
+    def test_config_overrides_single_values(self):
+        _, pool_settings = self.get_pool_profile({'pool_profiles': {'api': {'max_size': 20}}}, selected='api')
+        self.assertEqual(pool_settings, {**DB_POOL_PROFILES['api'], 'max_size': 20})
+
+    def test_sync_pool_of_api_has_own_profile(self):
+        self.assertEqual(self.get_pool_profile({}, selected='api', sync=True), ('api_sync', DB_POOL_PROFILES['api_sync']))
+        self.assertEqual(self.get_pool_profile({}, selected='api')[0], 'api')
+        self.assertEqual(self.get_pool_profile({}, selected='cron', sync=True)[0], 'cron')
+
+        _, pool_settings = self.get_pool_profile({'pool_profiles': {'api_sync': {'max_size': 3}}}, selected='api', sync=True)
+        self.assertEqual(pool_settings, {**DB_POOL_PROFILES['api_sync'], 'max_size': 3})
+
+    def test_invalid_profiles(self):
+        with self.assertRaises(ValueError):
+            set_pool_profile('unknown')
+        with self.assertRaises(ValueError):
+            self.get_pool_profile({'pool_profile': 'unknown'})
+        with self.assertRaises(ValueError):
+            self.get_pool_profile({'pool_profiles': {'runner': {'max_sizes': 3}}})
+
+
 class TestDbIntegration(unittest.TestCase):
     """Integration tests for DB class methods using real database connections.
     
@@ -146,6 +222,85 @@ class TestDbIntegration(unittest.TestCase):
         self.assertEqual(results[1][0], 2)
         self.assertEqual(results[1][1], 'test2')
 
+    def test_copy_from_integer_arrays(self):
+        self.db.query(f"CREATE TABLE {self.table_name} (id INT, value BIGINT, time BIGINT)")
+
+        ids = numpy.array([1, 2, 3], dtype=numpy.int64)
+        values = numpy.array([-5, 0, 2**62], dtype=numpy.int64)
+        times = numpy.array([1759592247532228, 1759592247631431, 1759592247731431], dtype=numpy.int64)
+
+        self.db.copy_from_integer_arrays([ids, values, times], self.table_name, ['id', 'value', 'time'], ['int', 'bigint', 'bigint'], chunk_size=2)
+
+        results = self.db.fetch_all(f"SELECT id, value, time FROM {self.table_name} ORDER BY id")
+        self.assertEqual(results, [(1, -5, 1759592247532228), (2, 0, 1759592247631431), (3, 2**62, 1759592247731431)])
+
+    def test_copy_from_integer_arrays_out_of_range(self):
+        self.db.query(f"CREATE TABLE {self.table_name} (id INT)")
+
+        with self.assertRaises(ValueError):
+            self.db.copy_from_integer_arrays([numpy.array([2**31])], self.table_name, ['id'], ['int'])
+
+    def test_copy_to_integer_arrays(self):
+        self.db.query(f"CREATE TABLE {self.table_name} (id INT, value BIGINT, time BIGINT)")
+        self.db.query(f"INSERT INTO {self.table_name} VALUES (1, -5, 1759592247532228), (2, 0, 1759592247631431), (3, %s, 1759592247731431)", (2**62, ))
+
+        chunks = list(self.db.copy_to_integer_arrays(f"SELECT id, value, time FROM {self.table_name} WHERE id >= %s ORDER BY id", (1, ), ['int', 'bigint', 'bigint'], chunk_size=2))
+
+        self.assertEqual([len(ids) for ids, _, _ in chunks], [2, 1])
+        ids, values, times = (numpy.concatenate(column) for column in zip(*chunks))
+        self.assertEqual(ids.tolist(), [1, 2, 3])
+        self.assertEqual(values.tolist(), [-5, 0, 2**62])
+        self.assertEqual(times.tolist(), [1759592247532228, 1759592247631431, 1759592247731431])
+
+    def test_copy_to_integer_arrays_null(self):
+        self.db.query(f"CREATE TABLE {self.table_name} (id INT, value BIGINT)")
+        self.db.query(f"INSERT INTO {self.table_name} VALUES (1, NULL)")
+
+        with self.assertRaises(ValueError):
+            list(self.db.copy_to_integer_arrays(f"SELECT id, value FROM {self.table_name}", None, ['int', 'bigint']))
+
+
+class TestAsyncDbIntegration(unittest.TestCase):
+
+    # Every test runs in its own event loop, so the pool has to be closed with it
+    def run_async(self, coro):
+        async def run():
+            try:
+                return await coro
+            finally:
+                await AsyncDB().shutdown()
+        return asyncio.run(run())
+
+    def test_fetch_operations(self):
+        self.assertEqual(self.run_async(AsyncDB().fetch_one('SELECT %s::int, %s::text', (1, 'test'))), (1, 'test'))
+        self.assertEqual(self.run_async(AsyncDB().fetch_all('SELECT generate_series(1, 2)')), [(1, ), (2, )])
+        self.assertEqual(self.run_async(AsyncDB().fetch_one('SELECT 1 AS id', fetch_mode='dict')), {'id': 1})
+
+    def test_transaction_cursor_rolls_back_on_error(self):
+        table_name = 'test_async_integration_table'
+        DB().query(f"CREATE TABLE {table_name} (id INT)")
+
+        async def insert_and_fail():
+            async with AsyncDB().transaction_cursor() as cur:
+                await cur.execute(f"INSERT INTO {table_name} VALUES (1)")
+                raise ValueError('abort')
+
+        try:
+            with self.assertRaises(ValueError):
+                self.run_async(insert_and_fail())
+            self.assertEqual(DB().fetch_one(f"SELECT COUNT(*) FROM {table_name}")[0], 0)
+        finally:
+            DB().query(f"DROP TABLE IF EXISTS {table_name}")
+
+    def test_error_handling_invalid_sql(self):
+        with self.assertRaises(psycopg.DatabaseError):
+            self.run_async(AsyncDB().query('INVALID SQL STATEMENT'))
+
+    def test_pool_stats(self):
+        stats = AsyncDB().get_pool_stats()
+        self.assertEqual(stats['profile'], 'runner')
+        self.assertEqual(stats['pool_max'], DB_POOL_PROFILES['runner']['max_size'])
+
 
 if __name__ == '__main__':
     unittest.main()
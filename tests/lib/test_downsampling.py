@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from lib.downsampling import downsample_series, lttb_indices
+
+def make_series(sample_count, seed=1):
+    rng = np.random.default_rng(seed)
+    times = np.cumsum(rng.integers(90_000, 110_000, sample_count))
+    values = rng.integers(0, 1_000_000, sample_count)
+    return times, values
+
+def lttb_reference(times, values, threshold):
+    # straight port of the reference implementation, one sample at a time
+    sample_count = len(times)
+    every = (sample_count - 2) / (threshold - 2)
+    a = 0
+    selected = [0]
+    for i in range(threshold - 2):
+        avg_start = int(np.floor((i + 1) * every) + 1)
+        avg_end = min(int(np.floor((i + 2) * every) + 1), sample_count)
+        avg_x = sum(times[avg_start:avg_end]) / (avg_end - avg_start)
+        avg_y = sum(values[avg_start:avg_end]) / (avg_end - avg_start)
+        max_area = -1
+        next_a = a
+        for j in range(int(np.floor(i * every) + 1), int(np.floor((i + 1) * every) + 1)):
+            area = abs((times[a] - avg_x) * (values[j] - values[a]) - (times[a] - times[j]) * (avg_y - values[a]))
+            if area > max_area:
+                max_area = area
+                next_a = j
+        selected.append(next_a)
+        a = next_a
+    selected.append(sample_count - 1)
+    return selected
+
+@pytest.mark.parametrize('sample_count, threshold', [(1000, 100), (5003, 77), (10, 3), (50, 49)])
+def test_lttb_matches_reference(sample_count, threshold):
+    times, values = make_series(sample_count)
+    assert lttb_indices(times, values, threshold).tolist() == lttb_reference(times.tolist(), values.tolist(), threshold)
+
+def test_short_series_is_not_downsampled():
+    times, values = make_series(50)
+    for method in ('lttb', 'minmax', 'avg'):
+        downsampled_times, downsampled_values = downsample_series(times, values, method, max_points=50)
+        assert downsampled_times.tolist() == times.tolist()
+        assert downsampled_values.tolist() == values.tolist()
+
+@pytest.mark.parametrize('method', ['lttb', 'minmax', 'avg'])
+def test_max_points_is_respected(method):
+    times, values = make_series(100_000)
+    downsampled_times, _ = downsample_series(times, values, method, max_points=1000)
+
+    assert 0 < len(downsampled_times) <= 1000
+    assert np.all(np.diff(downsampled_times) > 0), 'Time order must be kept'
+
+def test_minmax_keeps_extremes():
+    times, values = make_series(10_000)
+    _, downsampled_values = downsample_series(times, values, 'minmax', max_points=100)
+
+    assert values.min() in downsampled_values
+    assert values.max() in downsampled_values
+
+def test_totals_are_summed_per_bucket():
+    times, values = make_series(10_000)
+    # 10 second buckets for a ~1000 second long series
+    downsampled_times, downsampled_values = downsample_series(times, values, 'lttb', bucket_us=10_000_000, is_total=True)
+
+    assert downsampled_values.sum() == values.sum(), 'Energy must not get lost when downsampling'
+    assert downsampled_times[-1] == times[-1]
+    assert len(downsampled_times) <= (times[-1] - times[0]) // 10_000_000 + 1
+
+def test_unknown_method():
+    times, values = make_series(10)
+    with pytest.raises(ValueError, match='Unknown downsampling method'):
+        downsample_series(times, values, 'median', max_points=5)
@@ -0,0 +1,130 @@
+from pathlib import Path
+import pytest
+import yaml
+
+from tests import test_functions as Tests
+from lib.db import DB
+from lib.global_config import GlobalConfig
+from lib.phase_stats import build_and_store_phase_stats
+from lib import measurement_archive
+
+BASE_CONFIG_PATH = Path(__file__).parent.parent / 'test-config.yml'
+
+def override_archive_config(tmp_path, archive_config):
+    with open(BASE_CONFIG_PATH, encoding='utf-8') as fh:
+        config = yaml.safe_load(fh)
+    config['measurement_archive'] = archive_config
+
+    tmp_config = tmp_path / 'test-config.yml'
+    with open(tmp_config, 'w', encoding='utf-8') as fh:
+        yaml.safe_dump(config, fh)
+    GlobalConfig().override_config(config_location=tmp_config.as_posix())
+
+@pytest.fixture(name='archive_directory', autouse=True)
+def archive_directory_fixture(tmp_path):
+    archive_dir = tmp_path / 'archive'
+    override_archive_config(tmp_path, {'directory': archive_dir.as_posix(), 'after_days': 30})
+    yield archive_dir
+    GlobalConfig().override_config(config_location=BASE_CONFIG_PATH.as_posix())
+
+def get_measurement_values(run_id):
+    return DB().fetch_all('''
+        SELECT mv.measurement_metric_id, mv.time, mv.value
+        FROM measurement_values as mv JOIN measurement_metrics as mm ON mm.id = mv.measurement_metric_id
+        WHERE mm.run_id = %s
+        ORDER BY mv.measurement_metric_id ASC, mv.time ASC
+    ''', params=(run_id, ))
+
+def get_phase_stats(run_id):
+    return DB().fetch_all('''
+        SELECT metric, detail_name, phase, value, type, max_value, min_value, sampling_rate_avg, sampling_rate_max, sampling_rate_95p, unit, hidden
+        FROM phase_stats
+        WHERE run_id = %s
+        ORDER BY id ASC
+    ''', params=(run_id, ))
+
+def test_archive_run_roundtrip(archive_directory):
+    run_id = Tests.insert_run(Tests.TEST_MEASUREMENT_PHASES)
+    Tests.import_machine_energy(run_id)
+    Tests.import_cpu_utilization_container(run_id)
+    expected = get_measurement_values(run_id)
+
+    row_count = measurement_archive.archive_run(run_id)
+
+    assert row_count == len(expected)
+    assert archive_directory.joinpath(f"{run_id}.parquet").is_file()
+    assert measurement_archive.is_archived(run_id)
+    assert get_measurement_values(run_id) == [], 'Values must be deleted from the DB after archiving'
+
+    measurement_metric_ids, times, values = measurement_archive.read_archived_measurements(run_id)
+    assert list(zip(measurement_metric_ids.tolist(), times.tolist(), values.tolist())) == expected
+
+def test_archive_run_twice_fails():
+    run_id = Tests.insert_run(Tests.TEST_MEASUREMENT_PHASES)
+    Tests.import_machine_energy(run_id)
+    measurement_archive.archive_run(run_id)
+
+    with pytest.raises(RuntimeError, match='is already archived'):
+        measurement_archive.archive_run(run_id)
+
+def test_archive_is_removed_if_delete_fails(monkeypatch, archive_directory):
+    run_id = Tests.insert_run(Tests.TEST_MEASUREMENT_PHASES)
+    Tests.import_machine_energy(run_id)
+    expected = get_measurement_values(run_id)
+
+    fetch_one = DB.fetch_one
+    def failing_fetch_one(self, query, *args, **kwargs):
+        if 'DELETE FROM measurement_values' in query:
+            raise RuntimeError('DELETE failed')
+        return fetch_one(self, query, *args, **kwargs)
+    monkeypatch.setattr(DB, 'fetch_one', failing_fetch_one)
+
+    with pytest.raises(RuntimeError, match='DELETE failed'):
+        measurement_archive.archive_run(run_id)
+    monkeypatch.undo()
+
+    assert not archive_directory.joinpath(f"{run_id}.parquet").exists(), 'Archive must not shadow the values that are still in the DB'
+    assert not measurement_archive.is_archived(run_id)
+    assert get_measurement_values(run_id) == expected
+
+    # the next cron pass archives the run
+    assert measurement_archive.archive_run(run_id) == len(expected)
+    assert get_measurement_values(run_id) == []
+
+@pytest.mark.parametrize('streaming', [False, True])
+def test_phase_stats_of_archived_run_match(streaming):
+    run_id = Tests.insert_run(Tests.TEST_MEASUREMENT_PHASES)
+    Tests.import_machine_energy(run_id)
+    Tests.import_cpu_energy(run_id)
+    Tests.import_cpu_utilization_container(run_id)
+
+    build_and_store_phase_stats(run_id)
+    expected = get_phase_stats(run_id)
+
+    measurement_archive.archive_run(run_id)
+    DB().query('DELETE FROM phase_stats WHERE run_id = %s', params=(run_id, ))
+    build_and_store_phase_stats(run_id, streaming=streaming)
+
+    assert len(expected) > 0
+    assert get_phase_stats(run_id) == expected
+
+def test_iter_archived_measurements():
+    run_id = Tests.insert_run(Tests.TEST_MEASUREMENT_PHASES)
+    Tests.import_machine_energy(run_id)
+    Tests.import_cpu_utilization_container(run_id)
+    expected = get_measurement_values(run_id)
+    measurement_archive.archive_run(run_id)
+
+    series = list(measurement_archive.iter_archived_measurements(run_id))
+
+    assert len(series) > 1
+    assert [(measurement_metric_id, time, value) for measurement_metric_id, times, values in series for time, value in zip(times.tolist(), values.tolist())] == expected
+
+def test_not_archived_without_directory(tmp_path):
+    override_archive_config(tmp_path, None)
+    run_id = Tests.insert_run(Tests.TEST_MEASUREMENT_PHASES)
+
+    assert measurement_archive.is_archived(run_id) is False
+    assert measurement_archive.read_archived_measurements(run_id) is None
+    with pytest.raises(RuntimeError, match='directory is not set'):
+        measurement_archive.archive_run(run_id)
@@ -0,0 +1,80 @@
+import pytest
+from psycopg import sql
+
+from tests import test_functions as Tests
+from lib.db import DB
+from lib import measurement_partitions
+
+# The tables of the test schema are only truncated between tests, so partitions created or detached here
+# would leak into other tests. This restores the layout of docker/tables.sql afterwards
+@pytest.fixture(autouse=True)
+def restore_partitions():
+    yield
+    DB().query('DELETE FROM measurement_values')
+    for name, lower, _ in measurement_partitions.get_measurement_partitions():
+        if lower is not None:
+            DB().query(sql.SQL('DROP TABLE {}').format(sql.Identifier(name)))
+    leftovers = DB().fetch_all("SELECT tablename FROM pg_tables WHERE schemaname = current_schema() AND tablename LIKE 'measurement_values_p%' AND tablename != 'measurement_values_p0'")
+    for (name, ) in leftovers: # detached partitions
+        DB().query(sql.SQL('DROP TABLE {}').format(sql.Identifier(name)))
+    if not measurement_partitions.get_measurement_partitions():
+        DB().query('DELETE FROM measurement_values_p0')
+        DB().query('ALTER TABLE measurement_values ATTACH PARTITION measurement_values_p0 FOR VALUES FROM (MINVALUE) TO (100000)')
+
+def insert_measurement_metric(run_id, measurement_metric_id):
+    DB().query('''
+        INSERT INTO measurement_metrics (id, run_id, metric, detail_name, unit)
+        VALUES (%s, %s, 'test_metric', %s, 'mJ')
+    ''', params=(measurement_metric_id, run_id, f"detail_{measurement_metric_id}"))
+    DB().query('''
+        INSERT INTO measurement_values (measurement_metric_id, value, time)
+        VALUES (%s, 1, 1), (%s, 2, 2)
+    ''', params=(measurement_metric_id, measurement_metric_id))
+
+def get_partition_of_values(measurement_metric_id):
+    return DB().fetch_all('SELECT DISTINCT tableoid::regclass::text FROM measurement_values WHERE measurement_metric_id = %s', params=(measurement_metric_id, ))
+
+def test_create_partitions_ahead():
+    run_id = Tests.insert_run(Tests.TEST_MEASUREMENT_PHASES)
+    insert_measurement_metric(run_id, 5)
+
+    created = measurement_partitions.create_measurement_partitions(ids_per_partition=100_000, partitions_ahead=2)
+
+    assert created == ['measurement_values_p100000', 'measurement_values_p200000']
+    assert not measurement_partitions.create_measurement_partitions(ids_per_partition=100_000, partitions_ahead=2), 'Partitions must only be created once'
+    assert get_partition_of_values(5) == [('measurement_values_p0', )]
+
+def test_create_partitions_moves_values_out_of_default_partition():
+    run_id = Tests.insert_run(Tests.TEST_MEASUREMENT_PHASES)
+    insert_measurement_metric(run_id, 250_000)
+    assert get_partition_of_values(250_000) == [('measurement_values_default', )]
+
+    measurement_partitions.create_measurement_partitions(ids_per_partition=100_000, partitions_ahead=0)
+
+    assert get_partition_of_values(250_000) == [('measurement_values_p200000', )]
+    assert DB().fetch_one('SELECT COUNT(*) FROM measurement_values WHERE measurement_metric_id = 250000')[0] == 2
+
+def test_expire_partitions_of_old_runs_only():
+    old_run_id = Tests.insert_run(Tests.TEST_MEASUREMENT_PHASES)
+    new_run_id = Tests.insert_run(Tests.TEST_MEASUREMENT_PHASES)
+    DB().query("UPDATE runs SET created_at = NOW() - INTERVAL '100 days' WHERE id = %s", params=(old_run_id, ))
+    insert_measurement_metric(old_run_id, 50_000)
+    insert_measurement_metric(new_run_id, 150_000)
+    measurement_partitions.create_measurement_partitions(ids_per_partition=100_000, partitions_ahead=1)
+
+    assert not measurement_partitions.expire_measurement_partitions(retention_days=365, drop=False)
+
+    expired = measurement_partitions.expire_measurement_partitions(retention_days=30, drop=False)
+
+    assert expired == ['measurement_values_p0'], 'Partition with values of a retained run or ahead of the used ids must not expire'
+    assert get_partition_of_values(50_000) == []
+    assert get_partition_of_values(150_000) == [('measurement_values_p100000', )]
+    assert DB().fetch_one('SELECT COUNT(*) FROM measurement_values_p0')[0] == 2, 'Detached partition must be kept without drop'
+
+def test_run_measurement_metric_id_range():
+    run_id = Tests.insert_run(Tests.TEST_MEASUREMENT_PHASES)
+    assert measurement_partitions.get_run_measurement_metric_id_range(run_id) == (None, None)
+
+    insert_measurement_metric(run_id, 7)
+    insert_measurement_metric(run_id, 3)
+    assert measurement_partitions.get_run_measurement_metric_id_range(run_id) == (3, 7)
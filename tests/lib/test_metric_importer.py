@@ -1,7 +1,9 @@
 import math
+import pandas
 
 from tests import test_functions as Tests
 from lib.db import DB
+from lib import metric_importer
 
 def test_import_cpu_utilization_container():
 
@@ -45,3 +47,35 @@ def test_import_cpu_energy():
 
     assert result[0] == len(measurement_lines)
     assert math.isclose(result[1], 446780.2100, abs_tol=1e-3), 'AVG value not in expected range'
+
+def test_register_measurement_metrics_returns_ids_in_key_order():
+
+    run_id = Tests.insert_run(Tests.TEST_MEASUREMENT_PHASES)
+    keys = [('metric_b', 'container_2', 'mJ'), ('metric_a', 'container_1', 'mJ'), ('metric_b', 'container_1', 'mJ')]
+
+    ids = metric_importer.register_measurement_metrics(run_id, keys)
+
+    results = DB().fetch_all('SELECT id, metric, detail_name, unit FROM measurement_metrics WHERE run_id = %s', params=(run_id, ))
+    assert {(metric, detail_name, unit): measurement_metric_id for measurement_metric_id, metric, detail_name, unit in results} == dict(zip(keys, ids))
+
+def test_import_maps_every_row_to_its_metric():
+
+    run_id = Tests.insert_run(Tests.TEST_MEASUREMENT_PHASES)
+    df = pandas.DataFrame({
+        'time': [1, 1, 2, 2, 3, 3],
+        'value': [10, 20, 11, 21, 12, 22],
+        'metric': ['test_metric'] * 6,
+        'detail_name': pandas.Categorical(['container_1', 'container_2'] * 3),
+        'unit': ['mJ'] * 6,
+    })
+
+    metric_importer.import_measurements(df, 'test_metric', run_id)
+
+    results = DB().fetch_all('''
+        SELECT mm.detail_name, ARRAY_AGG(mv.value ORDER BY mv.time)
+        FROM measurement_metrics as mm JOIN measurement_values as mv ON mv.measurement_metric_id = mm.id
+        WHERE mm.run_id = %s
+        GROUP BY mm.detail_name ORDER BY mm.detail_name
+    ''', params=(run_id, ))
+
+    assert results == [('container_1', [10, 11, 12]), ('container_2', [20, 21, 22])]
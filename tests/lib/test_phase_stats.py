@@ -1,6 +1,9 @@
+import bisect
 import io
+import itertools
 import math
 import os
+import random
 import shutil
 import tempfile
 
@@ -9,14 +12,15 @@ from pathlib import Path
 
 GMT_ROOT_DIR = Path(__file__).parent.parent.parent
 
+import numpy as np
 import pandas
 import pytest
 from contextlib import redirect_stdout, redirect_stderr
 
 from tests import test_functions as Tests
 from lib.db import DB
-from lib.phase_stats import build_and_store_phase_stats
-from lib.post_metric_providers.calculate_co2_intensity import calculate_co2_intensity
+from lib.phase_stats import build_and_store_phase_stats, _compute_metric_all_phase_stats, _phase_sample_ranges, MAX_POSTGRES_BIGINT
+from lib.post_metric_providers.calculate_co2_intensity import calculate_co2_intensity, carbon_ug_from_energy
 from lib import metric_importer
 from lib.scenario_runner import ScenarioRunner
 from lib.utils import container_name
@@ -904,6 +908,15 @@ def test_calculate_co2_intensity_uses_microgram_scale():
 
     assert derived_values == [(100,), (400,)]
 
+def test_carbon_ug_from_energy_alignment_and_rounding():
+    carbon_times = np.array([500, 1500])
+    carbon_intensities = np.array([100, 200])
+    energy_times = np.array([100, 500, 1499, 1500, 1600])
+    energy_values = np.array([18_000, 54_000, 18_000, 3_600_000, -9_000])
+
+    # 0.5, 1.5, 0.5, 200 and -0.5 ugCO2e. Samples before the first carbon intensity use the first one
+    assert carbon_ug_from_energy(energy_times, energy_values, carbon_times, carbon_intensities).tolist() == [0, 2, 0, 200, 0]
+
 def test_phase_stats_runtime_max_min_reconstruction():
     # reconstruct_runtime_phase() must take MAX(max_value)/MIN(min_value) across sub-phases
     # (the true sample extremes recorded per sub-phase), not MAX(value)/MIN(value) (the
@@ -1096,3 +1109,143 @@ def test_phase_stats_maps_elephant_machine_carbon():
     assert data['unit'] == 'ugCO2e'
     assert data['value'] == 1200
     assert data['type'] == 'TOTAL'
+
+
+def test_phase_stats_streaming_matches_in_memory():
+    results = []
+    for streaming in (False, True):
+        run_id = Tests.insert_run(Tests.TEST_MEASUREMENT_PHASES)
+        Tests.import_machine_energy(run_id)
+        Tests.import_cpu_energy(run_id)
+        Tests.import_cpu_utilization_container(run_id)
+
+        build_and_store_phase_stats(run_id, streaming=streaming)
+
+        results.append(DB().fetch_all('''
+            SELECT metric, detail_name, phase, value, type, max_value, min_value, sampling_rate_avg, sampling_rate_max, sampling_rate_95p, unit, hidden
+            FROM phase_stats
+            WHERE run_id = %s
+            ORDER BY id ASC
+        ''', params=(run_id, )))
+
+    assert len(results[0]) > 0
+    assert results[0] == results[1]
+
+
+def assert_numpy_kernel_matches_decimal_kernel(times, values, phases):
+    expected = _compute_metric_all_phase_stats(times, values, phases, 'decimal')
+    actual = _compute_metric_all_phase_stats(times, values, phases, 'numpy')
+
+    assert len(expected) == len(actual) == len(phases)
+    for expected_stats, actual_stats in zip(expected, actual):
+        if expected_stats is None:
+            assert actual_stats is None
+            continue
+        assert expected_stats.keys() == actual_stats.keys()
+        for key, expected_value in expected_stats.items():
+            if key == 'derivative_avg' and expected_stats['value_count'] > 2:
+                # only value of the precision contract that is not identical. See _compute_metric_phase_stats_numpy()
+                assert math.isclose(actual_stats[key], expected_value, rel_tol=1e-12), key
+            else:
+                assert actual_stats[key] == expected_value, key
+                assert type(actual_stats[key]) is type(expected_value), key
+
+def random_phases(rng, end_of_data):
+    borders = sorted(rng.randint(-10, end_of_data + 10) for _ in range(rng.choice([2, 4, 8])))
+    phases = [{'name': f"Phase {idx}", 'start': borders[idx], 'end': borders[idx+1] + 1} for idx in range(0, len(borders), 2)]
+    if len(phases) > 1 and rng.random() < 0.5:
+        phases.insert(1, {'name': '[RUNTIME]', 'start': phases[1]['start'] - 1, 'end': phases[-1]['end']})
+    return phases
+
+@pytest.mark.parametrize('seed', range(20))
+def test_numpy_kernel_matches_decimal_kernel_random(seed):
+    rng = random.Random(seed)
+    for _ in range(50):
+        times = list(itertools.accumulate(rng.randint(1, 200_000) for _ in range(rng.choice([0, 1, 2, 3, 10, 200]))))
+        values = [rng.randint(0, rng.choice([10, 10**6, 10**12])) for _ in times]
+        phases = random_phases(rng, times[-1] if times else 0)
+
+        assert_numpy_kernel_matches_decimal_kernel(times, values, phases)
+
+def test_numpy_kernel_matches_decimal_kernel_edge_cases():
+    times = [10, 20, 30, 40]
+    values = [1, 2, 3, 4]
+    # empty phase
+    assert_numpy_kernel_matches_decimal_kernel(times, values, [{'name': 'A', 'start': 40, 'end': 50}])
+    # samples exactly on the phase borders are excluded on the left and padded in on the right
+    assert_numpy_kernel_matches_decimal_kernel(times, values, [{'name': 'A', 'start': 10, 'end': 30}])
+    # padding sample already belongs to the next phase
+    assert_numpy_kernel_matches_decimal_kernel(times, values, [{'name': 'A', 'start': 10, 'end': 30}, {'name': 'B', 'start': 30, 'end': 45}])
+    # one and two samples use the classic average and the approximated derivative
+    assert_numpy_kernel_matches_decimal_kernel(times, values, [{'name': 'A', 'start': 15, 'end': 18}, {'name': 'B', 'start': 18, 'end': 30}, {'name': 'C', 'start': 30, 'end': 45}])
+    # sums that would overflow int64
+    assert_numpy_kernel_matches_decimal_kernel(list(range(1_000, 101_000, 1_000)), [2**60] * 100, [{'name': 'A', 'start': 0, 'end': 200_000}])
+    # derivatives that tie or swap order in float64
+    assert_numpy_kernel_matches_decimal_kernel([0, 1, 2, 3], [0, 2**53, 2**53 + 1, 5], [{'name': 'A', 'start': -1, 'end': 10}])
+    assert_numpy_kernel_matches_decimal_kernel([0, 1, 2, 3], [0, 2**53 + 1, 2**53, 2**53 + 5], [{'name': 'A', 'start': -1, 'end': 10}])
+    assert_numpy_kernel_matches_decimal_kernel([0, 3, 6, 9], [0, 3 * 2**60 + 1, 3 * 2**60 + 2, 3 * 2**60], [{'name': 'A', 'start': -1, 'end': 10}])
+
+def test_numpy_kernel_matches_decimal_kernel_on_measurement_data():
+    df = pandas.read_csv(GMT_ROOT_DIR.joinpath('tests/data/metrics/psu_energy_ac_mcp_machine.log'), sep=' ', names=['time', 'value'])
+    assert_numpy_kernel_matches_decimal_kernel(df['time'].tolist(), df['value'].tolist(), Tests.TEST_MEASUREMENT_PHASES)
+
+def test_phase_sample_ranges_match_bisect():
+    rng = random.Random(0)
+    for _ in range(200):
+        times = list(itertools.accumulate(rng.randint(1, 1_000) for _ in range(rng.choice([0, 1, 5, 100]))))
+        phases = random_phases(rng, times[-1] if times else 0)
+
+        ranges = _phase_sample_ranges(np.array(times, dtype=np.int64), phases)
+
+        for idx, phase in enumerate(phases):
+            if phase['name'] == '[RUNTIME]':
+                assert ranges[idx] is None
+                continue
+            next_phase_start = phases[idx+1]['start'] if idx+1 < len(phases) else MAX_POSTGRES_BIGINT
+            left = bisect.bisect_right(times, phase['start'])
+            right = bisect.bisect_left(times, phase['end'])
+            if left < right < len(times) and times[right] < next_phase_start:
+                right += 1
+            assert ranges[idx] == (left, right)
+
+def test_phase_stats_numpy_kernel_matches_decimal_kernel():
+    results = []
+    for kernel in ('decimal', 'numpy'):
+        run_id = Tests.insert_run(Tests.TEST_MEASUREMENT_PHASES)
+        Tests.import_machine_energy(run_id)
+        Tests.import_cpu_energy(run_id)
+        Tests.import_cpu_utilization_container(run_id)
+        Tests.import_network_io_procfs(run_id)
+
+        build_and_store_phase_stats(run_id, kernel=kernel)
+
+        results.append(DB().fetch_all('''
+            SELECT metric, detail_name, phase, value, type, max_value, min_value, sampling_rate_avg, sampling_rate_max, sampling_rate_95p, unit, hidden
+            FROM phase_stats
+            WHERE run_id = %s
+            ORDER BY id ASC
+        ''', params=(run_id, )))
+
+    assert len(results[0]) > 0
+    assert results[0] == results[1]
+
+def test_phase_stats_workers_match_sequential():
+    results = []
+    for workers in (1, 2):
+        run_id = Tests.insert_run(Tests.TEST_MEASUREMENT_PHASES)
+        Tests.import_machine_energy(run_id)
+        Tests.import_cpu_energy(run_id)
+        Tests.import_cpu_utilization_container(run_id)
+        Tests.import_network_io_procfs(run_id)
+
+        build_and_store_phase_stats(run_id, workers=workers)
+
+        results.append(DB().fetch_all('''
+            SELECT metric, detail_name, phase, value, type, max_value, min_value, sampling_rate_avg, sampling_rate_max, sampling_rate_95p, unit, hidden
+            FROM phase_stats
+            WHERE run_id = %s
+            ORDER BY id ASC
+        ''', params=(run_id, )))
+
+    assert len(results[0]) > 0
+    assert results[0] == results[1]
@@ -0,0 +1,118 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import numpy
+import pandas
+import pytest
+
+from metric_providers.carbon.intensity.helpers import expand_to_sampling_rate
+
+START_TIME = datetime(2026, 4, 28, 12, 0, 0, tzinfo=timezone.utc)
+START_US = int(START_TIME.timestamp() * 1_000_000)
+
+# The former loop based implementation, kept as the reference the vectorized one must match
+def reference_expand_to_sampling_rate(self, df):
+    step_us = int(self._sampling_rate) * 1_000
+    start_us = int(self._start_time.timestamp() * 1_000_000)
+    end_us = int(self._end_time.timestamp() * 1_000_000)
+
+    expanded_records = []
+    for provider_name in df['provider'].drop_duplicates().tolist():
+        if pandas.isna(provider_name):
+            provider_df = df[df['provider'].isna()]
+        else:
+            provider_df = df[df['provider'] == provider_name]
+
+        provider_df = provider_df.sort_values(by='time', ascending=True)
+        source_times = provider_df['time'].tolist()
+        source_values = provider_df['value'].tolist()
+
+        current_index = 0
+        while current_index + 1 < len(source_times) and source_times[current_index + 1] <= start_us:
+            current_index += 1
+
+        change_times = []
+        last_change_time = None
+        for source_time in source_times:
+            if source_time < start_us or source_time > end_us:
+                continue
+            if source_time == last_change_time:
+                continue
+            change_times.append(source_time)
+            last_change_time = source_time
+
+        sample_time = start_us
+        change_idx = 0
+        while sample_time <= end_us or change_idx < len(change_times):
+            next_grid_time = sample_time if sample_time <= end_us else None
+            next_change_time = change_times[change_idx] if change_idx < len(change_times) else None
+
+            if next_grid_time is None or (next_change_time is not None and next_change_time < next_grid_time):
+                emit_time = next_change_time
+                change_idx += 1
+            elif next_change_time is not None and next_change_time == next_grid_time:
+                emit_time = next_grid_time
+                change_idx += 1
+                sample_time += step_us
+            else:
+                emit_time = next_grid_time
+                sample_time += step_us
+
+            while current_index + 1 < len(source_times) and source_times[current_index + 1] <= emit_time:
+                current_index += 1
+
+            expanded_records.append({
+                'time': emit_time,
+                'value': int(source_values[current_index]),
+                'provider': provider_name,
+            })
+
+    return (
+        pandas.DataFrame.from_records(expanded_records)
+        .sort_values(by=['time', 'provider'], kind='stable')
+        .reset_index(drop=True)
+    )
+
+def make_provider(sampling_rate, duration):
+    return SimpleNamespace(
+        _sampling_rate=sampling_rate,
+        _start_time=START_TIME,
+        _end_time=START_TIME + duration,
+        _metric_name='carbon_intensity_test',
+    )
+
+@pytest.mark.parametrize('seed', range(5))
+def test_expand_to_sampling_rate_matches_reference(seed):
+    rng = numpy.random.default_rng(seed)
+    sampling_rate = int(rng.integers(50, 1000))
+    provider = make_provider(sampling_rate=sampling_rate, duration=timedelta(minutes=30))
+    end_us = START_US + 30 * 60 * 1_000_000
+
+    # change points before, inside and after the window, some of them on the grid, for two providers
+    frames = []
+    for provider_name in ('electricity_maps', 'elephant'):
+        times = numpy.unique(numpy.concatenate((
+            rng.integers(START_US - 3_600_000_000, end_us + 3_600_000_000, 20),
+            START_US + rng.integers(0, 100, 5) * sampling_rate * 1_000,
+        )))
+        frames.append(pandas.DataFrame({'time': times, 'value': rng.integers(0, 800, len(times)), 'provider': provider_name}))
+    df = pandas.concat(frames, ignore_index=True).sample(frac=1, random_state=seed) # unsorted input
+
+    expected = reference_expand_to_sampling_rate(provider, df)
+    result = expand_to_sampling_rate(provider, df)
+
+    pandas.testing.assert_frame_equal(result, expected)
+
+def test_expand_to_sampling_rate_holds_value_until_next_change():
+    provider = make_provider(sampling_rate=1000, duration=timedelta(seconds=3))
+    df = pandas.DataFrame({
+        'time': [START_US - 10_000_000, START_US + 1_500_000],
+        'value': [100, 200],
+        'provider': ['static', 'static'],
+    })
+
+    result = expand_to_sampling_rate(provider, df)
+
+    assert result['time'].tolist() == [START_US + offset for offset in (0, 1_000_000, 1_500_000, 2_000_000, 3_000_000)]
+    assert result['value'].tolist() == [100, 100, 200, 200, 200]
+    pandas.testing.assert_frame_equal(result, reference_expand_to_sampling_rate(provider, df))
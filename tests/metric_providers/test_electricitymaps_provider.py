@@ -20,6 +20,7 @@ from metric_providers.carbon.intensity.electricitymaps.machine.provider import (
 from metric_providers.base import MetricProviderConfigurationError
 
 TESTS_DIR = Path(__file__).resolve().parent.parent
+BASE_CONFIG_PATH = TESTS_DIR / 'test-config.yml'
 GMT_ROOT_DIR = TESTS_DIR.parent
 
 GMT_METRICS_DIR = Path(tempfile.mkdtemp(prefix='green-metrics-tool-metrics-'))
@@ -236,6 +237,45 @@ def test_out_of_window_entry_used_as_closest():
     assert df['value'].iloc[0] == 77
 
 
+# --- carbon intensity cache ---
+
+@pytest.fixture(name='enable_cache')
+def enable_cache_fixture(tmp_path):
+    def enable_cache():
+        with open(BASE_CONFIG_PATH, encoding='utf-8') as fh:
+            config = yaml.safe_load(fh)
+        config['carbon_intensity_cache'] = {'settle_minutes': 120, 'refresh_minutes': 5, 'forecast_ttl_minutes': 60}
+        tmp_config = tmp_path / 'test-config.yml'
+        with open(tmp_config, 'w', encoding='utf-8') as fh:
+            yaml.safe_dump(config, fh)
+        GlobalConfig().override_config(config_location=tmp_config.as_posix())
+
+    yield enable_cache
+    GlobalConfig().override_config(config_location=BASE_CONFIG_PATH.as_posix())
+
+def test_cached_run_shorter_than_granularity_matches_uncached(enable_cache):
+    # the API answers with the 5 minute bucket the run lies in, which starts before the run
+    records = {'data': [{'datetime': '2026-04-28T12:00:00Z', 'carbonIntensity': 42}]}
+
+    def read_metrics():
+        provider = make_provider()
+        provider._start_time = datetime(2026, 4, 28, 12, 1, 0, tzinfo=timezone.utc)
+        provider._end_time = datetime(2026, 4, 28, 12, 3, 0, tzinfo=timezone.utc)
+        with patch('requests.get', return_value=make_response(records)) as mock_get:
+            df = provider._read_metrics()
+        return df, [c[0][0] for c in mock_get.call_args_list]
+
+    uncached, _ = read_metrics()
+    enable_cache()
+    cached, urls_cached = read_metrics()
+    from_cache, urls_from_cache = read_metrics()
+
+    assert urls_cached == [API_PAST_URL]
+    assert urls_from_cache == [], 'The second run must be served from the cache and not fall back to the forecast'
+    assert cached.equals(uncached)
+    assert from_cache.equals(uncached)
+    assert uncached['value'].tolist() == [42]
+
 # --- multiple records ---
 
 def test_multiple_records_sorted_by_time():
@@ -1,5 +1,7 @@
 import os
 import math
+import numpy
+import pandas
 import pytest
 import shutil
 import tempfile
@@ -10,6 +12,7 @@ GMT_ROOT_DIR = Path(__file__).parent.parent.parent.as_posix()
 
 from tests import test_functions as Tests
 
+from metric_providers.base import _grouped_time_diff_quantile, map_to_categorical
 from metric_providers.network.io.procfs.system.provider import NetworkIoProcfsSystemProvider
 from metric_providers.cpu.energy.rapl.msr.component.provider import CpuEnergyRaplMsrComponentProvider
 from metric_providers.network.connections.tcpdump.system.provider import NetworkConnectionsTcpdumpSystemProvider, generate_stats_string
@@ -17,6 +20,7 @@ from metric_providers.powermetrics.provider import PowermetricsProvider
 from metric_providers.psu.energy.ac.xgboost.machine.provider import PsuEnergyAcXgboostMachineProvider
 from metric_providers.cpu.utilization.cgroup.system.provider import CpuUtilizationCgroupSystemProvider
 from metric_providers.cpu.utilization.cgroup.container.provider import CpuUtilizationCgroupContainerProvider
+from metric_providers.cpu.utilization.procfs.system.provider import CpuUtilizationProcfsSystemProvider
 
 from unittest.mock import patch
 
@@ -257,3 +261,88 @@ def test_cgroup_container():
     assert list(df.detail_name.unique()) == ['38d1e484f336c40a6e60e4518915a4e385f62fdddd47994d6adcb4fb294b2ec8', '939f410a21730a2275e91b8a949884f7f426b89e50e8b2ffceca271b6a4573b6']
 
     assert math.isclose(df.value.mean(), 289.595, abs_tol=1e-3)
+
+def test_tail_metrics_matches_reading_at_once():
+    source = Path(GMT_ROOT_DIR, 'tests/data/metrics/cpu_utilization_cgroup_container.log').read_bytes()
+
+    obj_at_once = CpuUtilizationCgroupContainerProvider(100, folder=GMT_METRICS_DIR, skip_check=True)
+    obj_at_once._filename = os.path.join(GMT_ROOT_DIR, './tests/data/metrics/cpu_utilization_cgroup_container.log')
+
+    obj_tailed = CpuUtilizationCgroupContainerProvider(100, folder=GMT_METRICS_DIR, skip_check=True)
+    obj_tailed._filename = GMT_METRICS_DIR.joinpath('cpu_utilization_cgroup_container_tailed.log')
+    obj_tailed._filename.write_bytes(b'')
+
+    for start in range(0, len(source), 333): # cuts lines in half, like the provider does while still writing
+        with open(obj_tailed._filename, 'ab') as file:
+            file.write(source[start:start+333])
+        obj_tailed.tail_metrics()
+
+    assert obj_tailed.supports_tailing()
+    assert obj_tailed._read_metrics().equals(obj_at_once._read_metrics())
+
+@pytest.mark.parametrize('block_size', [50, 200, 1_000]) # 50 is shorter than every line of the file
+def test_tail_metrics_in_blocks(block_size):
+    obj_at_once = CpuUtilizationCgroupContainerProvider(100, folder=GMT_METRICS_DIR, skip_check=True)
+    obj_at_once._filename = os.path.join(GMT_ROOT_DIR, './tests/data/metrics/cpu_utilization_cgroup_container.log')
+
+    obj_blocks = CpuUtilizationCgroupContainerProvider(100, folder=GMT_METRICS_DIR, skip_check=True)
+    obj_blocks._filename = obj_at_once._filename
+    obj_blocks.TAIL_BLOCK_SIZE = block_size
+
+    obj_blocks.tail_metrics()
+
+    assert len(obj_blocks._tail_dfs) > 1
+    assert obj_blocks._read_metrics().equals(obj_at_once._read_metrics())
+
+def test_empty_log_file():
+    obj = CpuEnergyRaplMsrComponentProvider(100, folder=GMT_METRICS_DIR, skip_check=True)
+    obj._filename = GMT_METRICS_DIR.joinpath('cpu_energy_rapl_msr_component_empty.log')
+    obj._filename.write_bytes(b'')
+
+    with pytest.raises(RuntimeError) as e:
+        obj.read_metrics()
+    assert str(e.value).startswith('Metrics provider cpu_energy_rapl_msr_component seems to have not produced any measurements.')
+
+def test_binary_output_matches_text_output():
+    obj_text = CpuUtilizationProcfsSystemProvider(100, folder=GMT_METRICS_DIR, skip_check=True)
+    obj_text._filename = os.path.join(GMT_ROOT_DIR, './tests/data/metrics/cpu_utilization_procfs_system.log')
+    df_text = obj_text.read_metrics()
+
+    obj_binary = CpuUtilizationProcfsSystemProvider(100, folder=GMT_METRICS_DIR, skip_check=True, binary_output=True)
+    obj_binary._filename = GMT_METRICS_DIR.joinpath('cpu_utilization_procfs_system_binary.log')
+    records = numpy.loadtxt(obj_text._filename, dtype='<i8')
+    obj_binary._filename.write_bytes(records.tobytes() + b'\x01\x02\x03') # incomplete last record, like while the provider is still writing
+
+    assert obj_binary.read_metrics().equals(df_text)
+
+def test_sampling_rate_absurdly_low():
+    obj = CpuUtilizationProcfsSystemProvider(1000, folder=GMT_METRICS_DIR, skip_check=True)
+    obj._filename = os.path.join(GMT_ROOT_DIR, './tests/data/metrics/cpu_utilization_procfs_system.log')
+
+    with pytest.raises(RuntimeError) as e:
+        obj.read_metrics()
+    assert str(e.value.args[0]).startswith('Effective sampling rate (95p) was absurdly low:')
+
+def test_grouped_time_diff_quantile_matches_pandas():
+    rng = numpy.random.default_rng(42)
+    for _ in range(50):
+        size = rng.integers(1, 300)
+        df = pandas.DataFrame({
+            'time': numpy.sort(rng.integers(0, 10_000_000, size)),
+            'detail_name': rng.integers(0, rng.integers(1, 30), size).astype(str),
+        })
+        expected = df.assign(sampling_rate=df.groupby('detail_name')['time'].diff()).groupby('detail_name', sort=False)['sampling_rate'].apply(lambda x: x.quantile(0.95))
+
+        quantiles = _grouped_time_diff_quantile(df.groupby('detail_name', sort=False).ngroup().to_numpy(), df['time'].to_numpy(), 0.95)
+
+        numpy.testing.assert_array_equal(quantiles, expected.to_numpy())
+
+def test_map_to_categorical():
+    series = pandas.Series(['id_b', 'id_a', 'id_c', 'id_b', 'id_d'], index=[10, 11, 12, 13, 14])
+
+    mapped = map_to_categorical(series, {'id_a': 'web', 'id_b': 'db', 'id_c': 'web'})
+
+    assert isinstance(mapped.dtype, pandas.CategoricalDtype)
+    assert mapped.tolist() == ['db', 'web', 'web', 'db', 'id_d'] # unknown ids are kept
+    assert mapped.index.tolist() == [10, 11, 12, 13, 14]
+    assert mapped.cat.categories.tolist() == ['db', 'id_d', 'web']
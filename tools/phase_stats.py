@@ -6,6 +6,7 @@ faulthandler.enable(file=sys.__stderr__)  # will catch segfaults and write to st
 
 from lib.db import DB
 from lib.phase_stats import build_and_store_phase_stats
+from lib.artifact_cache import invalidate_phase_stats_artifacts
 
 
 def derive_sci_metrics(usage_scenario):
@@ -25,6 +26,9 @@ if __name__ == '__main__':
 
     parser = argparse.ArgumentParser()
     parser.add_argument('run_id', help='Run ID', type=str)
+    parser.add_argument('--kernel', choices=['numpy', 'decimal'], help='Implementation used to aggregate the samples per phase. Defaults to the phase_stats.kernel config value')
+    parser.add_argument('--workers', type=int, help='Number of processes to compute the stats of the single metrics in parallel. Defaults to the phase_stats.workers config value')
+    parser.add_argument('--streaming', action='store_true', help='Read measurement values through a server-side cursor one metric at a time to bound memory usage on very long runs')
 
     args = parser.parse_args()  # script will exit if type is not present
 
@@ -38,4 +42,5 @@ if __name__ == '__main__':
     '''
     data = DB().fetch_one(query, params=(args.run_id, ), fetch_mode='dict')
 
-    build_and_store_phase_stats(args.run_id, data['measurement_config']['sci'], derive_sci_metrics(data['usage_scenario']))
+    build_and_store_phase_stats(args.run_id, data['measurement_config']['sci'], derive_sci_metrics(data['usage_scenario']), streaming=args.streaming or None, kernel=args.kernel, workers=args.workers)
+    invalidate_phase_stats_artifacts(args.run_id) # cached stats, compares and badges of the run are stale now
@@ -5,6 +5,7 @@ import faulthandler
 faulthandler.enable(file=sys.__stderr__)  # will catch segfaults and write to stderr
 
 from lib.db import DB
+from lib.artifact_cache import invalidate_phase_stats_artifacts
 from tools.phase_stats import build_and_store_phase_stats, derive_sci_metrics
 
 if __name__ == '__main__':
@@ -27,4 +28,6 @@ if __name__ == '__main__':
         for idx, data in enumerate(runs):
             print(f"Rebuilding phase_stats for run #{idx} {data['id']}")
             build_and_store_phase_stats(data['id'], data['measurement_config']['sci'], derive_sci_metrics(data['usage_scenario']))
+        print('Removing cached stats, compares and badges ...')
+        invalidate_phase_stats_artifacts()
         print('Done')